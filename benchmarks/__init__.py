@@ -0,0 +1 @@
+"""Offline benchmarks for generation throughput and image processing (see ``run.py``)."""
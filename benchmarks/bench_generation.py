@@ -0,0 +1,173 @@
+"""
+Generation throughput and latency against fake providers.
+
+Each level runs a fixed number of ``generate_image`` tool calls through
+``server.call_tool`` with a fixed number of concurrent callers (a closed loop), so the
+numbers include argument handling, rate limiting, retries, streaming to disk and
+metrics, everything except the network.
+"""
+
+import asyncio
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+from benchmarks.fake_providers import FakeProviderProfile, FakeProviders
+from benchmarks.measure import ResourceSampler, latency_summary
+
+PROVIDERS = ("pollinations", "huggingface", "openai")
+
+# Server singletons replaced for the run and restored afterwards
+PATCHED_ATTRIBUTES = ("http_clients", "rate_limiters", "generation_cache", "DEFAULT_OUTPUT_DIR")
+
+
+@asynccontextmanager
+async def benchmark_server(
+    transport: httpx.AsyncBaseTransport, max_concurrency: int, output_dir: Path
+) -> AsyncIterator[Any]:
+    """
+    Point the server at fake providers with benchmark settings, restoring it afterwards.
+
+    Client-side rate limits and the generation cache are off, per-provider concurrency
+    is raised to the largest level, and retry backoff is shortened so injected errors
+    cost retries rather than seconds of sleeping.
+
+    Args:
+        transport: Transport answering provider requests
+        max_concurrency: Per-provider concurrency limit
+        output_dir: Directory generated images are written to
+
+    Yields:
+        The configured ``imagegen_mcp.server`` module
+    """
+    from imagegen_mcp import server
+    from imagegen_mcp.http_client import HttpClientPool
+    from imagegen_mcp.ratelimit import RateLimiterRegistry
+
+    settings = {"OPENAI_API_KEY": "benchmark", "HUGGINGFACE_API_KEY": "benchmark"}
+    for provider in PROVIDERS:
+        prefix = f"IMAGEGEN_{provider.upper()}"
+        settings[f"{prefix}_RATE"] = "0"
+        settings[f"{prefix}_CONCURRENCY"] = str(max_concurrency)
+        settings[f"{prefix}_RETRY_BASE_DELAY"] = "0.01"
+        settings[f"{prefix}_RETRY_MAX_DELAY"] = "0.05"
+    saved_env = {name: os.environ.get(name) for name in settings}
+    saved_attributes = {name: getattr(server, name) for name in PATCHED_ATTRIBUTES}
+    # Built lazily from the environment on first use
+    lazy_state = (
+        server._provider_semaphores,
+        server._retry_policies,
+        server._circuit_breakers,
+        server._retry_budgets,
+    )
+
+    os.environ.update(settings)
+    for state in lazy_state:
+        state.clear()
+    server.http_clients = HttpClientPool(transport=transport, metrics=server.metrics)
+    server.rate_limiters = RateLimiterRegistry.from_env(server.DEFAULT_RATE_LIMITS)
+    server.generation_cache = None
+    server.DEFAULT_OUTPUT_DIR = output_dir
+    try:
+        yield server
+    finally:
+        await server.http_clients.aclose()
+        for name, value in saved_attributes.items():
+            setattr(server, name, value)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        for state in lazy_state:
+            state.clear()
+
+
+async def run_level(
+    server: Any, provider: str, concurrency: int, requests: int
+) -> dict[str, Any]:
+    """
+    Run ``requests`` generations with ``concurrency`` callers.
+
+    Returns:
+        Throughput, latency percentiles, error count and peak RSS/fds for the level
+    """
+    latencies: list[float] = []
+    errors = 0
+    issued = 0
+
+    async def caller() -> None:
+        nonlocal errors, issued
+        while issued < requests:
+            index = issued
+            issued += 1
+            arguments = {
+                "prompt": f"benchmark {provider} {concurrency} {index}",
+                "provider": provider,
+                "size": "1024x1024",
+            }
+            started = time.perf_counter()
+            content = await server.call_tool("generate_image", arguments)
+            latencies.append(time.perf_counter() - started)
+            if content[0].text.startswith("Error"):
+                errors += 1
+
+    async with ResourceSampler() as sampler:
+        started = time.perf_counter()
+        await asyncio.gather(*(caller() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "provider": provider,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "duration_seconds": round(elapsed, 3),
+        "generations_per_second": round((requests - errors) / elapsed, 2),
+        "latency_ms": latency_summary(latencies),
+        **sampler.as_dict(),
+    }
+
+
+async def run_generation_benchmarks(
+    providers: list[str],
+    concurrency_levels: list[int],
+    requests: int,
+    profiles: Optional[dict[str, FakeProviderProfile]] = None,
+    workdir: Optional[Path] = None,
+    seed: int = 0,
+) -> list[dict[str, Any]]:
+    """
+    Benchmark generations for each provider at each concurrency level.
+
+    Args:
+        providers: Providers to benchmark
+        concurrency_levels: Concurrent callers per level
+        requests: Tool calls per level
+        profiles: Fake provider behaviour (defaults: 50 ms, 256 KiB, no errors)
+        workdir: Scratch directory (generated images are deleted after each level)
+        seed: Seed for jitter and injected errors
+
+    Returns:
+        One result per provider and level
+    """
+    output_dir = Path(workdir or Path.cwd() / ".benchmarks").absolute() / "generated"
+    fake = FakeProviders(profiles, seed=seed)
+    results = []
+    async with benchmark_server(fake.transport(), max(concurrency_levels), output_dir) as server:
+        for provider in providers:
+            for concurrency in concurrency_levels:
+                # Fresh breaker and retry budget so one level's errors do not leak into the next
+                server._circuit_breakers.clear()
+                server._retry_budgets.clear()
+                output_dir.mkdir(parents=True, exist_ok=True)
+                result = await run_level(server, provider, concurrency, requests)
+                result["profile"] = fake.profile(provider).as_dict()
+                results.append(result)
+                shutil.rmtree(output_dir, ignore_errors=True)
+    return results
@@ -0,0 +1,124 @@
+"""
+Pillow microbenchmarks for the resize and convert paths.
+
+Sources are synthetic photos (a gradient with noise, so encoders cannot cheat on flat
+areas) at several sizes; every case goes through the same ``imaging`` functions the
+tools use and reports wall-clock percentiles plus the median of each stage.
+"""
+
+import asyncio
+import random
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from PIL import Image
+
+from benchmarks.measure import ResourceSampler, latency_summary
+from imagegen_mcp import imaging
+from imagegen_mcp.routing import percentile
+
+DEFAULT_SIZES = (512, 1024, 2048)
+
+
+def _resize_half(source: Path, output_dir: Path) -> dict[str, Any]:
+    with Image.open(source) as img:
+        width = img.width // 2
+    return imaging.resize_image(str(source), width=width, output_path=str(output_dir / "half.png"))
+
+
+# Case name -> operation on (source, output directory)
+CASES: dict[str, Callable[[Path, Path], dict[str, Any]]] = {
+    "resize_half": _resize_half,
+    "resize_thumbnail_256": lambda source, out: imaging.resize_image(
+        str(source), width=256, output_path=str(out / "thumb.png")
+    ),
+    "convert_jpeg_q85": lambda source, out: imaging.convert_image(
+        str(source), "JPEG", output_path=str(out / "photo.jpg"), quality=85
+    ),
+    "convert_webp_q85": lambda source, out: imaging.convert_image(
+        str(source), "WEBP", output_path=str(out / "photo.webp"), quality=85
+    ),
+}
+
+STAGES = ("decode_ms", "resize_ms", "encode_ms", "write_ms")
+
+
+def make_source(path: Path, size: int, seed: int = 0) -> Path:
+    """
+    Write a ``size`` x ``size`` RGB PNG of a gradient with noise.
+
+    Returns:
+        The path written
+    """
+    gradient = Image.linear_gradient("L").resize((size, size))
+    noise = Image.frombytes("L", (size, size), random.Random(seed).randbytes(size * size))
+    Image.merge(
+        "RGB", (gradient, Image.blend(gradient, noise, 0.3), gradient.rotate(90))
+    ).save(path)
+    return path
+
+
+def run_case(
+    name: str, source: Path, output_dir: Path, repeats: int
+) -> dict[str, Any]:
+    """
+    Time ``repeats`` runs of one case after a warmup run.
+
+    Returns:
+        Latency percentiles, per-stage medians and source/output sizes
+    """
+    operation = CASES[name]
+    result = operation(source, output_dir)
+    latencies: list[float] = []
+    stages: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = operation(source, output_dir)
+        latencies.append(time.perf_counter() - started)
+        for stage in STAGES:
+            if stage in result:
+                stages[stage].append(result[stage])
+    return {
+        "latency_ms": latency_summary(latencies),
+        "stage_p50_ms": {
+            stage: round(percentile(values, 0.5), 3) for stage, values in stages.items() if values
+        },
+        "source_bytes": source.stat().st_size,
+        "output_bytes": result["file_size_bytes"],
+    }
+
+
+async def run_imaging_benchmarks(
+    sizes: list[int],
+    repeats: int,
+    workdir: Optional[Path] = None,
+    cases: Optional[list[str]] = None,
+) -> list[dict[str, Any]]:
+    """
+    Benchmark every case at every source size.
+
+    Args:
+        sizes: Square source sizes in pixels
+        repeats: Timed runs per case (after one warmup)
+        workdir: Scratch directory (removed afterwards)
+        cases: Case names to run (default: all)
+
+    Returns:
+        One result per case and size
+    """
+    scratch = Path(workdir or Path.cwd() / ".benchmarks").absolute() / "imaging"
+    scratch.mkdir(parents=True, exist_ok=True)
+    results = []
+    try:
+        for size in sizes:
+            source = make_source(scratch / f"source_{size}.png", size)
+            for name in cases or CASES:
+                # In a thread so the sampler keeps running while Pillow holds the loop's thread
+                async with ResourceSampler() as sampler:
+                    result = await asyncio.to_thread(run_case, name, source, scratch, repeats)
+                results.append({"case": name, "size": size, **result, **sampler.as_dict()})
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
@@ -0,0 +1,132 @@
+"""
+Fake OpenAI, Pollinations and HuggingFace endpoints for offline benchmarks.
+
+An ``httpx.MockTransport`` answers provider requests locally with a configurable time to
+first byte, payload size, download bandwidth and error rate, so the whole generation path
+(rate limiting, retries, streaming to disk) runs without the network.
+"""
+
+import asyncio
+import base64
+import json
+import random
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+CHUNK_SIZE = 64 * 1024
+
+# Request hosts of each provider
+PROVIDER_HOSTS = {
+    "image.pollinations.ai": "pollinations",
+    "api-inference.huggingface.co": "huggingface",
+    "api.openai.com": "openai",
+}
+
+
+@dataclass
+class FakeProviderProfile:
+    """How one fake provider behaves."""
+
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    payload_bytes: int = 256 * 1024
+    error_rate: float = 0.0
+    error_status: int = 503
+    bandwidth_mbps: Optional[float] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "FakeProviderProfile":
+        """
+        Build a profile from ``key=value`` pairs, e.g. ``latency_ms=200,error_rate=0.05``.
+
+        Args:
+            spec: Comma-separated overrides of the default profile
+
+        Returns:
+            FakeProviderProfile
+        """
+        profile = cls()
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            key, _, value = item.partition("=")
+            if not hasattr(profile, key):
+                raise ValueError(f"Unknown profile setting: {key}")
+            is_int = isinstance(getattr(profile, key), int)
+            setattr(profile, key, int(value) if is_int else float(value))
+        return profile
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the profile as a JSON-serializable dict."""
+        return asdict(self)
+
+
+class FakeProviders:
+    """Routes provider requests to fake handlers with per-provider profiles."""
+
+    def __init__(
+        self,
+        profiles: Optional[dict[str, FakeProviderProfile]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            profiles: Provider name -> profile (missing providers use the defaults)
+            seed: Random seed for latency jitter and injected errors
+        """
+        self.profiles = dict(profiles or {})
+        self._rng = random.Random(seed)
+        self._payloads: dict[int, bytes] = {}
+        self.requests: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+
+    def profile(self, provider: str) -> FakeProviderProfile:
+        """Return the profile used for ``provider``."""
+        return self.profiles.setdefault(provider, FakeProviderProfile())
+
+    def transport(self) -> httpx.MockTransport:
+        """Return a transport serving every provider."""
+        return httpx.MockTransport(self.handle)
+
+    def _payload(self, size: int) -> bytes:
+        # Incompressible bytes behind a PNG signature, generated once per size
+        if size not in self._payloads:
+            self._payloads[size] = b"\x89PNG\r\n\x1a\n" + self._rng.randbytes(max(0, size - 8))
+        return self._payloads[size]
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        """Answer one provider request."""
+        provider = PROVIDER_HOSTS.get(request.url.host)
+        if provider is None:
+            return httpx.Response(404)
+        profile = self.profile(provider)
+        self.requests[provider] = self.requests.get(provider, 0) + 1
+
+        delay = max(0.0, self._rng.gauss(profile.latency_ms, profile.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if self._rng.random() < profile.error_rate:
+            self.errors[provider] = self.errors.get(provider, 0) + 1
+            body = {"error": "injected failure"}
+            if provider == "huggingface" and profile.error_status == 503:
+                body = {"error": "Model is loading", "estimated_time": 0.01}
+            return httpx.Response(profile.error_status, json=body)
+
+        payload = self._payload(profile.payload_bytes)
+        if provider == "openai":
+            document = {"created": 0, "data": [{"b64_json": base64.b64encode(payload).decode()}]}
+            payload = json.dumps(document).encode()
+            headers = {"content-type": "application/json"}
+        else:
+            headers = {"content-type": "image/png"}
+        headers["content-length"] = str(len(payload))
+        return httpx.Response(200, headers=headers, content=self._body(payload, profile))
+
+    async def _body(self, payload: bytes, profile: FakeProviderProfile) -> AsyncIterator[bytes]:
+        # Paces chunks to the profile's bandwidth (unlimited when not set)
+        per_chunk = None
+        if profile.bandwidth_mbps:
+            per_chunk = CHUNK_SIZE * 8 / (profile.bandwidth_mbps * 1_000_000)
+        for start in range(0, len(payload), CHUNK_SIZE):
+            if per_chunk:
+                await asyncio.sleep(per_chunk)
+            yield payload[start:start + CHUNK_SIZE]
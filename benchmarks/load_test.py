@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test: many MCP client sessions against one server process.
+
+Each session is a real ``ClientSession`` talking to ``server.app`` over in-memory MCP
+streams (the same JSON-RPC framing, request routing and schema validation as stdio,
+minus the pipes), with providers served by ``benchmarks.fake_providers``. Sessions
+replay a weighted mix of tool calls in a closed loop for a fixed duration, and each
+level reports throughput, per-tool tail latency, event-loop lag and memory.
+
+    python benchmarks/load_test.py --sessions 1,8,32,128 --duration 10
+    python benchmarks/load_test.py --mix generate_image=1,get_image_info=9 --quick
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_generation import benchmark_server  # noqa: E402
+from benchmarks.bench_imaging import make_source  # noqa: E402
+from benchmarks.fake_providers import FakeProviderProfile, FakeProviders  # noqa: E402
+from benchmarks.measure import ResourceSampler, latency_summary  # noqa: E402
+
+DEFAULT_MIX = {
+    "generate_image": 4,
+    "resize_image": 2,
+    "convert_image_format": 2,
+    "get_image_info": 2,
+}
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    """
+    Parse a ``tool=weight,...`` mix.
+
+    Raises:
+        ValueError: For unknown tools or a mix without positive weights
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        tool, _, weight = item.partition("=")
+        if tool not in DEFAULT_MIX:
+            raise ValueError(f"Unknown tool in mix: {tool} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[tool] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("The mix needs at least one tool with a positive weight")
+    return mix
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that sleeps for ``interval``."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        """
+        Args:
+            interval: Seconds between probes
+        """
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def summary(self) -> dict[str, Any]:
+        """Return lag percentiles in milliseconds."""
+        return latency_summary(self.lags)
+
+
+def tool_arguments(tool: str, session: int, call: int, source: Path, scratch: Path) -> dict:
+    """Build the arguments for one call of ``tool``."""
+    if tool == "generate_image":
+        return {"prompt": f"load test {session} {call}", "size": "1024x1024"}
+    if tool == "resize_image":
+        return {
+            "image_path": str(source),
+            "width": 256,
+            "output_path": str(scratch / f"resized_{session}.png"),
+        }
+    if tool == "convert_image_format":
+        return {
+            "image_path": str(source),
+            "target_format": "JPEG",
+            "quality": 85,
+            "output_path": str(scratch / f"converted_{session}.jpg"),
+        }
+    return {"image_path": str(source)}
+
+
+async def run_session(
+    app: Any,
+    index: int,
+    mix: dict[str, float],
+    deadline: float,
+    source: Path,
+    scratch: Path,
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+    rng: random.Random,
+) -> None:
+    """Open one client session and replay the mix until ``deadline``."""
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    tools, weights = list(mix), list(mix.values())
+    async with create_connected_server_and_client_session(app) as session:
+        call = 0
+        while time.perf_counter() < deadline:
+            tool = rng.choices(tools, weights)[0]
+            arguments = tool_arguments(tool, index, call, source, scratch)
+            call += 1
+            started = time.perf_counter()
+            result = await session.call_tool(tool, arguments)
+            latencies[tool].append(time.perf_counter() - started)
+            text = result.content[0].text if result.content else ""
+            if result.isError or text.startswith("Error"):
+                errors[tool] += 1
+
+
+async def run_load_level(
+    app: Any,
+    sessions: int,
+    duration: float,
+    mix: dict[str, float],
+    source: Path,
+    scratch: Path,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """
+    Run ``sessions`` concurrent sessions for ``duration`` seconds.
+
+    Returns:
+        Throughput, overall and per-tool latency, errors, event-loop lag and RSS/fds
+    """
+    latencies: dict[str, list[float]] = {tool: [] for tool in mix}
+    errors = dict.fromkeys(mix, 0)
+    rng = random.Random(seed)
+    async with ResourceSampler() as sampler, LoopLagMonitor() as lag:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(
+            *(
+                run_session(app, i, mix, deadline, source, scratch, latencies, errors, rng)
+                for i in range(sessions)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+    every_call = [value for values in latencies.values() for value in values]
+    return {
+        "sessions": sessions,
+        "calls": len(every_call),
+        "errors": sum(errors.values()),
+        "duration_seconds": round(elapsed, 3),
+        "calls_per_second": round(len(every_call) / elapsed, 2),
+        "latency_ms": latency_summary(every_call),
+        "tools": {
+            tool: {"latency_ms": latency_summary(latencies[tool]), "errors": errors[tool]}
+            for tool in mix
+            if latencies[tool]
+        },
+        "loop_lag_ms": lag.summary(),
+        **sampler.as_dict(),
+    }
+
+
+async def run_load_test(
+    session_levels: list[int],
+    duration: float,
+    mix: Optional[dict[str, float]] = None,
+    profiles: Optional[dict[str, FakeProviderProfile]] = None,
+    source_size: int = 1024,
+    workdir: Optional[Path] = None,
+    seed: int = 0,
+) -> list[dict[str, Any]]:
+    """
+    Drive ``server.app`` with increasing numbers of concurrent sessions.
+
+    Args:
+        session_levels: Concurrent sessions per level
+        duration: Seconds per level
+        mix: Tool name -> relative weight (default ``DEFAULT_MIX``)
+        profiles: Fake provider behaviour
+        source_size: Side of the square PNG the image tools operate on
+        workdir: Scratch directory (removed afterwards)
+        seed: Seed for the tool mix, jitter and injected errors
+
+    Returns:
+        One result per level
+    """
+    scratch = Path(workdir or Path.cwd() / ".benchmarks").absolute() / "load"
+    scratch.mkdir(parents=True, exist_ok=True)
+    source = make_source(scratch / "source.png", source_size, seed)
+    fake = FakeProviders(profiles, seed=seed)
+    results = []
+    try:
+        async with benchmark_server(
+            fake.transport(), max(session_levels), scratch / "generated"
+        ) as server:
+            for sessions in session_levels:
+                server._circuit_breakers.clear()
+                server._retry_budgets.clear()
+                (scratch / "generated").mkdir(exist_ok=True)
+                result = await run_load_level(
+                    server.app, sessions, duration, mix or DEFAULT_MIX, source, scratch, seed
+                )
+                results.append(result)
+                shutil.rmtree(scratch / "generated", ignore_errors=True)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def print_report(results: list[dict[str, Any]]) -> None:
+    """Print a short human-readable table of the results."""
+    print(f"\n{'sessions':>8}{'calls/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"
+          f"{'lag p99':>10}{'lag max':>10}{'rss MiB':>10}")
+    for r in results:
+        latency, lag = r["latency_ms"], r["loop_lag_ms"]
+        print(f"{r['sessions']:>8}{r['calls_per_second']:>10}{latency.get('p50', 0):>10}"
+              f"{latency.get('p99', 0):>10}{r['errors']:>8}{lag.get('p99', 0):>10}"
+              f"{lag.get('max', 0):>10}{r['peak_rss_mb']:>10}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command-line entry point."""
+    from benchmarks.run import environment, int_list, parse_profiles
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Small run for smoke testing")
+    parser.add_argument("--output", type=Path, default=Path("load-test-results.json"))
+    parser.add_argument("--sessions", type=int_list, default=[1, 8, 32, 128])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument(
+        "--mix",
+        default=",".join(f"{tool}={weight}" for tool, weight in DEFAULT_MIX.items()),
+        help="Relative weights of the tool calls",
+    )
+    parser.add_argument("--profile", action="append", default=[], help="See benchmarks/run.py")
+    parser.add_argument("--source-size", type=int, default=1024)
+    parser.add_argument("--workdir", type=Path, default=None, help="Scratch directory")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.sessions, args.duration, args.source_size = [1, 8], 2.0, 256
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    results = asyncio.run(
+        run_load_test(
+            args.sessions,
+            args.duration,
+            mix,
+            profiles=parse_profiles(args.profile),
+            source_size=args.source_size,
+            workdir=args.workdir,
+            seed=args.seed,
+        )
+    )
+    document = {"meta": {**environment(), "mix": mix}, "load": results}
+    args.output.write_text(json.dumps(document, indent=2) + "\n")
+    print_report(results)
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
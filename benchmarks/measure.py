@@ -0,0 +1,102 @@
+"""
+Measurement helpers shared by the benchmarks: latency summaries and a sampler for the
+process's resident memory and open file descriptors.
+"""
+
+import asyncio
+import os
+import resource
+import sys
+from typing import Any, Optional
+
+from imagegen_mcp.routing import percentile
+
+
+def latency_summary(seconds: list[float]) -> dict[str, Any]:
+    """
+    Summarize durations in milliseconds.
+
+    Args:
+        seconds: Durations in seconds
+
+    Returns:
+        count, mean, p50, p90, p99 and max in milliseconds (only count when empty)
+    """
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "mean": round(sum(seconds) / len(seconds) * 1000, 3),
+        "p50": round(percentile(seconds, 0.5) * 1000, 3),
+        "p90": round(percentile(seconds, 0.9) * 1000, 3),
+        "p99": round(percentile(seconds, 0.99) * 1000, 3),
+        "max": round(max(seconds) * 1000, 3),
+    }
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where the current value is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def open_fds() -> Optional[int]:
+    """Number of open file descriptors, or None if the platform cannot tell."""
+    for directory in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(directory))
+        except OSError:
+            continue
+    return None
+
+
+class ResourceSampler:
+    """Samples RSS and open descriptors in the background and keeps the peaks."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        """
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self.peak_fds: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> None:
+        """Take one sample."""
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+        fds = open_fds()
+        if fds is not None:
+            self.peak_fds = fds if self.peak_fds is None else max(self.peak_fds, fds)
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self) -> "ResourceSampler":
+        self.start_rss = rss_bytes()
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the starting and peak RSS (MiB) and the peak descriptor count."""
+        return {
+            "start_rss_mb": round(self.start_rss / 2**20, 1),
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+            "peak_fds": self.peak_fds,
+        }
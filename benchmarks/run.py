@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Run the offline benchmarks and write a machine-readable results file.
+
+    python benchmarks/run.py --quick
+    python benchmarks/run.py --profile huggingface:latency_ms=400,error_rate=0.05
+    python benchmarks/run.py --compare baseline.json --threshold 15
+
+Nothing touches the network: providers are served by ``benchmarks.fake_providers``.
+With ``--compare`` the run exits with status 1 when throughput drops or latency rises
+by more than the threshold relative to the baseline file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_generation import PROVIDERS, run_generation_benchmarks  # noqa: E402
+from benchmarks.bench_imaging import CASES, DEFAULT_SIZES, run_imaging_benchmarks  # noqa: E402
+from benchmarks.fake_providers import FakeProviderProfile  # noqa: E402
+
+
+def int_list(value: str) -> list[int]:
+    """Parse a comma-separated list of integers."""
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def parse_profiles(specs: list[str]) -> dict[str, FakeProviderProfile]:
+    """Parse ``provider:key=value,...`` options (a bare ``key=value,...`` applies to all)."""
+    profiles: dict[str, FakeProviderProfile] = {}
+    for spec in specs:
+        provider, _, settings = spec.rpartition(":")
+        for name in [provider] if provider else PROVIDERS:
+            profiles[name] = FakeProviderProfile.parse(settings)
+    return profiles
+
+
+def environment() -> dict[str, Any]:
+    """Describe the machine and versions the results were measured with."""
+    import httpx
+    import PIL
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "httpx": httpx.__version__,
+    }
+
+
+def _change(baseline: float, current: float) -> float:
+    return (current - baseline) / baseline * 100 if baseline else 0.0
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float) -> list[str]:
+    """
+    Compare two results files.
+
+    Generation levels regress when throughput drops or p99 latency rises by more than
+    ``threshold`` percent; imaging cases regress when p50 latency rises by more than it.
+    Entries present in only one file are ignored.
+
+    Returns:
+        One message per regression
+    """
+    regressions = []
+    levels = {(r["provider"], r["concurrency"]): r for r in baseline.get("generation", [])}
+    for result in current.get("generation", []):
+        key = (result["provider"], result["concurrency"])
+        if key not in levels:
+            continue
+        old = levels[key]
+        label = f"generation {key[0]} x{key[1]}"
+        drop = -_change(old["generations_per_second"], result["generations_per_second"])
+        if drop > threshold:
+            regressions.append(
+                f"{label}: throughput {old['generations_per_second']} -> "
+                f"{result['generations_per_second']} gen/s (-{drop:.1f}%)"
+            )
+        old_p99, new_p99 = old["latency_ms"].get("p99"), result["latency_ms"].get("p99")
+        if old_p99 and new_p99 and _change(old_p99, new_p99) > threshold:
+            regressions.append(
+                f"{label}: p99 {old_p99} -> {new_p99} ms (+{_change(old_p99, new_p99):.1f}%)"
+            )
+
+    cases = {(r["case"], r["size"]): r for r in baseline.get("imaging", [])}
+    for result in current.get("imaging", []):
+        key = (result["case"], result["size"])
+        if key not in cases:
+            continue
+        old_p50, new_p50 = cases[key]["latency_ms"].get("p50"), result["latency_ms"].get("p50")
+        if old_p50 and new_p50 and _change(old_p50, new_p50) > threshold:
+            regressions.append(
+                f"imaging {key[0]} {key[1]}px: p50 {old_p50} -> {new_p50} ms "
+                f"(+{_change(old_p50, new_p50):.1f}%)"
+            )
+    return regressions
+
+
+def print_report(results: dict[str, Any]) -> None:
+    """Print a short human-readable table of the results."""
+    if results["generation"]:
+        print(f"\n{'provider':<14}{'conc':>6}{'gen/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+              f"{'errors':>8}{'rss MiB':>10}{'fds':>6}")
+        for r in results["generation"]:
+            latency = r["latency_ms"]
+            print(f"{r['provider']:<14}{r['concurrency']:>6}{r['generations_per_second']:>10}"
+                  f"{latency.get('p50', 0):>10}{latency.get('p99', 0):>10}{r['errors']:>8}"
+                  f"{r['peak_rss_mb']:>10}{r['peak_fds'] or '-':>6}")
+    if results["imaging"]:
+        print(f"\n{'case':<24}{'size':>6}{'p50 ms':>10}{'p99 ms':>10}{'out KiB':>10}")
+        for r in results["imaging"]:
+            latency = r["latency_ms"]
+            print(f"{r['case']:<24}{r['size']:>6}{latency['p50']:>10}{latency['p99']:>10}"
+                  f"{r['output_bytes'] // 1024:>10}")
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the selected benchmarks."""
+    results: dict[str, Any] = {"meta": environment(), "generation": [], "imaging": []}
+    if not args.skip_generation:
+        results["generation"] = await run_generation_benchmarks(
+            args.providers,
+            args.concurrency,
+            args.requests,
+            profiles=parse_profiles(args.profile),
+            workdir=args.workdir,
+            seed=args.seed,
+        )
+    if not args.skip_imaging:
+        results["imaging"] = await run_imaging_benchmarks(
+            args.sizes, args.repeats, workdir=args.workdir, cases=args.cases
+        )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Small run for smoke testing")
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--providers", type=lambda v: v.split(","), default=list(PROVIDERS))
+    parser.add_argument("--concurrency", type=int_list, default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Tool calls per level")
+    parser.add_argument(
+        "--profile",
+        action="append",
+        default=[],
+        help="Fake provider behaviour, e.g. openai:latency_ms=800,payload_bytes=2000000",
+    )
+    parser.add_argument("--sizes", type=int_list, default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeats", type=int, default=10, help="Timed runs per imaging case")
+    parser.add_argument("--cases", type=lambda v: v.split(","), help="Imaging cases to run")
+    parser.add_argument("--skip-generation", action="store_true")
+    parser.add_argument("--skip-imaging", action="store_true")
+    parser.add_argument("--workdir", type=Path, default=None, help="Scratch directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", type=Path, help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.concurrency, args.requests = [1, 8], 20
+        args.sizes, args.repeats = [512], 3
+    unknown = set(args.cases or ()) - set(CASES)
+    if unknown:
+        choices = ", ".join(CASES)
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))} (choose from {choices})")
+
+    results = asyncio.run(run(args))
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    print_report(results)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), results, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold}% against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
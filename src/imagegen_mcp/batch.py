@@ -0,0 +1,134 @@
+"""
+Planning for directory batch processing.
+
+``batch_process_directory`` runs the ``process_image`` pipeline over every file a glob
+matches. This module works out where each file's outputs go (mirroring the directory
+layout below the glob's fixed prefix), which sources would write the same output, and
+whether outputs are already up to date, so reruns only touch files whose source changed.
+"""
+
+import glob
+from pathlib import Path
+from typing import Any, Optional
+
+from PIL import Image
+
+from imagegen_mcp.imaging import SUPPORTED_FORMATS, format_extension
+
+
+def pattern_root(pattern: str) -> Path:
+    """
+    Return the directory part of a glob pattern before the first wildcard.
+
+    ``generated_images/**/*.png`` -> ``generated_images``
+    """
+    parts = []
+    for part in Path(pattern).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    else:
+        # No wildcard: the pattern names a single file
+        parts = parts[:-1]
+    return Path(*parts) if parts else Path(".")
+
+
+def is_within(path: Path, directory: Path) -> bool:
+    """Whether ``path`` is ``directory`` or below it."""
+    return path.resolve().is_relative_to(directory.resolve())
+
+
+def plan_outputs(
+    source: Path,
+    root: Path,
+    output_dir: Path,
+    operations: list[dict[str, Any]],
+    outputs: Optional[list[dict[str, Any]]] = None,
+) -> list[dict[str, Any]]:
+    """
+    Resolve the output specs of one source file.
+
+    Each output is written to ``output_dir`` under the source's directory relative to
+    ``root``, named ``<stem><suffix>.<ext>``. The format comes from the output spec, else
+    the pipeline's last ``convert`` operation, else the source's extension.
+
+    Args:
+        source: Source image
+        root: Directory the relative layout is taken from
+        output_dir: Destination root
+        operations: Pipeline operations (only ``convert`` is read here)
+        outputs: Output specs with optional format, quality, effort and suffix
+
+    Returns:
+        ``process_image`` output specs with format, quality, effort and output_path set
+
+    Raises:
+        ValueError: For unsupported or unknown formats
+    """
+    converts = [spec for spec in operations if spec.get("op") == "convert"]
+    default = converts[-1] if converts else {}
+    try:
+        relative = source.parent.resolve().relative_to(root.resolve())
+    except ValueError:
+        relative = Path()
+
+    planned = []
+    for spec in outputs or [{}]:
+        output_format = spec.get("format") or default.get("format")
+        if not output_format:
+            output_format = Image.registered_extensions().get(source.suffix.lower())
+        if not output_format or output_format.upper() not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported format. Choose from: {SUPPORTED_FORMATS}")
+        output_format = output_format.upper()
+        name = f"{source.stem}{spec.get('suffix', '')}.{format_extension(output_format)}"
+        planned.append(
+            {
+                "format": output_format,
+                "quality": spec.get("quality", default.get("quality", 95)),
+                "effort": spec.get("effort", default.get("effort")),
+                "output_path": str(output_dir / relative / name),
+            }
+        )
+    return planned
+
+
+def find_collisions(plans: dict[Path, list[dict[str, Any]]]) -> dict[Path, str]:
+    """
+    Find sources whose planned outputs would overwrite another source's.
+
+    Sources that differ only in extension (``a.png`` and ``a.jpg``) map to the same
+    output once converted to one format.
+
+    Args:
+        plans: ``plan_outputs`` result for every source in the batch
+
+    Returns:
+        Error message for each colliding source
+    """
+    claimed: dict[str, list[Path]] = {}
+    for source, planned in plans.items():
+        for spec in planned:
+            sources = claimed.setdefault(spec["output_path"], [])
+            if source not in sources:
+                sources.append(source)
+
+    errors: dict[Path, str] = {}
+    for output_path, sources in claimed.items():
+        if len(sources) < 2:
+            continue
+        for source in sources:
+            others = ", ".join(str(other) for other in sources if other != source)
+            errors.setdefault(source, f"Output {output_path} would also be written for {others}")
+    return errors
+
+
+def is_up_to_date(source: Path, planned: list[dict[str, Any]]) -> bool:
+    """Whether every planned output exists and is at least as new as ``source``."""
+    source_mtime = source.stat().st_mtime_ns
+    for spec in planned:
+        try:
+            if Path(spec["output_path"]).stat().st_mtime_ns < source_mtime:
+                return False
+        except FileNotFoundError:
+            return False
+    return True
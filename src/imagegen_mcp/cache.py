@@ -0,0 +1,277 @@
+"""
+Content-addressed cache for generated images.
+
+Results are keyed on the normalized generation request (provider, model, prompt,
+size, seed). Image bytes are stored once per content hash, and entries are evicted
+least-recently-used first once the byte or entry budget is exceeded.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from imagegen_mcp.config import env_bool, env_int, env_str
+
+INDEX_FILENAME = "index.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class CacheEntry:
+    """One cached generation result."""
+
+    digest: str
+    size_bytes: int
+    suffix: str
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class CacheHit:
+    """A cache lookup result pointing at the stored image."""
+
+    path: Path
+    metadata: dict[str, Any]
+
+
+def make_cache_key(
+    provider: str,
+    model: Optional[str],
+    prompt: str,
+    size: str,
+    seed: Optional[int],
+) -> str:
+    """
+    Build a stable cache key from generation parameters.
+
+    Args:
+        provider: Provider name
+        model: Resolved model name (defaults already applied)
+        prompt: Text prompt
+        size: Size in WIDTHxHEIGHT format
+        seed: Optional seed
+
+    Returns:
+        Hex digest identifying the request
+    """
+    normalized = {
+        "provider": provider.strip().lower(),
+        "model": model,
+        "prompt": " ".join(prompt.split()),
+        "size": size.strip().lower(),
+        "seed": seed,
+    }
+    encoded = json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    """
+    Persistent LRU cache of generated images.
+
+    Lookups only touch in-memory state and a single ``stat``; the on-disk index is
+    rewritten when entries are added or evicted and on ``flush``.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, max_entries: int) -> None:
+        """
+        Args:
+            root: Directory holding the index and stored objects
+            max_bytes: Maximum total bytes of stored images
+            max_entries: Maximum number of cached requests
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._refcounts: dict[str, int] = {}
+        self._total_bytes = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_env(cls, default_root: Path) -> Optional["GenerationCache"]:
+        """
+        Build a cache from ``IMAGEGEN_CACHE_*`` environment variables.
+
+        Args:
+            default_root: Cache directory used when IMAGEGEN_CACHE_DIR is unset
+
+        Returns:
+            GenerationCache, or None if caching is disabled
+        """
+        if not env_bool("CACHE_ENABLED", True):
+            return None
+        return cls(
+            root=Path(env_str("CACHE_DIR", str(default_root))),
+            max_bytes=env_int("CACHE_MAX_BYTES", 512 * 1024 * 1024),
+            max_entries=env_int("CACHE_MAX_ENTRIES", 1000),
+        )
+
+    @property
+    def total_bytes(self) -> int:
+        """Total bytes of stored images."""
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def object_path(self, digest: str, suffix: str) -> Path:
+        """Return where the object with ``digest`` is stored."""
+        return self.root / "objects" / digest[:2] / f"{digest}{suffix}"
+
+    def get(self, key: str) -> Optional[CacheHit]:
+        """
+        Look up a cached result and mark it most recently used.
+
+        Args:
+            key: Key from ``make_cache_key``
+
+        Returns:
+            CacheHit, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                path = self.object_path(entry.digest, entry.suffix)
+                if path.exists():
+                    self._entries.move_to_end(key)
+                    self._dirty = True
+                    self.hits += 1
+                    return CacheHit(path=path, metadata=dict(entry.metadata))
+                # Stored object was removed behind our back
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        key: str,
+        image_path: Path,
+        metadata: dict[str, Any],
+        digest: Optional[str] = None,
+    ) -> Path:
+        """
+        Store an image for ``key``, evicting LRU entries if over budget.
+
+        Args:
+            key: Key from ``make_cache_key``
+            image_path: Generated image to store
+            metadata: Result metadata to return on later hits
+            digest: SHA-256 of the image if already known (skips re-reading the file)
+
+        Returns:
+            Path of the stored object
+        """
+        image_path = Path(image_path)
+        digest = digest or hash_file(image_path)
+        size_bytes = image_path.stat().st_size
+        suffix = image_path.suffix or ".png"
+        target = self.object_path(digest, suffix)
+
+        with self._lock:
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+                # A copy, not a hardlink: edits to the caller's file must not reach the store
+                shutil.copyfile(image_path, tmp_path)
+                os.replace(tmp_path, target)
+
+            previous = self._entries.get(key)
+            if previous is not None:
+                self._drop(key, delete_orphan=previous.digest != digest)
+            entry = CacheEntry(digest=digest, size_bytes=size_bytes, suffix=suffix)
+            entry.metadata = {k: v for k, v in metadata.items() if k != "image_path"}
+            self._add(key, entry)
+            self._evict()
+            self._write_index()
+        return target
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss counters and current usage."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+        }
+
+    def flush(self) -> None:
+        """Persist LRU order if it changed since the last write."""
+        with self._lock:
+            if self._dirty:
+                self._write_index()
+
+    def _add(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        count = self._refcounts.get(entry.digest, 0)
+        if count == 0:
+            self._total_bytes += entry.size_bytes
+        self._refcounts[entry.digest] = count + 1
+        self._dirty = True
+
+    def _drop(self, key: str, delete_orphan: bool = True) -> None:
+        entry = self._entries.pop(key)
+        remaining = self._refcounts.get(entry.digest, 1) - 1
+        if remaining > 0:
+            self._refcounts[entry.digest] = remaining
+        else:
+            self._refcounts.pop(entry.digest, None)
+            self._total_bytes -= entry.size_bytes
+            if delete_orphan:
+                self.object_path(entry.digest, entry.suffix).unlink(missing_ok=True)
+        self._dirty = True
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def _load(self) -> None:
+        index_path = self.root / INDEX_FILENAME
+        if not index_path.exists():
+            return
+        try:
+            records = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # A corrupt index only costs us the cached results
+            return
+        for record in records if isinstance(records, list) else []:
+            try:
+                key = record.pop("key")
+                entry = CacheEntry(**record)
+            except (AttributeError, KeyError, TypeError):
+                continue  # Malformed record: skipped like a missing object
+            if self.object_path(entry.digest, entry.suffix).exists():
+                self._add(key, entry)
+        self._evict()
+        self._dirty = False
+
+    def _write_index(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        records = [{"key": key, **asdict(entry)} for key, entry in self._entries.items()]
+        index_path = self.root / INDEX_FILENAME
+        tmp_path = index_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(records), encoding="utf-8")
+        os.replace(tmp_path, index_path)
+        self._dirty = False
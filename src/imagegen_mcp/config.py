@@ -0,0 +1,74 @@
+"""
+Environment-driven configuration helpers.
+
+All tunables are read from environment variables prefixed with ``IMAGEGEN_`` so the
+server can be configured from an MCP client's ``env`` block without code changes.
+"""
+
+import json
+import os
+from typing import Any, Optional
+
+ENV_PREFIX = "IMAGEGEN_"
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+_FALSE_VALUES = {"0", "false", "no", "off"}
+
+
+def _raw(name: str) -> Optional[str]:
+    value = os.getenv(f"{ENV_PREFIX}{name}")
+    if value is None or value.strip() == "":
+        return None
+    return value.strip()
+
+
+def env_str(name: str, default: str) -> str:
+    """Read a string setting, falling back to ``default`` when unset."""
+    value = _raw(name)
+    return default if value is None else value
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer setting, falling back to ``default`` when unset."""
+    value = _raw(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError as e:
+        raise ValueError(f"{ENV_PREFIX}{name} must be an integer, got {value!r}") from e
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting, falling back to ``default`` when unset."""
+    value = _raw(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError as e:
+        raise ValueError(f"{ENV_PREFIX}{name} must be a number, got {value!r}") from e
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting (1/0, true/false, yes/no, on/off)."""
+    value = _raw(name)
+    if value is None:
+        return default
+    lowered = value.lower()
+    if lowered in _TRUE_VALUES:
+        return True
+    if lowered in _FALSE_VALUES:
+        return False
+    raise ValueError(f"{ENV_PREFIX}{name} must be a boolean, got {value!r}")
+
+
+def env_json(name: str, default: Any) -> Any:
+    """Read a JSON-encoded setting, falling back to ``default`` when unset."""
+    value = _raw(name)
+    if value is None:
+        return default
+    try:
+        return json.loads(value)
+    except ValueError as e:
+        raise ValueError(f"{ENV_PREFIX}{name} must be valid JSON") from e
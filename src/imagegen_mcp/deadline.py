@@ -0,0 +1,143 @@
+"""
+Per-call deadlines.
+
+A tool call with ``deadline_ms`` runs inside a deadline scope kept in a context
+variable. Each stage (rate-limit queuing, retries, HTTP timeouts) caps its own
+waits at whatever is left of the budget, and the whole call is cancelled once the
+budget runs out. The error names the stage that was running at the time.
+"""
+
+import asyncio
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+# Timers may fire this much before the monotonic clock reaches their deadline
+_CLOCK_RESOLUTION = time.get_clock_info("monotonic").resolution
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call runs past its ``deadline_ms``."""
+
+
+class Deadline:
+    """An absolute monotonic deadline and the stage currently spending it."""
+
+    def __init__(self, seconds: Optional[float]) -> None:
+        """
+        Args:
+            seconds: Budget from now (None: unbounded, only the stage is tracked)
+        """
+        self.budget = seconds
+        self.expires_at = math.inf if seconds is None else time.monotonic() + seconds
+        self.stage = "starting"
+
+    @property
+    def bounded(self) -> bool:
+        """Whether the deadline limits anything."""
+        return self.budget is not None
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "imagegen_deadline", default=None
+)
+
+
+def current() -> Optional[Deadline]:
+    """Return the running call's deadline, if it has one."""
+    return _current.get()
+
+
+def set_stage(stage: str) -> None:
+    """Record what the call is doing, for the error message if the deadline passes."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.stage = stage
+
+
+def cap(seconds: Optional[float]) -> Optional[float]:
+    """Limit a wait to the remaining budget (None means no limit on either side)."""
+    deadline = _current.get()
+    if deadline is None or not deadline.bounded:
+        return seconds
+    if seconds is None:
+        return deadline.remaining()
+    return min(seconds, deadline.remaining())
+
+
+def cap_absolute(expires_at: float) -> float:
+    """Limit an absolute ``time.monotonic()`` deadline to the call's deadline."""
+    deadline = _current.get()
+    return expires_at if deadline is None else min(expires_at, deadline.expires_at)
+
+
+def cap_timeout(timeout: httpx.Timeout) -> httpx.Timeout:
+    """Limit each phase of an httpx timeout to the remaining budget."""
+    deadline = _current.get()
+    if deadline is None or not deadline.bounded:
+        return timeout
+    return httpx.Timeout(
+        connect=cap(timeout.connect),
+        read=cap(timeout.read),
+        write=cap(timeout.write),
+        pool=cap(timeout.pool),
+    )
+
+
+@contextmanager
+def scope(seconds: Optional[float]) -> Iterator[Deadline]:
+    """
+    Run the enclosed code under a deadline (never later than an enclosing one).
+
+    ``None`` opens an unbounded scope that only tracks the stage, for work that must not
+    inherit an enclosing deadline.
+    """
+    outer = _current.get()
+    deadline = Deadline(seconds)
+    if seconds is not None and outer is not None and outer.expires_at < deadline.expires_at:
+        deadline.expires_at = outer.expires_at
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+async def run_within(deadline_ms: float, awaitable: Awaitable[T]) -> T:
+    """
+    Await ``awaitable`` under a ``deadline_ms`` budget, cancelling it when time runs out.
+
+    Args:
+        deadline_ms: Budget in milliseconds
+        awaitable: Work to run
+
+    Returns:
+        The awaitable's result
+
+    Raises:
+        DeadlineExceededError: If the budget runs out first (a ``TimeoutError`` raised by
+            the work itself while budget remains is passed through unchanged)
+    """
+    if deadline_ms <= 0:
+        raise ValueError("deadline_ms must be positive")
+    with scope(deadline_ms / 1000) as deadline:
+        try:
+            return await asyncio.wait_for(awaitable, deadline.remaining())
+        except asyncio.TimeoutError:
+            # asyncio.TimeoutError is the builtin on 3.11+, so an OS or inner wait_for
+            # timeout lands here too; only blame the deadline once it has run out
+            if deadline.remaining() > _CLOCK_RESOLUTION:
+                raise
+            raise DeadlineExceededError(
+                f"Deadline of {deadline_ms:g} ms exceeded while {deadline.stage}"
+            ) from None
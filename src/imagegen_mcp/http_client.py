@@ -0,0 +1,184 @@
+"""
+Shared, pooled HTTP clients for image providers.
+
+Each provider gets one long-lived ``httpx.AsyncClient`` so connections (and TLS
+sessions) are reused across generations instead of being set up on every call.
+"""
+
+import importlib.util
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import httpx
+
+from imagegen_mcp import tracing
+from imagegen_mcp.config import env_bool, env_float, env_int
+from imagegen_mcp.metrics import MetricsRegistry
+
+# Read timeouts per provider; HuggingFace can be slow on cold starts.
+DEFAULT_READ_TIMEOUTS = {
+    "openai": 60.0,
+    "pollinations": 60.0,
+    "huggingface": 120.0,
+}
+
+
+@dataclass(frozen=True)
+class HttpClientConfig:
+    """Connection pool and timeout settings for one provider client."""
+
+    http2: bool = False
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 60.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls, provider: str) -> "HttpClientConfig":
+        """
+        Build a config from ``IMAGEGEN_HTTP_*`` environment variables.
+
+        The read timeout can be overridden per provider with
+        ``IMAGEGEN_<PROVIDER>_READ_TIMEOUT``.
+
+        Args:
+            provider: Provider name (e.g. "openai")
+
+        Returns:
+            HttpClientConfig for the provider
+        """
+        default_read = DEFAULT_READ_TIMEOUTS.get(provider, cls.read_timeout)
+        return cls(
+            http2=env_bool("HTTP2", cls.http2),
+            max_connections=env_int("HTTP_MAX_CONNECTIONS", cls.max_connections),
+            max_keepalive_connections=env_int(
+                "HTTP_MAX_KEEPALIVE", cls.max_keepalive_connections
+            ),
+            keepalive_expiry=env_float("HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry),
+            connect_timeout=env_float("HTTP_CONNECT_TIMEOUT", cls.connect_timeout),
+            read_timeout=env_float(
+                f"{provider.upper()}_READ_TIMEOUT",
+                env_float("HTTP_READ_TIMEOUT", default_read),
+            ),
+            write_timeout=env_float("HTTP_WRITE_TIMEOUT", cls.write_timeout),
+            pool_timeout=env_float("HTTP_POOL_TIMEOUT", cls.pool_timeout),
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        """Return the httpx timeout for this config."""
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+    def limits(self) -> httpx.Limits:
+        """Return the httpx pool limits for this config."""
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+def http2_available() -> bool:
+    """Whether the optional ``h2`` package needed for HTTP/2 is installed."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class HttpClientPool:
+    """
+    Lazily created, long-lived HTTP clients keyed by provider.
+
+    Clients are created on first use and kept open until ``aclose`` is called,
+    normally when the server shuts down.
+    """
+
+    def __init__(
+        self,
+        configs: Optional[dict[str, HttpClientConfig]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ) -> None:
+        """
+        Args:
+            configs: Optional per-provider configs (defaults come from the environment)
+            transport: Optional transport shared by all clients (used for testing)
+            metrics: Optional registry receiving time-to-first-byte and status counts
+        """
+        self._configs = dict(configs or {})
+        self._transport = transport
+        self._metrics = metrics
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def config_for(self, provider: str) -> HttpClientConfig:
+        """Return the config used for a provider's client."""
+        if provider not in self._configs:
+            self._configs[provider] = HttpClientConfig.from_env(provider)
+        return self._configs[provider]
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """
+        Return the shared client for a provider, creating it on first use.
+
+        Args:
+            provider: Provider name (e.g. "openai")
+
+        Returns:
+            The provider's pooled AsyncClient
+        """
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            config = self.config_for(provider)
+            client = httpx.AsyncClient(
+                timeout=config.timeout(),
+                limits=config.limits(),
+                # Fall back to HTTP/1.1 when the optional h2 package is missing
+                http2=config.http2 and http2_available(),
+                transport=self._transport,
+                event_hooks=self._event_hooks(provider),
+            )
+            self._clients[provider] = client
+        return client
+
+    def _event_hooks(self, provider: str) -> dict[str, list[Any]]:
+        """
+        Hooks tracing connection/HTTP phases and timing each request from send to
+        response headers (time to first byte).
+        """
+        metrics = self._metrics
+
+        async def on_request(request: httpx.Request) -> None:
+            trace = tracing.httpcore_trace()
+            if trace is not None:
+                request.extensions["trace"] = trace
+            if metrics is not None:
+                request.extensions["imagegen_sent_at"] = time.perf_counter()
+
+        if metrics is None:
+            return {"request": [on_request]}
+
+        async def on_response(response: httpx.Response) -> None:
+            sent_at = response.request.extensions.get("imagegen_sent_at")
+            if sent_at is not None:
+                metrics.observe(
+                    "stage_duration_seconds",
+                    time.perf_counter() - sent_at,
+                    stage="ttfb",
+                    component=provider,
+                )
+            metrics.inc("http_responses_total", provider=provider, status=response.status_code)
+
+        return {"request": [on_request], "response": [on_response]}
+
+    async def aclose(self) -> None:
+        """Close every client and release pooled connections."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
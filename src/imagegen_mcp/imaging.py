@@ -0,0 +1,1333 @@
+"""
+Synchronous Pillow operations.
+
+These functions do the CPU-bound image work and are meant to run in the image
+worker pool, never on the event loop. They take and return paths and plain
+values only, so a process pool never has to ship decoded pixels between processes.
+"""
+
+import io
+import math
+import os
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional, cast
+
+from PIL import ExifTags, Image, ImageColor, ImageSequence, TiffImagePlugin
+
+from imagegen_mcp import tracing
+from imagegen_mcp.config import env_int, env_str
+from imagegen_mcp.storage import write_bytes_atomic
+
+# Supported formats
+SUPPORTED_FORMATS = ["PNG", "JPEG", "WEBP", "GIF"]
+
+# Encoder effort presets: how hard each encoder works to make the file smaller. A format
+# without an entry for a level uses its next lower one (GIF has nothing beyond "balanced")
+EFFORT_LEVELS = ["fast", "balanced", "max"]
+ENCODER_EFFORT: dict[str, dict[str, dict[str, Any]]] = {
+    "PNG": {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 6},
+        "max": {"optimize": True},
+    },
+    "JPEG": {
+        "fast": {"subsampling": "4:2:0"},
+        "balanced": {"subsampling": "4:2:0", "optimize": True},
+        "max": {"subsampling": "4:2:0", "optimize": True, "progressive": True},
+    },
+    "WEBP": {
+        "fast": {"method": 0},
+        "balanced": {"method": 4},
+        "max": {"method": 6},
+    },
+    "GIF": {
+        "fast": {},
+        "balanced": {"optimize": True},
+    },
+}
+DEFAULT_EFFORT = env_str("ENCODE_EFFORT", "balanced").lower()
+
+# Candidate formats and quality ladder for the "AUTO" target
+AUTO_FORMAT = "AUTO"
+AUTO_CANDIDATE_FORMATS = ["WEBP", "JPEG", "PNG"]
+AUTO_QUALITY_LADDER = (95, 90, 85, 80, 75, 70, 60, 50, 40, 30)
+
+
+# Downscale factors at or above this use Image.reduce before the final filter
+REDUCING_GAP = 2.0
+
+# Largest image decoded whole; bigger sources are shrunk while decoding or rejected.
+# Pillow's decompression bomb check stays on; a source it refuses for its size alone is
+# reopened by _open_bounded and held to this limit instead.
+MAX_IMAGE_PIXELS = env_int("MAX_IMAGE_PIXELS", 89_478_485)
+
+# Pixels decoded at a time when an oversized source is shrunk strip by strip
+STRIP_PIXELS = 4 * 1024 * 1024
+
+# Target formats that keep every frame of an animated source
+ANIMATED_FORMATS = ["GIF", "WEBP"]
+
+# Frames held at once while streaming an animation (decoder, converted frame, encoder)
+ANIMATED_RESIDENT_FRAMES = 4
+
+# File extensions for each supported format
+FORMAT_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp", "GIF": "gif"}
+
+
+def target_size(
+    source_size: tuple[int, int],
+    width: Optional[int],
+    height: Optional[int],
+    maintain_aspect: bool = True,
+) -> tuple[int, int]:
+    """
+    Work out the output dimensions for a resize request.
+
+    Args:
+        source_size: (width, height) of the source image
+        width: Requested width (if None, calculated from height)
+        height: Requested height (if None, calculated from width)
+        maintain_aspect: Whether to keep the source aspect ratio; when both width and
+            height are given, width wins
+
+    Returns:
+        (width, height) to resize to
+    """
+    if width is None and height is None:
+        raise ValueError("Must specify at least width or height")
+
+    if maintain_aspect:
+        if width:
+            # Use width, calculate height
+            aspect = source_size[1] / source_size[0]
+            height = int(width * aspect)
+        elif height:
+            aspect = source_size[0] / source_size[1]
+            width = int(height * aspect)
+    else:
+        width = width or source_size[0]
+        height = height or source_size[1]
+    return max(1, int(width or 1)), max(1, int(height or 1))
+
+
+def format_extension(image_format: str) -> str:
+    """Return the file extension (without dot) for an image format."""
+    return FORMAT_EXTENSIONS.get(image_format.upper(), image_format.lower())
+
+
+def flatten_alpha(img: Image.Image, background: str = "white") -> Image.Image:
+    """
+    Composite a transparent image onto a solid background.
+
+    Args:
+        img: Image to flatten (returned unchanged if it has no alpha or palette)
+        background: Pillow color string for the background, e.g. "white" or "#202020"
+
+    Returns:
+        RGB image
+    """
+    if img.mode not in ("RGBA", "LA", "P"):
+        return img
+    canvas = Image.new("RGB", img.size, ImageColor.getrgb(background))
+    if img.mode in ("P", "LA"):
+        img = img.convert("RGBA")
+    canvas.paste(img, mask=img.split()[-1])
+    return canvas
+
+
+def flatten_for_jpeg(img: Image.Image) -> Image.Image:
+    """Composite transparent images onto white so they can be saved as JPEG."""
+    return flatten_alpha(img)
+
+
+class _TimedWriter(io.RawIOBase, BinaryIO):
+    """
+    Write-only file wrapper that adds up the time spent in ``write``.
+
+    It has no ``fileno`` so Pillow hands every encoded block to ``write`` instead of
+    writing to the descriptor directly, which lets encoding and writing be timed apart.
+    Seeking is passed through for encoders that patch headers after the data.
+    """
+
+    def __init__(self, file: BinaryIO) -> None:
+        super().__init__()
+        self._file = file
+        self.write_seconds = 0.0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        started = time.perf_counter()
+        written = self._file.write(data)
+        self.write_seconds += time.perf_counter() - started
+        return written
+
+    def seekable(self) -> bool:
+        return self._file.seekable()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self) -> None:
+        self._file.flush()
+
+
+def save_image(img: Image.Image, output_path: Path, **options: Any) -> dict[str, float]:
+    """
+    Save ``img`` atomically: encode to a temporary file, then rename it into place.
+
+    A failed or interrupted encode never leaves a partial file at ``output_path``.
+
+    Args:
+        img: Image to save
+        output_path: Final path
+        **options: ``Image.save`` keyword arguments (the format is inferred from the
+            extension when not given)
+
+    Returns:
+        ``encode_ms`` (time in the encoder) and ``write_ms`` (time writing to disk)
+    """
+    output_path = Path(output_path)
+    if options.get("format") is None:
+        image_format = Image.registered_extensions().get(output_path.suffix.lower())
+        if image_format is None:
+            raise ValueError(f"unknown file extension: {output_path.suffix}")
+        options["format"] = image_format
+    return _write_atomically(output_path, options["format"], lambda f: img.save(f, **options))
+
+
+def _write_atomically(
+    output_path: Path, image_format: str, encode: Callable[[BinaryIO], None]
+) -> dict[str, float]:
+    fd, tmp_name = tempfile.mkstemp(
+        dir=output_path.parent, prefix=f".{output_path.name}.", suffix=".part"
+    )
+    try:
+        started = time.perf_counter()
+        with tracing.span("image.encode", format=image_format) as encode_span:
+            with os.fdopen(fd, "wb") as f, _TimedWriter(f) as writer:
+                encode(writer)
+                encoded = time.perf_counter()
+            encode_span.set(write_ms=round(writer.write_seconds * 1000, 3))
+        with tracing.span("file.replace", path=str(output_path)):
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, output_path)
+        finished = time.perf_counter()
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return {
+        "encode_ms": round((encoded - started - writer.write_seconds) * 1000, 3),
+        "write_ms": round((finished - encoded + writer.write_seconds) * 1000, 3),
+    }
+
+
+def save_animation(
+    source: Image.Image,
+    output_path: Path,
+    image_format: str,
+    quality: int = 95,
+    effort: Optional[str] = None,
+) -> dict[str, float]:
+    """
+    Save every frame of an animated image atomically, decoding one frame at a time.
+
+    Frames are read from ``source`` as the encoder consumes them, so only
+    ``ANIMATED_RESIDENT_FRAMES`` frames are in memory whatever the frame count. WEBP goes
+    through Pillow's animation encoder, which seeks the source frame by frame; GIF is
+    written by ``_write_gif_frames`` because Pillow's GIF writer collects all frames
+    first. Frame durations and the loop count are kept.
+
+    Args:
+        source: Opened animated image
+        output_path: Final path
+        image_format: GIF or WEBP
+        quality: WEBP quality (1-100)
+        effort: Encoder effort preset (WEBP method; GIF frames are always written as-is)
+
+    Returns:
+        ``encode_ms`` (decoding and encoding, which are interleaved) and ``write_ms``
+    """
+    options = save_options(image_format, quality, effort)
+    if image_format == "WEBP":
+        durations = []
+        for frame in ImageSequence.Iterator(source):
+            # WEBP sources only report a frame's duration once it is decoded
+            frame.load()
+            durations.append(frame.info.get("duration", 0))
+        source.seek(0)
+        loop = source.info.get("loop", 0)
+
+        def encode(f: BinaryIO) -> None:
+            source.save(f, save_all=True, duration=durations, loop=loop, **options)
+
+    elif image_format == "GIF":
+
+        def encode(f: BinaryIO) -> None:
+            _write_gif_frames(source, f, source.info.get("loop"))
+
+    else:
+        raise ValueError(f"{image_format} cannot store animations. Choose from: {ANIMATED_FORMATS}")
+    return _write_atomically(Path(output_path), image_format, encode)
+
+
+def _write_gif_frames(source: Image.Image, fp: BinaryIO, loop: Optional[int]) -> None:
+    # Each frame is a full composited canvas with its own palette. Pixels under half
+    # alpha become the transparent index and such frames are cleared before the next.
+    # Every frame is saved on its own as a one-frame GIF and its blocks are spliced in.
+    for index, frame in enumerate(ImageSequence.Iterator(source)):
+        frame.load()
+        rgba = frame.convert("RGBA")
+        clear = rgba.getchannel("A").point(lambda a: 255 if a < 128 else 0)
+        transparent = clear.getbbox() is not None
+        paletted = rgba.convert("RGB").quantize(255 if transparent else 256)
+        params: dict[str, Any] = {
+            "duration": frame.info.get("duration", 0),
+            "disposal": 2 if transparent else 1,
+        }
+        if transparent:
+            paletted.paste(255, mask=clear)
+            params["transparency"] = 255
+        if index == 0 and loop is not None:
+            params["loop"] = loop
+        single = io.BytesIO()
+        paletted.save(single, format="GIF", **params)
+        fp.write(_gif_frame_blocks(single.getvalue(), first=index == 0))
+    fp.write(b";")
+
+
+def _gif_frame_blocks(data: bytes, first: bool) -> bytes:
+    # The blocks of a one-frame GIF without its trailer. The first frame keeps the
+    # header (as GIF89a, for the frame extensions that follow); later frames drop it and
+    # carry the global color table as a local one.
+    flags = data[10]
+    table_end = 13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)
+    if first:
+        return b"GIF89a" + data[6:-1]
+    body = data[table_end:-1]
+    pos = 0
+    while body[pos] == 0x21:
+        # Extension: introducer, label, then sub-blocks up to a zero length
+        pos += 2
+        while body[pos]:
+            pos += body[pos] + 1
+        pos += 1
+    descriptor = bytearray(body[pos : pos + 10])
+    if flags & 0x80 and not descriptor[9] & 0x80:
+        descriptor[9] |= 0x80 | (flags & 7)
+        return body[:pos] + bytes(descriptor) + data[13:table_end] + body[pos + 10 :]
+    return body
+
+def remove_outputs(result: dict[str, Any], keep: Iterable[str] = ()) -> None:
+    """
+    Delete the files listed in an operation's result.
+
+    Used when the caller was cancelled while the operation was running.
+
+    Args:
+        result: Result of ``resize_image``, ``resize_variants``, ``convert_image`` or
+            ``process_image``
+        keep: Paths that must survive (e.g. the source image)
+    """
+    protected = {str(Path(path).absolute()) for path in keep}
+    paths = [result.get("image_path")]
+    for entry in [*result.get("variants", []), *result.get("outputs", [])]:
+        paths.append(entry.get("image_path"))
+    for path in paths:
+        if path and str(Path(path).absolute()) not in protected:
+            Path(path).unlink(missing_ok=True)
+
+
+def save_options(
+    image_format: str, quality: int = 95, effort: Optional[str] = None
+) -> dict[str, Any]:
+    """
+    Return ``Image.save`` keyword arguments for a target format.
+
+    Args:
+        image_format: Target format
+        quality: Quality for lossy formats (1-100)
+        effort: Encoder effort preset (fast, balanced, max; default ``DEFAULT_EFFORT``):
+            PNG zlib level, WEBP method, JPEG optimize/progressive/subsampling
+
+    Raises:
+        ValueError: For an unknown effort preset
+    """
+    effort = (effort or DEFAULT_EFFORT).lower()
+    if effort not in EFFORT_LEVELS:
+        raise ValueError(f"Unsupported effort: {effort}. Choose from: {EFFORT_LEVELS}")
+    presets = ENCODER_EFFORT.get(image_format, {})
+    levels = EFFORT_LEVELS[: EFFORT_LEVELS.index(effort) + 1]
+    preset = next((presets[level] for level in reversed(levels) if level in presets), {})
+    save_kwargs: dict[str, Any] = {"format": image_format, **preset}
+    if image_format in ("JPEG", "WEBP"):
+        save_kwargs["quality"] = quality
+    return save_kwargs
+
+
+def decoded_bytes(size: tuple[int, int], mode: str) -> int:
+    """Bytes Pillow allocates for one decoded frame of ``size`` in ``mode``."""
+    if mode in ("1", "L", "P"):
+        per_pixel = 1
+    elif mode.startswith("I;16"):
+        per_pixel = 2
+    else:
+        # Multi-band pixels are stored as 32 bits, RGB included
+        per_pixel = 4
+    return size[0] * size[1] * per_pixel
+
+
+def working_set_bytes(size: tuple[int, int], mode: str, frame_count: int = 1) -> int:
+    """
+    Estimate the peak decoded bytes of one operation on an image, from its headers.
+
+    A still image is held decoded plus one working copy in a 32-bit mode; an animation
+    is streamed with ``ANIMATED_RESIDENT_FRAMES`` frames resident. Sources over
+    ``MAX_IMAGE_PIXELS`` count at the limit plus one strip, as they are shrunk while
+    decoding.
+
+    Args:
+        size: (width, height) of the image (or of an animation's canvas)
+        mode: Pillow mode
+        frame_count: Number of frames
+
+    Returns:
+        Estimated bytes
+    """
+    pixels = size[0] * size[1]
+    strip = 0
+    if pixels > MAX_IMAGE_PIXELS:
+        pixels = MAX_IMAGE_PIXELS
+        strip = decoded_bytes((STRIP_PIXELS, 1), "RGBA")
+    if frame_count > 1:
+        held = decoded_bytes((pixels, 1), "RGBA") * ANIMATED_RESIDENT_FRAMES
+    else:
+        held = decoded_bytes((pixels, 1), mode) + decoded_bytes((pixels, 1), "RGBA")
+    return held + strip
+
+
+def _pixel_limit_error(size: tuple[int, int], reason: str = "") -> ValueError:
+    return ValueError(
+        f"Image of {_size_text(size)} exceeds the {MAX_IMAGE_PIXELS} pixel limit "
+        f"(IMAGEGEN_MAX_IMAGE_PIXELS){reason}"
+    )
+
+
+def _check_pixels(size: tuple[int, int]) -> None:
+    if size[0] * size[1] > MAX_IMAGE_PIXELS:
+        raise _pixel_limit_error(size)
+
+
+def _open_bounded(image_path: Path) -> Image.Image:
+    # Open a source whose decode is bounded by load_bounded or _check_pixels (or that is
+    # only read for its headers). A source Pillow's bomb check refuses is reopened
+    # through its format's registered opener, which parses the same header without the
+    # check; Pillow's own limit is never changed.
+    try:
+        return Image.open(image_path)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        pass
+    with open(image_path, "rb") as f:
+        prefix = f.read(16)
+    Image.init()
+    for image_format in Image.ID:
+        factory, accept = Image.OPEN[image_format]
+        accepted = accept is None or accept(prefix)
+        if not accepted or isinstance(accepted, str):
+            continue
+        # Plugin classes (ImageFile subclasses) also take a path, and then own the file
+        opener = cast(Callable[[str, str], Image.Image], factory)
+        try:
+            return opener(str(image_path), str(image_path))
+        except (SyntaxError, IndexError, TypeError, struct.error):
+            continue
+    raise Image.UnidentifiedImageError(f"cannot identify image file {str(image_path)!r}")
+
+
+def load_bounded(
+    img: Image.Image, image_path: Path, target: Optional[tuple[int, int]] = None
+) -> tuple[Image.Image, float]:
+    """
+    Decode ``img`` without ever holding more than ``MAX_IMAGE_PIXELS`` pixels of it.
+
+    Given the size the caller will shrink to, a JPEG source is decoded in draft mode at
+    the smallest DCT scale that still covers it. A source that is still over the limit
+    is decoded strip by strip, each strip shrunk with ``Image.reduce`` as it arrives, if
+    its pixel data is stored in independently readable rows or tiles (uncompressed TIFF,
+    BMP, PPM). Any other oversized source is rejected.
+
+    Args:
+        img: Opened image, not yet loaded
+        image_path: Path ``img`` was opened from (strips are read through new handles)
+        target: Size the decoded image will be shrunk to, if known
+
+    Returns:
+        Tuple of (decoded image, decoded width / source width)
+
+    Raises:
+        ValueError: If the source is over the limit and cannot be shrunk to fit it
+    """
+    source_width = img.size[0]
+    if target is not None and img.format == "JPEG":
+        img.draft(None, target)
+    width, height = img.size
+    if width * height <= MAX_IMAGE_PIXELS:
+        img.load()
+        return img, width / source_width
+    if target is None:
+        raise _pixel_limit_error(img.size)
+
+    factor = 2
+    while math.ceil(width / factor) * math.ceil(height / factor) > MAX_IMAGE_PIXELS:
+        factor += 1
+    if math.ceil(width / factor) < target[0] or math.ceil(height / factor) < target[1]:
+        raise _pixel_limit_error(
+            img.size, f" and {_size_text(target)} cannot be made within it"
+        )
+    strips = _raw_strips(img, image_path)
+    if strips is None:
+        raise _pixel_limit_error(
+            img.size, f" and {img.format} data cannot be decoded in strips"
+        )
+    with tracing.span("image.strip_reduce", reduce_factor=factor):
+        reduced = _strip_reduce(img, image_path, strips, factor)
+    return reduced, reduced.size[0] / source_width
+
+
+# Uncompressed pixel rows: ((left, top, right, bottom), file offset, rawmode, stride,
+# orientation), where orientation -1 means the rows are stored bottom-up
+_Strip = tuple[tuple[int, int, int, int], int, str, int, int]
+
+
+def _raw_strips(img: Image.Image, image_path: Path) -> Optional[list[_Strip]]:
+    # Full-width row ranges of at most STRIP_PIXELS covering the image, located from the
+    # file's own header, or None if its pixel data is not stored uncompressed
+    width, height = img.size
+    if img.format == "BMP":
+        regions = _bmp_regions(img, image_path)
+    elif img.format == "PPM":
+        regions = _ppm_regions(img, image_path)
+    elif isinstance(img, TiffImagePlugin.TiffImageFile):
+        regions = _tiff_regions(img)
+    else:
+        return None
+    if regions is None:
+        return None
+
+    rows = max(1, STRIP_PIXELS // width)
+    strips = []
+    for (left, top, right, bottom), offset, rawmode, stride, orientation in regions:
+        for y in range(top, bottom, rows):
+            end = min(y + rows, bottom)
+            # Bottom-up data stores the last row first
+            first_row = bottom - end if orientation < 0 else y - top
+            strips.append(
+                ((left, y, right, end), offset + first_row * stride, rawmode, stride, orientation)
+            )
+    return strips
+
+
+def _bmp_regions(img: Image.Image, image_path: Path) -> Optional[list[_Strip]]:
+    # BITMAPINFOHEADER (or later) with BI_RGB data; rows are padded to 4 bytes
+    with open(image_path, "rb") as f:
+        header = f.read(34)
+    offset = int.from_bytes(header[10:14], "little")
+    header_size = int.from_bytes(header[14:18], "little")
+    height = int.from_bytes(header[22:26], "little", signed=True)
+    bits = int.from_bytes(header[28:30], "little")
+    compression = int.from_bytes(header[30:34], "little")
+    rawmodes = {8: img.mode, 24: "BGR", 32: "BGRX"}
+    modes = ("L", "P") if bits == 8 else ("RGB",)
+    if header_size < 40 or compression != 0 or bits not in rawmodes or img.mode not in modes:
+        return None
+    stride = (img.size[0] * bits + 31) // 32 * 4
+    extents = (0, 0, *img.size)
+    return [(extents, offset, rawmodes[bits], stride, -1 if height > 0 else 1)]
+
+
+def _ppm_regions(img: Image.Image, image_path: Path) -> Optional[list[_Strip]]:
+    # Binary greymap (P5) or pixmap (P6) with 8-bit samples
+    with open(image_path, "rb") as f:
+        header = f.read(1024)
+    fields: list[bytes] = []
+    pos = 0
+    while len(fields) < 4 and pos < len(header):
+        if header[pos : pos + 1].isspace():
+            pos += 1
+        elif header[pos : pos + 1] == b"#":
+            pos = header.find(b"\n", pos) + 1 or len(header)
+        else:
+            end = pos
+            while end < len(header) and not header[end : end + 1].isspace():
+                end += 1
+            fields.append(header[pos:end])
+            pos = end
+    # A single whitespace character separates the header from the pixels
+    if len(fields) < 4 or fields[0] not in (b"P5", b"P6") or int(fields[3]) > 255:
+        return None
+    rawmode = "L" if fields[0] == b"P5" else "RGB"
+    if img.mode != rawmode:
+        return None
+    stride = img.size[0] * len(rawmode)
+    return [((0, 0, *img.size), pos + 1, rawmode, stride, 1)]
+
+
+def _tiff_regions(img: TiffImagePlugin.TiffImageFile) -> Optional[list[_Strip]]:
+    # Uncompressed, chunky, stripped TIFF with 8-bit grey or RGB samples
+    tags = img.tag_v2
+    width, height = img.size
+    offsets = tags.get(273)
+    samples = {"L": 1, "RGB": 3}.get(img.mode)
+    if (
+        samples is None
+        or offsets is None
+        or tags.get(259, 1) != 1
+        or tags.get(284, 1) != 1
+        or tags.get(262) not in (1, 2)
+        or tags.get(277, 1) != samples
+        or any(bits != 8 for bits in tags.get(258, (8,)))
+    ):
+        return None
+    rows_per_strip = min(int(tags.get(278, height)), height)
+    stride = width * samples
+    regions = []
+    for index, offset in enumerate(offsets):
+        top = index * rows_per_strip
+        if top >= height:
+            break
+        extents = (0, top, width, min(top + rows_per_strip, height))
+        regions.append((extents, int(offset), img.mode, stride, 1))
+    if not regions or regions[-1][0][3] != height:
+        return None
+    return regions
+
+
+def _row_bands(strips: list[_Strip], width: int) -> Iterator[list[_Strip]]:
+    # Group consecutive row ranges into bands of about STRIP_PIXELS
+    band: list[_Strip] = []
+    for strip in strips:
+        if band and (band[-1][0][3] - band[0][0][1]) * width >= STRIP_PIXELS:
+            yield band
+            band = []
+        band.append(strip)
+    if band:
+        yield band
+
+
+def _decode_band(
+    img: Image.Image, image_path: Path, strips: list[_Strip], top: int, bottom: int
+) -> Image.Image:
+    # Decode only rows top..bottom, reading each strip's bytes and unpacking them with
+    # Image.frombytes
+    band = Image.new(img.mode, (img.size[0], bottom - top))
+    if img.palette is not None:
+        band.putpalette(img.palette.tobytes(), img.palette.mode)
+    with open(image_path, "rb") as f:
+        for (left, y0, right, y1), offset, rawmode, stride, orientation in strips:
+            f.seek(offset)
+            data = f.read(stride * (y1 - y0))
+            size = (right - left, y1 - y0)
+            strip = Image.frombytes(img.mode, size, data, "raw", rawmode, stride, orientation)
+            band.paste(strip, (left, y0 - top))
+    return band
+
+
+def _strip_reduce(
+    img: Image.Image, image_path: Path, strips: list[_Strip], factor: int
+) -> Image.Image:
+    # Image.reduce of the whole image, computed a band at a time. Rows left over when a
+    # band is not a multiple of factor are carried into the next band.
+    width, height = img.size
+    mode = {"P": "RGBA", "1": "L"}.get(img.mode, img.mode)
+    reduced = Image.new(mode, (math.ceil(width / factor), math.ceil(height / factor)))
+    carried: Optional[Image.Image] = None
+    y = 0
+    for band_strips in _row_bands(strips, width):
+        bottom = band_strips[-1][0][3]
+        band = _decode_band(img, image_path, band_strips, band_strips[0][0][1], bottom)
+        if band.mode != mode:
+            band = band.convert(mode)
+        if carried is not None:
+            joined = Image.new(mode, (width, carried.height + band.height))
+            joined.paste(carried)
+            joined.paste(band, (0, carried.height))
+            band = joined
+        usable = band.height if bottom == height else band.height - band.height % factor
+        if usable:
+            reduced.paste(band.crop((0, 0, width, usable)).reduce(factor), (0, y // factor))
+            y += usable
+        carried = band.crop((0, usable, width, band.height)) if usable < band.height else None
+    return reduced
+
+
+def resize_image(
+    image_path: str,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    maintain_aspect: bool = True,
+    output_path: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Resize an existing image file.
+
+    Args:
+        image_path: Path to the source image
+        width: Target width (if None, calculated from height)
+        height: Target height (if None, calculated from width)
+        maintain_aspect: Whether to maintain aspect ratio
+        output_path: Optional output path (defaults to *_resized.ext)
+
+    Returns:
+        Dictionary with new image path, dimensions, file size and decode/resize/encode/
+        write timings in milliseconds
+    """
+    img_path = Path(image_path)
+    if not img_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    # Calculate dimensions
+    if width is None and height is None:
+        raise ValueError("Must specify at least width or height")
+
+    with _open_bounded(img_path) as img:
+        original_size = img.size
+        width, height = target_size(img.size, width, height, maintain_aspect)
+
+        started = time.perf_counter()
+        with tracing.span("image.decode", format=img.format, size=_size_text(original_size)):
+            decoded_img, _ = load_bounded(img, img_path, (width, height))
+        decoded = time.perf_counter()
+        # Resize
+        with tracing.span("image.resize", size=_size_text((width, height))):
+            resized_img = decoded_img.resize((width, height), Image.Resampling.LANCZOS)
+        resized = time.perf_counter()
+
+    # Save
+    if output_path is None:
+        stem = img_path.stem
+        suffix = img_path.suffix
+        resolved_output = img_path.parent / f"{stem}_resized{suffix}"
+    else:
+        resolved_output = Path(output_path)
+
+    timings = save_image(resized_img, resolved_output)
+
+    return {
+        "image_path": str(resolved_output.absolute()),
+        "original_size": original_size,
+        "new_size": (width, height),
+        "file_size_bytes": resolved_output.stat().st_size,
+        "decode_ms": round((decoded - started) * 1000, 3),
+        "resize_ms": round((resized - decoded) * 1000, 3),
+        **timings,
+    }
+
+
+def resize_variants(
+    image_path: str,
+    variants: list[dict[str, Any]],
+    output_dir: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Produce several resized variants from a single decode of the source image.
+
+    The source is decoded by ``load_bounded`` for the largest variant (JPEG draft mode,
+    strip-wise shrinking of oversized sources). Variants that shrink the image by
+    ``REDUCING_GAP`` or more are pre-shrunk with ``Image.reduce`` (shared between
+    variants) before the final LANCZOS filter.
+
+    Args:
+        image_path: Path to the source image
+        variants: Variant specs with width/height, optional maintain_aspect, format,
+            quality, effort and output_path
+        output_dir: Directory for variants without an output_path (defaults to the
+            source directory)
+
+    Returns:
+        Dictionary with decode timing and per-variant paths, sizes and timings
+    """
+    if not variants:
+        raise ValueError("Must specify at least one variant")
+
+    img_path = Path(image_path)
+    if not img_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    target_dir = Path(output_dir) if output_dir else img_path.parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    with _open_bounded(img_path) as img:
+        original_size = img.size
+        source_format = img.format or "PNG"
+        sizes = [
+            target_size(
+                original_size,
+                spec.get("width"),
+                spec.get("height"),
+                spec.get("maintain_aspect", True),
+            )
+            for spec in variants
+        ]
+        formats = []
+        for spec in variants:
+            variant_format = (spec.get("format") or source_format).upper()
+            if variant_format not in SUPPORTED_FORMATS:
+                raise ValueError(f"Unsupported format. Choose from: {SUPPORTED_FORMATS}")
+            formats.append(variant_format)
+
+        started = time.perf_counter()
+        with tracing.span("image.decode", format=img.format, size=_size_text(original_size)):
+            largest = (max(w for w, _ in sizes), max(h for _, h in sizes))
+            base, draft_scale = load_bounded(img, img_path, largest)
+            # Palette and bilevel images can only be resampled with NEAREST
+            resample_mode = {"P": "RGBA", "1": "L"}.get(base.mode)
+            if resample_mode:
+                base = base.convert(resample_mode)
+        decode_ms = (time.perf_counter() - started) * 1000
+
+    reduced: dict[int, Image.Image] = {1: base}
+    results = []
+    for spec, size, variant_format in zip(variants, sizes, formats):
+        started = time.perf_counter()
+        factor = int(min(base.size[0] / size[0], base.size[1] / size[1]) / REDUCING_GAP)
+        with tracing.span("image.resize", size=_size_text(size), reduce_factor=max(1, factor)):
+            if factor >= 2 and factor not in reduced:
+                reduced[factor] = base.reduce(factor)
+            source = reduced[factor if factor >= 2 else 1]
+            resized = source.resize(size, Image.Resampling.LANCZOS)
+        resize_ms = (time.perf_counter() - started) * 1000
+
+        if spec.get("output_path"):
+            output_path = Path(spec["output_path"])
+        else:
+            extension = format_extension(variant_format)
+            output_path = target_dir / f"{img_path.stem}_{size[0]}x{size[1]}.{extension}"
+
+        if variant_format == "JPEG":
+            resized = flatten_for_jpeg(resized)
+        options = save_options(variant_format, spec.get("quality", 95), spec.get("effort"))
+        timings = save_image(resized, output_path, **options)
+
+        results.append(
+            {
+                "image_path": str(output_path.absolute()),
+                "size": size,
+                "format": variant_format,
+                "file_size_bytes": output_path.stat().st_size,
+                "reduce_factor": factor if factor >= 2 else 1,
+                "resize_ms": round(resize_ms, 3),
+                **timings,
+            }
+        )
+
+    return {
+        "source": str(img_path.absolute()),
+        "original_size": original_size,
+        "draft_scale": draft_scale,
+        "decode_ms": round(decode_ms, 3),
+        "variants": results,
+    }
+
+
+def convert_image(
+    image_path: str,
+    target_format: str,
+    output_path: Optional[str] = None,
+    quality: int = 95,
+    effort: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    candidate_formats: Optional[list[str]] = None,
+) -> dict[str, Any]:
+    """
+    Convert image to a different format.
+
+    With ``target_format="AUTO"`` several format/quality candidates are encoded one
+    after another and the smallest acceptable one is written (see ``choose_encoding``).
+    Animated sources keep every frame when converted to GIF or WEBP, streamed through
+    ``save_animation`` one frame at a time; other targets get the first frame.
+
+    Args:
+        image_path: Path to source image
+        target_format: Target format (PNG, JPEG, WEBP, GIF or AUTO)
+        output_path: Optional output path. For AUTO its extension is replaced with the
+            chosen format's (``photo.png`` may be written as ``photo.webp``); the result's
+            ``image_path`` is the file actually written
+        quality: Quality for lossy formats (1-100); for AUTO the target quality, or the
+            highest quality tried when ``max_bytes`` is set
+        effort: Encoder effort preset (fast, balanced, max)
+        max_bytes: AUTO only: byte budget for the output
+        candidate_formats: AUTO only: formats to try (default: WEBP, JPEG, PNG; JPEG is
+            skipped for images with transparency unless listed explicitly)
+
+    Returns:
+        Dictionary with new image path, format info, file size, frame counts and
+        decode/encode/write timings in milliseconds; AUTO adds every candidate's format,
+        quality, bytes and encode time
+
+    Raises:
+        ValueError: For unsupported formats, sources over ``MAX_IMAGE_PIXELS`` and AUTO
+            on an animated source
+    """
+    target_format = target_format.upper()
+    if target_format not in SUPPORTED_FORMATS and target_format != AUTO_FORMAT:
+        raise ValueError(f"Unsupported format. Choose from: {SUPPORTED_FORMATS + [AUTO_FORMAT]}")
+
+    img_path = Path(image_path)
+    if not img_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    with _open_bounded(img_path) as source:
+        frame_count = getattr(source, "n_frames", 1)
+        if frame_count > 1 and target_format in ANIMATED_FORMATS:
+            return _convert_animation(
+                source, img_path, target_format, output_path, quality, effort, frame_count
+            )
+        if frame_count > 1 and target_format == AUTO_FORMAT:
+            raise ValueError(
+                f"AUTO would keep only the first of {frame_count} frames; "
+                f"convert animations to one of {ANIMATED_FORMATS}"
+            )
+
+        started = time.perf_counter()
+        with tracing.span("image.decode", format=source.format, size=_size_text(source.size)):
+            img, _ = load_bounded(source, img_path)
+        decode_ms = (time.perf_counter() - started) * 1000
+
+        if target_format == AUTO_FORMAT:
+            selection = choose_encoding(img, quality, max_bytes, candidate_formats, effort)
+            chosen = selection["chosen"]
+            extension = format_extension(chosen["format"])
+            if output_path is None:
+                resolved_output = img_path.parent / f"{img_path.stem}.{extension}"
+            else:
+                resolved_output = Path(output_path).with_suffix(f".{extension}")
+            with tracing.span("file.replace", path=str(resolved_output)):
+                stored = write_bytes_atomic(
+                    selection["data"], resolved_output.parent, resolved_output
+                )
+            return {
+                "image_path": str(resolved_output.absolute()),
+                "format": chosen["format"],
+                "quality": chosen["quality"],
+                "original_format": img_path.suffix[1:].upper(),
+                "file_size_bytes": stored.size_bytes,
+                "frame_count": frame_count,
+                "frames_written": 1,
+                "decode_ms": round(decode_ms, 3),
+                "encode_ms": selection["encode_ms"],
+                "write_ms": round(stored.write_seconds * 1000, 3),
+                "budget_met": selection["budget_met"],
+                "candidates": selection["candidates"],
+            }
+
+        # Handle transparency for formats that don't support it
+        if target_format == "JPEG":
+            img = flatten_for_jpeg(img)
+
+        # Determine output path
+        if output_path is None:
+            resolved_output = img_path.parent / f"{img_path.stem}.{format_extension(target_format)}"
+        else:
+            resolved_output = Path(output_path)
+
+        # Save with appropriate parameters
+        timings = save_image(img, resolved_output, **save_options(target_format, quality, effort))
+
+    return {
+        "image_path": str(resolved_output.absolute()),
+        "format": target_format,
+        "original_format": img_path.suffix[1:].upper(),
+        "file_size_bytes": resolved_output.stat().st_size,
+        "frame_count": frame_count,
+        "frames_written": 1,
+        "decode_ms": round(decode_ms, 3),
+        **timings,
+    }
+
+
+def _convert_animation(
+    source: Image.Image,
+    img_path: Path,
+    target_format: str,
+    output_path: Optional[str],
+    quality: int,
+    effort: Optional[str],
+    frame_count: int,
+) -> dict[str, Any]:
+    _check_pixels(source.size)
+    if output_path is None:
+        resolved_output = img_path.parent / f"{img_path.stem}.{format_extension(target_format)}"
+    else:
+        resolved_output = Path(output_path)
+    with tracing.span("image.animation", frames=frame_count, size=_size_text(source.size)):
+        timings = save_animation(source, resolved_output, target_format, quality, effort)
+    return {
+        "image_path": str(resolved_output.absolute()),
+        "format": target_format,
+        "original_format": img_path.suffix[1:].upper(),
+        "file_size_bytes": resolved_output.stat().st_size,
+        "frame_count": frame_count,
+        "frames_written": frame_count,
+        "decode_ms": 0.0,
+        **timings,
+    }
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+
+def _encode_candidate(
+    img: Image.Image, image_format: str, quality: Optional[int], effort: Optional[str]
+) -> tuple[bytes, float]:
+    if image_format == "JPEG" and _has_alpha(img):
+        img = flatten_for_jpeg(img)
+    buffer = io.BytesIO()
+    started = time.perf_counter()
+    img.save(buffer, **save_options(image_format, quality or 95, effort))
+    return buffer.getvalue(), time.perf_counter() - started
+
+
+def choose_encoding(
+    img: Image.Image,
+    quality: int = 85,
+    max_bytes: Optional[int] = None,
+    candidate_formats: Optional[list[str]] = None,
+    effort: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Encode candidates one after another and pick the smallest acceptable one.
+
+    Candidates are encoded in the calling worker, so the operation stays within the
+    worker pool's concurrency and its memory reservation (one working copy at a time).
+
+    Without ``max_bytes`` each lossy format is encoded at ``quality`` and lossless formats
+    once; the smallest output wins. With ``max_bytes`` lossy formats are also tried down
+    the ``AUTO_QUALITY_LADDER``; the highest-quality candidate within the budget wins
+    (ties go to the smaller file). Lossless candidates count as quality 100. If nothing
+    fits the budget the smallest candidate is returned with ``budget_met`` false.
+
+    Args:
+        img: Decoded image
+        quality: Target quality, or the highest quality tried under a byte budget
+        max_bytes: Optional byte budget
+        candidate_formats: Formats to try (default ``AUTO_CANDIDATE_FORMATS`` minus JPEG
+            for images with transparency)
+        effort: Encoder effort preset
+
+    Returns:
+        Dictionary with the winning ``data`` and ``chosen`` candidate, ``budget_met``,
+        the winner's ``encode_ms`` and every candidate's format, quality, bytes and
+        encode time
+    """
+    if candidate_formats:
+        formats = [image_format.upper() for image_format in candidate_formats]
+        if any(image_format not in SUPPORTED_FORMATS for image_format in formats):
+            raise ValueError(f"Unsupported format. Choose from: {SUPPORTED_FORMATS}")
+    else:
+        formats = [
+            image_format
+            for image_format in AUTO_CANDIDATE_FORMATS
+            if not (image_format == "JPEG" and _has_alpha(img))
+        ]
+    qualities = [quality]
+    if max_bytes is not None:
+        qualities += [q for q in AUTO_QUALITY_LADDER if q < quality]
+
+    plan: list[tuple[str, Optional[int]]] = []
+    for image_format in dict.fromkeys(formats):
+        if image_format in ("JPEG", "WEBP"):
+            plan.extend((image_format, q) for q in qualities)
+        else:
+            plan.append((image_format, None))
+
+    with tracing.span("image.encode_candidates", candidates=len(plan)):
+        encoded = [_encode_candidate(img, *spec, effort) for spec in plan]
+
+    candidates: list[dict[str, Any]] = []
+    for (image_format, candidate_quality), (data, seconds) in zip(plan, encoded):
+        candidates.append(
+            {
+                "format": image_format,
+                "quality": candidate_quality,
+                "bytes": len(data),
+                "encode_ms": round(seconds * 1000, 3),
+                "meets_budget": max_bytes is None or len(data) <= max_bytes,
+            }
+        )
+
+    def rank(index: int) -> tuple[int, ...]:
+        candidate = candidates[index]
+        if max_bytes is None:
+            return (candidate["bytes"],)
+        return (-(candidate["quality"] or 100), candidate["bytes"])
+
+    fitting = [i for i, candidate in enumerate(candidates) if candidate["meets_budget"]]
+    if fitting:
+        best = min(fitting, key=rank)
+    else:
+        best = min(range(len(candidates)), key=lambda i: candidates[i]["bytes"])
+    return {
+        "data": encoded[best][0],
+        "chosen": candidates[best],
+        "budget_met": bool(fitting),
+        "encode_ms": candidates[best]["encode_ms"],
+        "candidates": candidates,
+    }
+
+
+# Operations accepted by process_image
+PIPELINE_OPERATIONS = ["crop", "resize", "rotate", "exif_transpose", "flatten", "convert"]
+
+# EXIF orientation -> transpose that displays the image upright
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Clockwise quarter turns -> lossless transpose
+QUARTER_TURNS = {
+    90: Image.Transpose.ROTATE_270,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_90,
+}
+
+
+def validate_operations(operations: list[dict[str, Any]]) -> None:
+    """
+    Check that every pipeline operation is a known one.
+
+    Raises:
+        ValueError: Naming the first unknown operation
+    """
+    for spec in operations:
+        if spec.get("op") not in PIPELINE_OPERATIONS:
+            raise ValueError(
+                f"Unknown operation: {spec.get('op')}. Choose from: {PIPELINE_OPERATIONS}"
+            )
+
+
+def _crop_box(size: tuple[int, int], spec: dict[str, Any]) -> tuple[int, int, int, int]:
+    left, top = int(spec.get("left", 0)), int(spec.get("top", 0))
+    right = int(spec.get("right", left + spec["width"] if "width" in spec else size[0]))
+    bottom = int(spec.get("bottom", top + spec["height"] if "height" in spec else size[1]))
+    if not (0 <= left < right <= size[0] and 0 <= top < bottom <= size[1]):
+        raise ValueError(
+            f"Crop box ({left}, {top}, {right}, {bottom}) is outside the {_size_text(size)} image"
+        )
+    return left, top, right, bottom
+
+
+def _apply_operation(
+    img: Image.Image, spec: dict[str, Any], orientation: Optional[int]
+) -> Image.Image:
+    op = spec["op"]
+    if op == "crop":
+        return img.crop(_crop_box(img.size, spec))
+    if op == "resize":
+        size = target_size(
+            img.size, spec.get("width"), spec.get("height"), spec.get("maintain_aspect", True)
+        )
+        # Palette and bilevel images can only be resampled with NEAREST
+        resample_mode = {"P": "RGBA", "1": "L"}.get(img.mode)
+        if resample_mode:
+            img = img.convert(resample_mode)
+        return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    if op == "rotate":
+        degrees = float(spec.get("degrees", 0)) % 360
+        if degrees == 0:
+            return img
+        if degrees in QUARTER_TURNS:
+            return img.transpose(QUARTER_TURNS[int(degrees)])
+        if img.mode in ("P", "1"):
+            img = img.convert("RGBA")
+        fill = spec.get("background")
+        return img.rotate(
+            -degrees,
+            Image.Resampling.BICUBIC,
+            expand=True,
+            fillcolor=ImageColor.getrgb(fill) if fill else None,
+        )
+    if op == "exif_transpose":
+        return img.transpose(EXIF_TRANSPOSE[orientation]) if orientation in EXIF_TRANSPOSE else img
+    if op == "flatten":
+        return flatten_alpha(img, spec.get("background", "white"))
+    raise ValueError(f"Unknown operation: {op}. Choose from: {PIPELINE_OPERATIONS}")
+
+
+def process_image(
+    image_path: str,
+    operations: list[dict[str, Any]],
+    outputs: Optional[list[dict[str, Any]]] = None,
+    output_dir: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Run a chain of operations on one decode of an image and encode the result once.
+
+    Operations run in order on the in-memory image; no intermediate files are written.
+    Supported operations (``op`` key): ``crop`` (left/top plus right/bottom or
+    width/height), ``resize`` (width/height/maintain_aspect), ``rotate`` (clockwise
+    ``degrees``, lossless for quarter turns, optional ``background``), ``exif_transpose``,
+    ``flatten`` (optional ``background``) and ``convert`` (``format``/``quality``/``effort``
+    of the output). When the pipeline starts with a resize, the source is decoded by
+    ``load_bounded`` for that size (JPEG draft mode, strip-wise shrinking of oversized
+    sources).
+
+    Args:
+        image_path: Path to the source image
+        operations: Ordered operation specs
+        outputs: Encodes of the final image, each with optional format, quality, effort
+            and output_path (default: one output using the last ``convert`` or the source
+            format)
+        output_dir: Directory for outputs without an output_path (defaults to the
+            source directory)
+
+    Returns:
+        Dictionary with decode timing, per-operation timings and per-output paths,
+        sizes and encode/write timings
+    """
+    img_path = Path(image_path)
+    if not img_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+    validate_operations(operations)
+
+    target_dir = Path(output_dir) if output_dir else img_path.parent
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    with _open_bounded(img_path) as source:
+        original_size = source.size
+        source_format = source.format or "PNG"
+        orientation = _exif_orientation(source)
+        encode_spec: dict[str, Any] = {"format": source_format}
+        for spec in operations:
+            if spec["op"] == "convert":
+                encode_spec = {
+                    key: spec[key] for key in ("format", "quality", "effort") if key in spec
+                }
+        output_specs = outputs or [encode_spec]
+
+        started = time.perf_counter()
+        with tracing.span("image.decode", format=source.format, size=_size_text(original_size)):
+            first = next((spec for spec in operations if spec["op"] != "convert"), None)
+            size = None
+            if first is not None and first["op"] == "resize":
+                size = target_size(
+                    original_size,
+                    first.get("width"),
+                    first.get("height"),
+                    first.get("maintain_aspect", True),
+                )
+            img, draft_scale = load_bounded(source, img_path, size)
+        decode_ms = (time.perf_counter() - started) * 1000
+
+    steps = []
+    for spec in operations:
+        if spec["op"] == "convert":
+            continue
+        started = time.perf_counter()
+        with tracing.span(f"image.{spec['op']}", size=_size_text(img.size)):
+            img = _apply_operation(img, spec, orientation)
+        steps.append(
+            {
+                "op": spec["op"],
+                "size": img.size,
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+        )
+
+    results = []
+    written: set[Path] = set()
+    for spec in output_specs:
+        output_format = (spec.get("format") or source_format).upper()
+        if output_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported format. Choose from: {SUPPORTED_FORMATS}")
+        if spec.get("output_path"):
+            output_path = Path(spec["output_path"])
+        else:
+            extension = format_extension(output_format)
+            output_path = target_dir / f"{img_path.stem}_processed.{extension}"
+        if output_path.absolute() in written or output_path.absolute() == img_path.absolute():
+            raise ValueError(f"Output path used twice or overwrites the source: {output_path}")
+        written.add(output_path.absolute())
+
+        encoded = flatten_for_jpeg(img) if output_format == "JPEG" else img
+        options = save_options(output_format, spec.get("quality", 95), spec.get("effort"))
+        timings = save_image(encoded, output_path, **options)
+        results.append(
+            {
+                "image_path": str(output_path.absolute()),
+                "size": img.size,
+                "format": output_format,
+                "file_size_bytes": output_path.stat().st_size,
+                **timings,
+            }
+        )
+
+    return {
+        "source": str(img_path.absolute()),
+        "original_size": original_size,
+        "draft_scale": draft_scale,
+        "decode_ms": round(decode_ms, 3),
+        "process_ms": round(sum(step["ms"] for step in steps), 3),
+        "operations": steps,
+        "outputs": results,
+    }
+
+
+def read_image_metadata(image_path: str) -> dict[str, Any]:
+    """
+    Get metadata and information about an image from its container headers.
+
+    Only the headers are parsed; pixel data is never decoded.
+
+    Args:
+        image_path: Path to the image file
+
+    Returns:
+        Dictionary with image metadata
+    """
+    img_path = Path(image_path)
+    if not img_path.exists():
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    with _open_bounded(img_path) as img:
+        frame_count = getattr(img, "n_frames", 1)
+        dpi = img.info.get("dpi")
+        return {
+            "path": str(img_path.absolute()),
+            "size": img.size,
+            "width": img.size[0],
+            "height": img.size[1],
+            "format": img.format,
+            "mode": img.mode,
+            "file_size_bytes": img_path.stat().st_size,
+            "orientation": _exif_orientation(img),
+            "has_icc_profile": bool(img.info.get("icc_profile")),
+            "frame_count": frame_count,
+            "is_animated": frame_count > 1,
+            "dpi": [float(value) for value in dpi] if dpi else None,
+        }
+
+
+def _size_text(size: tuple[int, int]) -> str:
+    return f"{size[0]}x{size[1]}"
+
+
+def _exif_orientation(img: Image.Image) -> Optional[int]:
+    if img.format == "PNG" and "exif" not in img.info:
+        # PNG may store eXIf after the pixel data; reading it would decode the image
+        return None
+    orientation = img.getexif().get(ExifTags.Base.Orientation)
+    return int(orientation) if orientation is not None else None
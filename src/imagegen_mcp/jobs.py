@@ -0,0 +1,395 @@
+"""
+Background job queue for long-running generations.
+
+``submit_generation`` returns a job ID immediately and the generation runs on one of a
+fixed number of worker tasks, so an agent is not blocked for the whole provider call.
+Jobs can be polled, awaited with a timeout, or cancelled whether queued or running.
+Finished jobs are kept for later collection up to a retention limit.
+
+With a journal attached, every transition is logged so that after a restart finished
+jobs can still be collected and jobs that were queued or running are re-issued. The
+journal is compacted to the jobs still held each time another ``retention`` jobs have
+finished, so it stays bounded on a server that is never restarted.
+"""
+
+import asyncio
+import contextvars
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Optional
+
+from imagegen_mcp.config import env_bool, env_int, env_str
+from imagegen_mcp.journal import FINISHED, STARTED, SUBMITTED, JobJournal
+from imagegen_mcp.retry import error_message
+
+JobRunner = Callable[[dict[str, Any]], Coroutine[Any, Any, dict[str, Any]]]
+
+
+class JobQueueFullError(Exception):
+    """Raised when no more jobs can be queued."""
+
+
+@dataclass
+class Job:
+    """One submitted generation and its outcome."""
+
+    job_id: str
+    arguments: dict[str, Any]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    task: Optional["asyncio.Task[dict[str, Any]]"] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    cancel_requested: bool = False
+    resumed: bool = False
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job reached a final state."""
+        return self.status in (self.SUCCEEDED, self.FAILED, self.CANCELLED)
+
+    def finish(
+        self,
+        status: str,
+        result: Optional[dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Move the job to a final state and wake anyone awaiting it."""
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.done.set()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the job's state as a JSON-serializable dict."""
+        now = time.time()
+        started = self.started_at if self.started_at is not None else now
+        status: dict[str, Any] = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "prompt": self.arguments.get("prompt"),
+            "provider": self.arguments.get("provider", "pollinations"),
+            "created_at": round(self.created_at, 3),
+            "queued_seconds": round(min(started, self.finished_at or now) - self.created_at, 3),
+        }
+        if self.started_at is not None:
+            status["run_seconds"] = round((self.finished_at or now) - self.started_at, 3)
+        if self.result is not None:
+            status["result"] = self.result
+        if self.error is not None:
+            status["error"] = self.error
+        if self.resumed:
+            status["resumed"] = True
+        return status
+
+
+class JobQueue:
+    """FIFO queue of generation jobs served by a fixed pool of worker tasks."""
+
+    def __init__(
+        self,
+        runner: JobRunner,
+        workers: int = 4,
+        max_queued: int = 100,
+        retention: int = 1000,
+        journal: Optional[JobJournal] = None,
+    ) -> None:
+        """
+        Args:
+            runner: Coroutine function executing one job's arguments
+            workers: Jobs allowed to run at the same time
+            max_queued: Jobs allowed to wait for a worker
+            retention: Finished jobs kept for status lookups
+            journal: Optional journal recording every job transition
+        """
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.retention = retention
+        self.journal = journal
+        self._finished_since_compact = 0
+        self._closing = False
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._queue: Optional[asyncio.Queue[Job]] = None
+        self._worker_tasks: list[asyncio.Task] = []
+
+    @classmethod
+    def from_env(cls, runner: JobRunner, default_journal: Optional[Path] = None) -> "JobQueue":
+        """
+        Build a queue from ``IMAGEGEN_JOB_*`` environment variables.
+
+        The journal lives at ``IMAGEGEN_JOB_JOURNAL`` (default ``default_journal``) unless
+        ``IMAGEGEN_JOB_JOURNAL_ENABLED=false``; ``IMAGEGEN_JOB_JOURNAL_FSYNC=true`` makes
+        every record durable across power loss.
+
+        Args:
+            runner: Coroutine function executing one job's arguments
+            default_journal: Journal path used when ``IMAGEGEN_JOB_JOURNAL`` is unset
+
+        Returns:
+            JobQueue
+        """
+        journal = None
+        if env_bool("JOB_JOURNAL_ENABLED", True):
+            path = env_str("JOB_JOURNAL", str(default_journal) if default_journal else "")
+            if path:
+                journal = JobJournal(Path(path), fsync=env_bool("JOB_JOURNAL_FSYNC", False))
+        return cls(
+            runner,
+            workers=env_int("JOB_WORKERS", 4),
+            max_queued=env_int("JOB_QUEUE_SIZE", 100),
+            retention=env_int("JOB_RETENTION", 1000),
+            journal=journal,
+        )
+
+    def _log(self, op: str, job: Job, **fields: Any) -> None:
+        if self.journal is None:
+            return
+        self.journal.append(op, job.job_id, **fields)
+        if op == FINISHED:
+            self._finished_since_compact += 1
+            if self._finished_since_compact >= self.retention:
+                self._compact()
+
+    def _compact(self) -> None:
+        # Rewrite the journal to the jobs still held, dropping records of evicted ones
+        self._evict()
+        states = []
+        for job in self._jobs.values():
+            state: dict[str, Any] = {
+                "job_id": job.job_id,
+                "arguments": job.arguments,
+                "created_at": job.created_at,
+                "started": job.started_at is not None,
+                "started_at": job.started_at,
+            }
+            if job.finished:
+                state.update(
+                    status=job.status,
+                    result=job.result,
+                    error=job.error,
+                    finished_at=job.finished_at,
+                )
+            states.append(state)
+        self.journal.compact(states)  # type: ignore[union-attr]
+        self._finished_since_compact = 0
+
+    def _start(self) -> asyncio.Queue:
+        # Created lazily so the queue binds to the running event loop. The workers outlive
+        # the call that starts them, so they run in an empty context rather than inheriting
+        # its deadline, progress reporter and trace
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker_tasks = [
+                contextvars.Context().run(asyncio.create_task, self._worker())
+                for _ in range(self.workers)
+            ]
+        return self._queue
+
+    def submit(self, arguments: dict[str, Any]) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            arguments: Arguments passed to the runner
+
+        Returns:
+            The queued Job
+
+        Raises:
+            JobQueueFullError: If ``max_queued`` jobs are already waiting or the queue is
+                shutting down
+        """
+        if self._closing:
+            raise JobQueueFullError("Server is shutting down; not accepting new jobs")
+        queue = self._start()
+        if queue.qsize() >= self.max_queued:
+            raise JobQueueFullError(
+                f"Job queue is full ({self.max_queued} jobs waiting); try again later"
+            )
+        job = Job(uuid.uuid4().hex, dict(arguments))
+        self._log(SUBMITTED, job, arguments=job.arguments, created_at=job.created_at)
+        self._jobs[job.job_id] = job
+        queue.put_nowait(job)
+        self._evict()
+        return job
+
+    def restore(self) -> dict[str, int]:
+        """
+        Reload jobs from the journal after a restart.
+
+        Finished jobs become available to ``get``/``wait`` again without running twice;
+        jobs that were queued or running when the server stopped are queued again and
+        marked ``resumed``. The journal is then compacted to the retained jobs.
+
+        Returns:
+            Counts of restored ``finished`` and ``resumed`` jobs
+        """
+        if self.journal is None:
+            return {"finished": 0, "resumed": 0}
+        states = self.journal.replay()
+        finished = [state for state in states if "status" in state]
+        unfinished = [state for state in states if "status" not in state]
+        finished = finished[max(0, len(finished) - self.retention):]
+
+        for state in finished:
+            job = Job(state["job_id"], state.get("arguments", {}), created_at=state["created_at"])
+            job.started_at = state.get("started_at")
+            job.finish(state["status"], state.get("result"), state.get("error"))
+            job.finished_at = state.get("finished_at", job.finished_at)
+            self._jobs[job.job_id] = job
+        queue = self._start() if unfinished else None
+        for state in unfinished:
+            job = Job(state["job_id"], state.get("arguments", {}), created_at=state["created_at"])
+            job.resumed = True
+            self._jobs[job.job_id] = job
+            queue.put_nowait(job)  # type: ignore[union-attr]
+
+        self.journal.compact([{**state, "started": False} for state in unfinished] + finished)
+        self._finished_since_compact = 0
+        return {"finished": len(finished), "resumed": len(unfinished)}
+
+    def get(self, job_id: str) -> Job:
+        """
+        Look up a job.
+
+        Raises:
+            ValueError: If the job is unknown (or already evicted)
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown job: {job_id}")
+        return job
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Job:
+        """
+        Wait for a job to finish.
+
+        Args:
+            job_id: Job to wait for
+            timeout: Seconds to wait at most; the job keeps running after a timeout
+
+        Returns:
+            The Job, finished or not
+        """
+        job = self.get(job_id)
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            The Job; finished jobs are returned unchanged
+        """
+        job = self.get(job_id)
+        if job.status == Job.QUEUED:
+            job.cancel_requested = True
+            job.finish(Job.CANCELLED)
+            self._log(FINISHED, job, status=job.status, finished_at=job.finished_at)
+        elif job.status == Job.RUNNING and job.task is not None:
+            job.cancel_requested = True
+            job.task.cancel()
+        return job
+
+    def stats(self) -> dict[str, int]:
+        """Return job counts by status plus the worker limit."""
+        statuses = (Job.QUEUED, Job.RUNNING, Job.SUCCEEDED, Job.FAILED, Job.CANCELLED)
+        counts = {status: 0 for status in statuses}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"workers": self.workers, **counts}
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            try:
+                # Once shutdown starts, queued jobs are left for the next server to resume
+                if job.status == Job.QUEUED and not self._closing:
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = Job.RUNNING
+        job.started_at = time.time()
+        self._log(STARTED, job, started_at=job.started_at)
+        job.task = asyncio.create_task(self.runner(job.arguments))
+        # Wait without propagating cancellation of the job into the worker itself
+        await asyncio.wait([job.task])
+        error = None if job.task.cancelled() else job.task.exception()
+        if job.task.cancelled():
+            job.finish(Job.CANCELLED)
+        elif error is not None:
+            job.finish(Job.FAILED, error=error_message(error))
+        else:
+            job.finish(Job.SUCCEEDED, result=job.task.result())
+        job.task = None
+        # Jobs cut short by shutdown stay unfinished in the journal so they are re-issued
+        if job.status != Job.CANCELLED or job.cancel_requested:
+            self._log(
+                FINISHED,
+                job,
+                status=job.status,
+                result=job.result,
+                error=job.error,
+                finished_at=job.finished_at,
+            )
+        self._evict()
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+    async def drain(self, grace: float) -> None:
+        """
+        Stop accepting jobs, let running ones finish for up to ``grace`` seconds, then close.
+
+        Jobs still queued or running afterwards are cancelled here but left unfinished in
+        the journal, so a restarted server re-issues them.
+
+        Args:
+            grace: Seconds to wait for running jobs
+        """
+        self._closing = True
+        running = [job.task for job in self._jobs.values() if job.task is not None]
+        if running and grace > 0:
+            await asyncio.wait(running, timeout=grace)
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Cancel queued and running jobs and stop the workers."""
+        self._closing = True
+        running = [job.task for job in self._jobs.values() if job.task is not None]
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        for job in self._jobs.values():
+            if not job.finished:
+                job.finish(Job.CANCELLED)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+        if self.journal is not None:
+            self.journal.close()
@@ -0,0 +1,132 @@
+"""
+Append-only journal of background jobs.
+
+Every job transition (submitted, started, finished) is appended to a JSONL file as it
+happens, so a restarted server can tell which jobs completed and which were still
+queued or running when it stopped. On load the journal is replayed and compacted to
+one record per retained job.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import IO, Any, Optional
+
+SUBMITTED = "submitted"
+STARTED = "started"
+FINISHED = "finished"
+
+
+class JobJournal:
+    """JSONL write-ahead log of job state changes."""
+
+    def __init__(self, path: Path, fsync: bool = False) -> None:
+        """
+        Args:
+            path: Journal file (created with its directory if missing)
+            fsync: fsync after every record (durable across power loss, slower)
+        """
+        self.path = Path(path)
+        self.fsync = fsync
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+
+    def append(self, op: str, job_id: str, **fields: Any) -> None:
+        """
+        Append one record.
+
+        Args:
+            op: ``submitted``, ``started`` or ``finished``
+            job_id: Job the record belongs to
+            **fields: Extra JSON-serializable fields for the record
+        """
+        line = json.dumps({"op": op, "job_id": job_id, **fields}, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def replay(self) -> list[dict[str, Any]]:
+        """
+        Rebuild each job's latest state from the journal.
+
+        A torn final line (from a crash mid-write) is ignored.
+
+        Returns:
+            Job states in submission order, each with job_id, arguments, created_at,
+            started (bool) and, for finished jobs, status/result/error/finished_at
+        """
+        jobs: dict[str, dict[str, Any]] = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            op = record.pop("op", None)
+            job_id = record.get("job_id")
+            if op == SUBMITTED:
+                jobs[job_id] = {**record, "started": False}
+            elif job_id in jobs and op == STARTED:
+                jobs[job_id]["started"] = True
+                jobs[job_id]["started_at"] = record.get("started_at")
+            elif job_id in jobs and op == FINISHED:
+                jobs[job_id].update(record)
+        return list(jobs.values())
+
+    def compact(self, jobs: list[dict[str, Any]]) -> None:
+        """
+        Atomically rewrite the journal to hold only ``jobs``.
+
+        Args:
+            jobs: Job states as returned by ``replay``
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.close()
+            fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, suffix=".part")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    for job in jobs:
+                        f.write(_records_for(job))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_name, self.path)
+            except BaseException:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
+
+    def close(self) -> None:
+        """Close the journal file (it is reopened on the next append)."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _records_for(job: dict[str, Any]) -> str:
+    """Serialize a replayed job state back into journal records."""
+    state = dict(job)
+    started = state.pop("started", False)
+    started_at = state.pop("started_at", None)
+    finished: dict[str, Any] = {
+        key: state.pop(key)
+        for key in ("status", "result", "error", "finished_at")
+        if key in state
+    }
+    records: list[dict[str, Any]] = [{"op": SUBMITTED, **state}]
+    if started:
+        records.append({"op": STARTED, "job_id": job["job_id"], "started_at": started_at})
+    if finished:
+        records.append({"op": FINISHED, "job_id": job["job_id"], **finished})
+    return "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
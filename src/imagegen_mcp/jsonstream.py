@@ -0,0 +1,164 @@
+"""
+Incremental extraction of a base64 field from a streamed JSON document.
+
+OpenAI returns generated images as a multi-megabyte ``b64_json`` string inside a
+small JSON envelope. ``Base64FieldExtractor`` decodes that one string chunk by chunk
+into a sink while keeping only the (small) rest of the document, so the image never
+has to sit in memory as JSON text, a Python string and decoded bytes at once.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Callable, Optional
+
+_QUOTE = ord('"')
+_BACKSLASH = ord("\\")
+_COLON = ord(":")
+_WHITESPACE = frozenset(b" \t\r\n")
+
+# JSON escapes that may legally appear inside a base64 string value
+_VALUE_ESCAPES = {ord("/"): b"/", ord("n"): b"", ord("r"): b""}
+
+
+class Base64FieldExtractor:
+    """
+    Stream-decode the first string value stored under ``field`` in a JSON document.
+
+    Feed raw response bytes with ``feed``; decoded bytes are passed to ``sink`` as they
+    become available. ``finish`` parses the remaining document, in which the extracted
+    value is replaced by an empty string.
+    """
+
+    def __init__(self, field: str, sink: Callable[[bytes], None]) -> None:
+        """
+        Args:
+            field: Object key whose base64 string value should be decoded
+            sink: Callable receiving decoded bytes in order
+        """
+        self._key = field.encode("utf-8")
+        self._sink = sink
+        self._skeleton = bytearray()
+        self._in_string = False
+        self._escape = False
+        self._string = bytearray()
+        self._last_string: Optional[bytes] = None
+        self._awaiting_value = False
+        self._in_value = False
+        self._value_escape = False
+        self._pending = b""
+        self.found = False
+        self.decoded_bytes = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """Consume the next chunk of the JSON document."""
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self._in_value:
+                i = self._feed_value(chunk, i)
+            else:
+                i = self._feed_skeleton(chunk, i)
+
+    def finish(self) -> Any:
+        """
+        Validate the stream ended cleanly and parse the rest of the document.
+
+        Returns:
+            The parsed JSON document with the extracted value replaced by ""
+
+        Raises:
+            ValueError: If the document or the base64 value is truncated or malformed
+        """
+        if self._in_value:
+            raise ValueError(f"Truncated {self._key.decode()} value in JSON response")
+        return json.loads(bytes(self._skeleton))
+
+    def _feed_skeleton(self, chunk: bytes, i: int) -> int:
+        n = len(chunk)
+        while i < n:
+            byte = chunk[i]
+            i += 1
+            if self._in_string:
+                self._skeleton.append(byte)
+                if self._escape:
+                    self._escape = False
+                elif byte == _BACKSLASH:
+                    self._escape = True
+                elif byte == _QUOTE:
+                    self._in_string = False
+                    self._last_string = bytes(self._string)
+                elif len(self._string) <= len(self._key):
+                    self._string.append(byte)
+                continue
+
+            if byte == _QUOTE and self._awaiting_value and not self.found:
+                # Start of the value we want: stream it instead of buffering it
+                self._awaiting_value = False
+                self._in_value = True
+                self.found = True
+                return i
+
+            self._skeleton.append(byte)
+            if byte in _WHITESPACE:
+                continue
+            if byte == _QUOTE:
+                self._in_string = True
+                self._string.clear()
+                self._awaiting_value = False
+            elif byte == _COLON:
+                self._awaiting_value = self._last_string == self._key
+            else:
+                self._awaiting_value = False
+            self._last_string = None
+        return i
+
+    def _feed_value(self, chunk: bytes, i: int) -> int:
+        n = len(chunk)
+        if self._value_escape:
+            self._value_escape = False
+            replacement = _VALUE_ESCAPES.get(chunk[i])
+            if replacement is None:
+                raise ValueError("Unexpected escape sequence in base64 JSON value")
+            self._decode(replacement)
+            return i + 1
+
+        end = n
+        for marker in (_QUOTE, _BACKSLASH):
+            found = chunk.find(marker, i)
+            if found != -1 and found < end:
+                end = found
+        self._decode(chunk[i:end])
+        if end == n:
+            return n
+
+        if chunk[end] == _BACKSLASH:
+            self._value_escape = True
+            return end + 1
+
+        # Closing quote: flush what is left and keep an empty placeholder string
+        self._flush()
+        self._in_value = False
+        self._skeleton.extend(b'""')
+        return end + 1
+
+    def _decode(self, data: bytes) -> None:
+        if not data:
+            return
+        data = self._pending + data
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if usable:
+            self._emit(data[:usable])
+
+    def _flush(self) -> None:
+        if self._pending:
+            raise ValueError("Base64 value in JSON response has invalid length")
+
+    def _emit(self, data: bytes) -> None:
+        try:
+            decoded = base64.b64decode(data, validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 data in JSON response: {e}") from e
+        self.decoded_bytes += len(decoded)
+        self._sink(decoded)
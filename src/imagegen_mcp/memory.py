@@ -0,0 +1,156 @@
+"""
+Memory governor for decoded pixel data.
+
+Image operations reserve their estimated working set (decoded frames plus working
+copies) before they start. While the reservations in use would exceed the budget, new
+operations wait in arrival order instead of decoding; an operation larger than the whole
+budget runs once nothing else holds memory, so it is never starved.
+
+A reservation can outlive the caller that took it: work handed to a worker that cannot
+be interrupted keeps its bytes until the worker is done, not until the caller gives up.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable
+
+
+@dataclass
+class _Waiter:
+    nbytes: int
+    future: "asyncio.Future[None]" = field(repr=False)
+
+
+@dataclass
+class Reservation:
+    """Bytes granted by :meth:`MemoryGovernor.hold`, returned to the budget once."""
+
+    governor: "MemoryGovernor" = field(repr=False)
+    nbytes: int
+    waited: float = 0.0
+    released: bool = False
+    handed_off: bool = False
+
+    def release(self) -> None:
+        """Return the bytes to the budget (later calls do nothing)."""
+        if not self.released:
+            self.released = True
+            self.governor._release(self.nbytes)
+
+    def hand_off(self) -> Callable[[], None]:
+        """
+        Pass the duty to release on to whoever will end the work (e.g. a worker pool).
+
+        Returns:
+            The callback that releases the reservation
+        """
+        self.handed_off = True
+        return self.release
+
+
+class MemoryGovernor:
+    """FIFO budget of decoded bytes shared by concurrent image operations."""
+
+    def __init__(self, max_bytes: int) -> None:
+        """
+        Args:
+            max_bytes: Bytes that may be reserved at once (0 disables the governor)
+        """
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.reservations = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self._waiters: deque[_Waiter] = deque()
+
+    @property
+    def waiting(self) -> int:
+        """Operations queued for memory."""
+        return len(self._waiters)
+
+    async def hold(self, nbytes: int) -> "Reservation":
+        """
+        Wait for ``nbytes`` of the budget and keep it until the reservation is released.
+
+        Args:
+            nbytes: Estimated bytes the operation will have decoded at its peak
+
+        Returns:
+            The granted reservation; call its ``release()`` once the work has ended
+        """
+        if self.max_bytes <= 0:
+            return Reservation(self, 0, released=True)
+
+        # An operation bigger than the budget takes all of it, once it is free
+        nbytes = max(0, min(nbytes, self.max_bytes))
+        started = time.perf_counter()
+        if self._waiters or self.in_use + nbytes > self.max_bytes:
+            waiter = _Waiter(nbytes, asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+            self.waited += 1
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Granted just as we were cancelled: hand the bytes on
+                    self._release(nbytes)
+                else:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    self._grant()
+                raise
+        else:
+            self._acquire(nbytes)
+        waited = time.perf_counter() - started
+        self.wait_seconds += waited
+        return Reservation(self, nbytes, waited)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[float]:
+        """
+        Hold ``nbytes`` of the budget for the duration of the block.
+
+        Args:
+            nbytes: Estimated bytes the operation will have decoded at its peak
+
+        Yields:
+            Seconds spent waiting for the reservation
+        """
+        reservation = await self.hold(nbytes)
+        try:
+            yield reservation.waited
+        finally:
+            reservation.release()
+
+    def stats(self) -> dict[str, Any]:
+        """Return the budget, bytes in use, the high-water mark and queueing counters."""
+        return {
+            "max_bytes": self.max_bytes,
+            "in_use_bytes": self.in_use,
+            "peak_bytes": self.peak,
+            "waiting": self.waiting,
+            "reservations": self.reservations,
+            "waited": self.waited,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+    def _acquire(self, nbytes: int) -> None:
+        self.in_use += nbytes
+        self.peak = max(self.peak, self.in_use)
+        self.reservations += 1
+
+    def _release(self, nbytes: int) -> None:
+        self.in_use -= nbytes
+        self._grant()
+
+    def _grant(self) -> None:
+        # Strict arrival order: a large waiter at the head holds back smaller ones behind it
+        while self._waiters and self.in_use + self._waiters[0].nbytes <= self.max_bytes:
+            waiter = self._waiters.popleft()
+            if not waiter.future.done():
+                self._acquire(waiter.nbytes)
+                waiter.future.set_result(None)
@@ -0,0 +1,119 @@
+"""
+Cached image metadata lookups.
+
+Header parsing is cheap but not free, and agents ask about the same files over and
+over. Results are cached per file and reused while the file's mtime and size are
+unchanged, so a repeat lookup costs a single ``stat``.
+"""
+
+import glob
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+# (mtime in nanoseconds, size in bytes) identifying one version of a file
+FileVersion = tuple[int, int]
+
+
+def file_version(image_path: str) -> tuple[str, FileVersion]:
+    """
+    Stat a file and return its resolved path and version.
+
+    Args:
+        image_path: Path to the image file
+
+    Returns:
+        Tuple of (resolved path, (mtime_ns, size))
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+    """
+    path = Path(image_path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image not found: {image_path}") from None
+    return str(path.resolve()), (stat.st_mtime_ns, stat.st_size)
+
+
+def expand_image_paths(
+    image_paths: Optional[list[str]] = None,
+    pattern: Optional[str] = None,
+    limit: int = 1000,
+) -> list[str]:
+    """
+    Combine explicit paths and a glob pattern into one de-duplicated list.
+
+    Args:
+        image_paths: Explicit paths
+        pattern: Optional glob pattern (``**`` matches recursively)
+        limit: Maximum number of paths
+
+    Returns:
+        Paths in request order, explicit paths first
+
+    Raises:
+        ValueError: If neither input is given or the limit is exceeded
+    """
+    if not image_paths and not pattern:
+        raise ValueError("Provide image_paths or a glob pattern")
+
+    paths = list(image_paths or [])
+    if pattern:
+        paths.extend(sorted(p for p in glob.glob(pattern, recursive=True) if Path(p).is_file()))
+
+    unique = list(dict.fromkeys(paths))
+    if len(unique) > limit:
+        raise ValueError(f"Too many images: {len(unique)} (maximum is {limit})")
+    return unique
+
+
+class MetadataCache:
+    """LRU cache of image metadata keyed on (path, mtime, size)."""
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        """
+        Args:
+            max_entries: Maximum number of files kept in the cache
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[FileVersion, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: str, version: FileVersion) -> Optional[dict[str, Any]]:
+        """
+        Return cached metadata if it matches the file's current version.
+
+        Args:
+            path: Resolved path from ``file_version``
+            version: Current (mtime_ns, size) of the file
+
+        Returns:
+            A copy of the cached metadata, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            return None
+
+    def put(self, path: str, version: FileVersion, metadata: dict[str, Any]) -> None:
+        """Store metadata for a file version, evicting the least recently used file."""
+        with self._lock:
+            self._entries[path] = (version, dict(metadata))
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and the number of cached files."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
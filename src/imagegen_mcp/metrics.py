@@ -0,0 +1,218 @@
+"""
+In-process metrics: counters and HDR-style latency histograms.
+
+Histograms use log-linear buckets (a fixed number of linear sub-buckets per power of
+two), so any percentile is reported within about 1.6% of the true value while memory
+stays at a few hundred buckets no matter how many values are recorded. Snapshots are
+served as JSON by ``get_server_stats`` and can be written as Prometheus text.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from imagegen_mcp.storage import write_bytes_atomic
+
+# 2**SUB_BUCKET_BITS sub-buckets per power of two, i.e. about 2 significant digits
+SUB_BUCKET_BITS = 7
+# Histogram resolution: values are recorded in whole microseconds
+TICKS_PER_SECOND = 1_000_000
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Log-linear histogram of durations in seconds."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._buckets: dict[tuple[int, int], int] = {}
+
+    @staticmethod
+    def _bucket(ticks: int) -> tuple[int, int]:
+        # Values below 2**SUB_BUCKET_BITS are exact; above, keep the top bits only
+        shift = max(0, ticks.bit_length() - SUB_BUCKET_BITS)
+        return shift, ticks >> shift
+
+    def record(self, seconds: float) -> None:
+        """Record one duration."""
+        seconds = max(0.0, seconds)
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        key = self._bucket(int(seconds * TICKS_PER_SECOND))
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Return the value at quantile ``q`` (0-1).
+
+        Returns:
+            The upper bound of the bucket holding the quantile, clamped to the observed
+            min/max, or None if nothing was recorded
+        """
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for (shift, mantissa) in sorted(self._buckets):
+            seen += self._buckets[(shift, mantissa)]
+            if seen >= rank:
+                upper = ((mantissa + 1) << shift) - 1 if shift else mantissa
+                return min(self.max, max(self.min, upper / TICKS_PER_SECOND))
+        return self.max
+
+    def summary(self) -> dict[str, Any]:
+        """Return count, sum, min, max, mean and the standard quantiles."""
+        if self.count == 0:
+            return {"count": 0}
+        summary: dict[str, Any] = {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "min": round(self.min, 6),
+            "max": round(self.max, 6),
+            "mean": round(self.sum / self.count, 6),
+        }
+        for q in QUANTILES:
+            summary[f"p{q * 100:g}".replace(".", "")] = round(self.percentile(q) or 0.0, 6)
+        return summary
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _series_name(labels: LabelKey) -> str:
+    return ",".join(f"{name}={value}" for name, value in labels)
+
+
+def _prometheus_labels(labels: LabelKey, extra: Optional[tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class MetricsRegistry:
+    """Named counters and histograms, each split by label values."""
+
+    def __init__(self, namespace: str = "imagegen") -> None:
+        """
+        Args:
+            namespace: Prefix for Prometheus metric names
+        """
+        self.namespace = namespace
+        self.started_at = time.time()
+        self._counters: dict[str, dict[LabelKey, float]] = {}
+        self._histograms: dict[str, dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """Add ``value`` to a counter."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """Record a duration in a histogram."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.record(seconds)
+
+    def counter_value(self, name: str, **labels: Any) -> float:
+        """Return a counter's current value (0 if never incremented)."""
+        return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        """Return a histogram if anything was recorded in it."""
+        return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Return all metrics as JSON-serializable data.
+
+        Series are keyed by their labels, e.g.
+        ``{"tool_calls_total": {"status=ok,tool=generate_image": 3}}``.
+        """
+        with self._lock:
+            counters = {
+                name: {_series_name(key): value for key, value in sorted(series.items())}
+                for name, series in sorted(self._counters.items())
+            }
+            histograms = {
+                name: {_series_name(key): h.summary() for key, h in sorted(series.items())}
+                for name, series in sorted(self._histograms.items())
+            }
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def prometheus_text(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, counters in sorted(self._counters.items()):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in sorted(counters.items()):
+                    lines.append(f"{metric}{_prometheus_labels(key)} {value:g}")
+            for name, histograms in sorted(self._histograms.items()):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {metric} summary")
+                for key, histogram in sorted(histograms.items()):
+                    for q in QUANTILES:
+                        value = histogram.percentile(q) or 0.0
+                        labels = _prometheus_labels(key, ("quantile", f"{q:g}"))
+                        lines.append(f"{metric}{labels} {value:.6g}")
+                    labels = _prometheus_labels(key)
+                    lines.append(f"{metric}_sum{labels} {histogram.sum:.6g}")
+                    lines.append(f"{metric}_count{labels} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        """
+        Atomically write the metrics to a Prometheus textfile.
+
+        Suited to node_exporter's textfile collector, which must never read a half-written
+        file.
+        """
+        path = Path(path)
+        write_bytes_atomic(self.prometheus_text().encode("utf-8"), path.parent, path)
+
+
+async def export_periodically(registry: MetricsRegistry, path: Path, interval: float) -> None:
+    """
+    Write ``registry`` to a Prometheus textfile every ``interval`` seconds until cancelled.
+
+    Args:
+        registry: Metrics to export
+        path: Textfile to (re)write
+        interval: Seconds between writes
+    """
+    while True:
+        try:
+            await asyncio.to_thread(registry.write_prometheus, path)
+        except OSError:
+            # A full disk or missing permissions must not take the server down
+            pass
+        await asyncio.sleep(interval)
@@ -0,0 +1,170 @@
+"""
+MCP progress notifications.
+
+When a client sends a ``progressToken`` with a tool call, the call's reporter is kept in
+a context variable, so code deep in the generation path (the download loop, for
+example) can report progress without every function taking an extra argument.
+Without a token the reporter is None and reporting costs one context lookup.
+
+Generations report on a 0-100 scale: request sent, first byte, download, written.
+Batch operations report completed items out of the item count.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional
+
+# Generation stages on the 0-100 scale
+GENERATION_TOTAL = 100.0
+REQUEST_SENT = 5.0
+FIRST_BYTE = 10.0
+DOWNLOAD_DONE = 95.0
+WRITTEN = 100.0
+
+# Without a Content-Length, download progress approaches DOWNLOAD_DONE asymptotically,
+# reaching halfway after this many bytes
+UNKNOWN_LENGTH_HALFWAY_BYTES = 1024 * 1024
+
+SendProgress = Callable[[float, Optional[float], Optional[str]], Awaitable[None]]
+
+
+class ProgressReporter:
+    """Sends strictly increasing, rate-limited progress updates for one request."""
+
+    def __init__(
+        self,
+        send: SendProgress,
+        min_interval: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            send: Coroutine function taking (progress, total, message)
+            min_interval: Minimum seconds between unforced updates
+            clock: Monotonic clock (injectable for tests)
+        """
+        self._send = send
+        self.min_interval = min_interval
+        self._clock = clock
+        self._last_progress = float("-inf")
+        self._last_sent = float("-inf")
+
+    async def update(
+        self,
+        progress: float,
+        total: Optional[float] = None,
+        message: Optional[str] = None,
+        force: bool = False,
+    ) -> None:
+        """
+        Send an update if it moves progress forward.
+
+        Updates that do not increase progress are dropped (MCP requires progress to
+        increase), as are unforced updates arriving within ``min_interval`` of the last.
+        Failures to send are ignored so progress can never fail the call itself.
+
+        Args:
+            progress: Progress so far
+            total: Total, if known
+            message: Human-readable status
+            force: Bypass rate limiting (used for stage changes and completion)
+        """
+        if progress <= self._last_progress:
+            return
+        now = self._clock()
+        if not force and now - self._last_sent < self.min_interval:
+            return
+        self._last_progress = progress
+        self._last_sent = now
+        try:
+            await self._send(progress, total, message)
+        except Exception:
+            pass
+
+
+class ProgressFanOut(ProgressReporter):
+    """Forwards every update to the reporters of all callers sharing one piece of work."""
+
+    def __init__(self) -> None:
+        super().__init__(self._unused, min_interval=0)
+        self.reporters: list[ProgressReporter] = []
+
+    async def update(
+        self,
+        progress: float,
+        total: Optional[float] = None,
+        message: Optional[str] = None,
+        force: bool = False,
+    ) -> None:
+        """Pass the update on; each caller's reporter applies its own rate limit."""
+        for reporter in list(self.reporters):
+            await reporter.update(progress, total, message, force)
+
+    @staticmethod
+    async def _unused(progress: float, total: Optional[float], message: Optional[str]) -> None:
+        pass
+
+
+_current: contextvars.ContextVar[Optional[ProgressReporter]] = contextvars.ContextVar(
+    "imagegen_progress", default=None
+)
+
+
+def current() -> Optional[ProgressReporter]:
+    """Return the reporter for the running tool call, if the client asked for progress."""
+    return _current.get()
+
+
+@contextmanager
+def reporting(reporter: Optional[ProgressReporter]) -> Iterator[None]:
+    """Make ``reporter`` current for the enclosed code (None silences reporting)."""
+    token = _current.set(reporter)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+async def report_stage(stage: float, message: str) -> None:
+    """Report a generation stage on the 0-100 scale."""
+    reporter = _current.get()
+    if reporter is not None:
+        await reporter.update(stage, GENERATION_TOTAL, message, force=True)
+
+
+async def report_download(received: int, expected: Optional[int]) -> None:
+    """
+    Report bytes downloaded so far.
+
+    Args:
+        received: Bytes received
+        expected: Total bytes from Content-Length, if known
+    """
+    reporter = _current.get()
+    if reporter is None:
+        return
+    span = DOWNLOAD_DONE - FIRST_BYTE
+    if expected:
+        fraction = min(1.0, received / expected)
+        message = f"Downloaded {received} of {expected} bytes"
+    else:
+        fraction = received / (received + UNKNOWN_LENGTH_HALFWAY_BYTES)
+        message = f"Downloaded {received} bytes"
+    await reporter.update(FIRST_BYTE + span * fraction, GENERATION_TOTAL, message)
+
+
+async def report_items(
+    reporter: Optional[ProgressReporter],
+    completed: int,
+    total: int,
+    message: str,
+) -> None:
+    """
+    Report completed items of a batch.
+
+    Takes the reporter explicitly because batch items run with reporting silenced, so
+    their own downloads do not interleave with the item count.
+    """
+    if reporter is not None:
+        await reporter.update(completed, total, message, force=completed == total)
@@ -0,0 +1,326 @@
+"""
+Client-side rate limiting and circuit breaking for providers.
+
+Token buckets meter outgoing requests per provider and per model so concurrent agents
+do not trip provider rate limits. A circuit breaker fails fast while a provider keeps
+erroring and lets a single probe through after a cool-down.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Optional
+
+from imagegen_mcp.config import env_float, env_int, env_json
+
+
+class RateLimitExceededError(Exception):
+    """Raised when a request would have to queue longer than the allowed wait."""
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit breaker is rejecting calls."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        """
+        Args:
+            message: Error message
+            retry_after: Seconds until the breaker will allow a probe
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket with FIFO reservations.
+
+    Each request reserves a token immediately, letting the balance go negative; the
+    caller then sleeps until its token would have been refilled. Reservations are
+    served in arrival order without locks.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity (requests allowed back to back)
+            clock: Monotonic clock (injectable for tests)
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+        self.waiting = 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        """Current balance (negative when requests are queued)."""
+        self._refill()
+        return self._tokens
+
+    def reserve(self, max_wait: Optional[float] = None) -> float:
+        """
+        Reserve one token.
+
+        Args:
+            max_wait: Longest acceptable wait in seconds (None means unbounded)
+
+        Returns:
+            Seconds the caller must wait before proceeding
+
+        Raises:
+            RateLimitExceededError: If the wait would exceed ``max_wait``
+        """
+        self._refill()
+        wait = max(0.0, (1.0 - self._tokens) / self.rate)
+        if max_wait is not None and wait > max_wait:
+            raise RateLimitExceededError(
+                f"Rate limit queue is full: next slot in {wait:.1f}s exceeds the "
+                f"{max_wait:.1f}s maximum wait"
+            )
+        self._tokens -= 1.0
+        return wait
+
+    def refund(self) -> None:
+        """Return a reserved token that was not used."""
+        self._tokens = min(self.burst, self._tokens + 1.0)
+
+    async def acquire(self, max_wait: Optional[float] = None) -> float:
+        """
+        Wait for a token.
+
+        Args:
+            max_wait: Longest acceptable wait in seconds
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = self.reserve(max_wait)
+        if wait > 0:
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund()
+                raise
+            finally:
+                self.waiting -= 1
+        return wait
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the bucket's configuration and state."""
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 3),
+            "waiting": self.waiting,
+        }
+
+
+class RateLimiterRegistry:
+    """Token buckets per provider and, optionally, per provider model."""
+
+    def __init__(
+        self,
+        provider_limits: Optional[dict[str, tuple[float, float]]] = None,
+        model_limits: Optional[dict[str, tuple[float, float]]] = None,
+        max_wait: Optional[float] = 30.0,
+    ) -> None:
+        """
+        Args:
+            provider_limits: Provider name -> (rate per second, burst)
+            model_limits: "provider:model" -> (rate per second, burst)
+            max_wait: Longest a request may queue before failing
+        """
+        self.max_wait = max_wait
+        self._buckets: dict[str, TokenBucket] = {}
+        for name, (rate, burst) in {**(provider_limits or {}), **(model_limits or {})}.items():
+            self._buckets[name] = TokenBucket(rate, burst)
+
+    @classmethod
+    def from_env(cls, default_limits: dict[str, tuple[float, float]]) -> "RateLimiterRegistry":
+        """
+        Build limiters from environment variables.
+
+        ``IMAGEGEN_<PROVIDER>_RATE`` / ``IMAGEGEN_<PROVIDER>_BURST`` set provider limits
+        (a rate of 0 disables limiting for that provider), ``IMAGEGEN_MODEL_RATE_LIMITS``
+        holds JSON like ``{"pollinations:flux": {"rate": 0.5, "burst": 2}}`` and
+        ``IMAGEGEN_RATE_LIMIT_MAX_WAIT`` bounds queuing.
+
+        Args:
+            default_limits: Provider name -> (rate, burst) defaults
+
+        Returns:
+            RateLimiterRegistry
+        """
+        provider_limits = {}
+        for provider, (rate, burst) in default_limits.items():
+            rate = env_float(f"{provider.upper()}_RATE", rate)
+            burst = env_float(f"{provider.upper()}_BURST", burst)
+            if rate > 0:
+                provider_limits[provider] = (rate, burst)
+        model_limits = {
+            name: (float(spec["rate"]), float(spec.get("burst", 1)))
+            for name, spec in env_json("MODEL_RATE_LIMITS", {}).items()
+        }
+        max_wait = env_float("RATE_LIMIT_MAX_WAIT", 30.0)
+        return cls(provider_limits, model_limits, max_wait)
+
+    async def acquire(
+        self,
+        provider: str,
+        model: Optional[str] = None,
+        max_wait: Optional[float] = None,
+    ) -> float:
+        """
+        Wait for both the provider's and the model's limiter.
+
+        Args:
+            provider: Provider name
+            model: Optional model name
+            max_wait: Longest acceptable wait for this call (defaults to ``self.max_wait``)
+
+        Returns:
+            Total seconds spent waiting
+
+        Raises:
+            RateLimitExceededError: If either limiter would exceed ``max_wait``; a token
+                already taken from the other limiter is returned
+        """
+        if max_wait is None:
+            max_wait = self.max_wait
+        waited = 0.0
+        names = [provider] + ([f"{provider}:{model}"] if model else [])
+        acquired: list[TokenBucket] = []
+        for name in names:
+            bucket = self._buckets.get(name)
+            if bucket is not None:
+                remaining = None if max_wait is None else max(0.0, max_wait - waited)
+                try:
+                    waited += await bucket.acquire(remaining)
+                except (RateLimitExceededError, asyncio.CancelledError):
+                    # The request is not going out: give back what it already holds
+                    for held in acquired:
+                        held.refund()
+                    raise
+                acquired.append(bucket)
+        return waited
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return every limiter's state keyed by name."""
+        return {name: bucket.snapshot() for name, bucket in self._buckets.items()}
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and rejects
+    calls for ``cooldown`` seconds. It then half-opens and lets one probe through: a
+    success closes it again, a failure re-opens it for another cool-down.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            name: Provider name used in error messages
+            failure_threshold: Consecutive failures that open the breaker
+            cooldown: Seconds to stay open before probing
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self._clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        """Build a breaker from ``IMAGEGEN_BREAKER_*`` environment variables."""
+        return cls(
+            name,
+            failure_threshold=env_int("BREAKER_FAILURE_THRESHOLD", 5),
+            cooldown=env_float("BREAKER_COOLDOWN", 30.0),
+        )
+
+    def allow(self) -> None:
+        """
+        Check whether a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with a probe running
+        """
+        if self.state == self.OPEN:
+            remaining = self.cooldown - (self._clock() - (self.opened_at or 0.0))
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"{self.name} is failing repeatedly; calls are paused for "
+                    f"{remaining:.0f}s before retrying",
+                    retry_after=remaining,
+                )
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError(
+                    f"{self.name} is being probed after repeated failures; try again shortly",
+                    retry_after=1.0,
+                )
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        """Record a call that reached a healthy provider."""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Forget a call that ended without telling us anything (e.g. cancelled)."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a provider failure, opening the breaker if needed."""
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = self._clock()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the breaker's state."""
+        retry_after = None
+        if self.state == self.OPEN and self.opened_at is not None:
+            retry_after = round(max(0.0, self.cooldown - (self._clock() - self.opened_at)), 3)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "cooldown_seconds": self.cooldown,
+            "retry_after_seconds": retry_after,
+        }
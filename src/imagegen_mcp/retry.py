@@ -0,0 +1,225 @@
+"""
+Retry policy for provider calls.
+
+Transient failures (429, 5xx, connection errors, HuggingFace cold starts) are retried
+with exponential backoff and full jitter. Server hints (``Retry-After``, HuggingFace's
+``estimated_time``) take precedence over the computed delay, a per-provider retry
+budget stops retry storms when a provider is broadly failing, and an overall deadline
+bounds the total time spent.
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from imagegen_mcp.config import env_float, env_int
+
+T = TypeVar("T")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryableProviderError(Exception):
+    """A provider failure that is worth retrying, optionally after a hinted delay."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        """
+        Args:
+            message: Error message shown if retries are exhausted
+            retry_after: Seconds the provider asked us to wait, if known
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Backoff settings for one provider."""
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    deadline: float = 180.0
+
+    @classmethod
+    def from_env(cls, provider: str, **defaults: Any) -> "RetryPolicy":
+        """
+        Build a policy from ``IMAGEGEN_<PROVIDER>_RETRY_*`` environment variables.
+
+        Args:
+            provider: Provider name (e.g. "huggingface")
+            **defaults: Provider-specific defaults overriding the class defaults
+
+        Returns:
+            RetryPolicy for the provider
+        """
+        base = cls(**defaults)
+        prefix = f"{provider.upper()}_RETRY"
+        return cls(
+            max_attempts=env_int(f"{prefix}_MAX_ATTEMPTS", base.max_attempts),
+            base_delay=env_float(f"{prefix}_BASE_DELAY", base.base_delay),
+            max_delay=env_float(f"{prefix}_MAX_DELAY", base.max_delay),
+            deadline=env_float(f"{prefix}_DEADLINE", base.deadline),
+        )
+
+    def backoff(self, attempt: int, rand: Callable[[], float] = random.random) -> float:
+        """Full-jitter exponential delay before retry number ``attempt`` (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * 2.0 ** (attempt - 1))
+        return ceiling * rand()
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of recent requests.
+
+    Every first attempt deposits ``ratio`` tokens and every retry spends one, so when a
+    provider fails broadly retries dry up instead of multiplying the load.
+    """
+
+    def __init__(self, ratio: float = 0.2, capacity: float = 10.0) -> None:
+        """
+        Args:
+            ratio: Tokens earned per request
+            capacity: Maximum stored tokens (also the starting balance)
+        """
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+
+    def record_request(self) -> None:
+        """Credit the budget for a new request."""
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Spend one retry token if available."""
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+@dataclass
+class RetryStats:
+    """What the retry loop did for one call."""
+
+    attempts: int = 0
+    wait_seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the stats as a JSON-serializable dict."""
+        return {
+            "attempts": self.attempts,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "errors": list(self.errors),
+        }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a ``Retry-After`` header given as seconds or an HTTP date.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def retry_hint(error: BaseException) -> tuple[bool, Optional[float]]:
+    """
+    Classify an error raised by a provider call.
+
+    Returns:
+        Tuple of (retryable, server-suggested delay in seconds or None)
+    """
+    if isinstance(error, RetryableProviderError):
+        return True, error.retry_after
+    if isinstance(error, httpx.HTTPStatusError):
+        response = error.response
+        if response.status_code in RETRY_STATUSES:
+            return True, parse_retry_after(response.headers.get("retry-after"))
+        return False, None
+    if isinstance(error, httpx.TransportError):
+        return True, None
+    return False, None
+
+
+def describe_error(error: BaseException) -> str:
+    """Short description of an error for retry reports."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    return f"{type(error).__name__}: {error}"
+
+
+def error_message(error: BaseException) -> str:
+    """Message of an error, or its type name if it has none (httpx timeouts, for one)."""
+    return str(error) or type(error).__name__
+
+
+async def call_with_retry(
+    func: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    budget: Optional[RetryBudget] = None,
+    deadline: Optional[float] = None,
+    sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+) -> tuple[T, RetryStats]:
+    """
+    Call ``func`` until it succeeds or retrying is no longer allowed.
+
+    Retrying stops when the error is not retryable, ``max_attempts`` is reached, the
+    budget is exhausted, or the next wait would pass the deadline. The last error is
+    then re-raised with a ``retry_stats`` attribute attached.
+
+    Args:
+        func: Zero-argument coroutine function performing one attempt
+        policy: Backoff settings
+        budget: Optional shared retry budget for the provider
+        deadline: Optional absolute ``time.monotonic()`` deadline; defaults to
+            ``policy.deadline`` seconds from now
+        sleep: Sleep function (injectable for tests)
+
+    Returns:
+        Tuple of (func's result, RetryStats)
+    """
+    stats = RetryStats()
+    if deadline is None:
+        deadline = time.monotonic() + policy.deadline
+    if budget is not None:
+        budget.record_request()
+
+    while True:
+        stats.attempts += 1
+        try:
+            return await func(), stats
+        except Exception as e:
+            retryable, hint = retry_hint(e)
+            stats.errors.append(describe_error(e))
+            delay = hint if hint is not None else policy.backoff(stats.attempts)
+            remaining = deadline - time.monotonic()
+            if (
+                not retryable
+                or stats.attempts >= policy.max_attempts
+                or delay > policy.max_delay
+                or delay >= remaining
+                or (budget is not None and not budget.try_spend())
+            ):
+                e.retry_stats = stats  # type: ignore[attr-defined]
+                raise
+        await sleep(delay)
+        stats.wait_seconds += delay
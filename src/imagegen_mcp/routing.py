@@ -0,0 +1,210 @@
+"""
+Latency-aware provider routing.
+
+Every provider call records its latency and outcome in a rolling window per
+provider/model. ``provider: "auto"`` requests use these windows to rank the available
+providers by expected time to a successful image, and to decide when a slow request is
+worth hedging with a second provider.
+"""
+
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from imagegen_mcp.config import env_bool, env_float, env_int, env_str
+
+# Error rates are capped below 1 so a failing provider ranks last instead of infinitely
+MAX_ERROR_RATE = 0.95
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of ``values``.
+
+    Args:
+        values: Samples (any order)
+        q: Quantile between 0 and 1
+
+    Returns:
+        The percentile, or None if there are no samples
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+class RollingStats:
+    """Latency and outcome of the most recent calls to one provider/model."""
+
+    def __init__(self, window: int = 50) -> None:
+        """
+        Args:
+            window: Number of recent calls kept
+        """
+        self._samples: deque[tuple[float, bool]] = deque(maxlen=max(1, window))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record one call's latency in seconds and whether it succeeded."""
+        self._samples.append((latency, ok))
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of recent calls that failed."""
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency(self, q: float) -> Optional[float]:
+        """Latency percentile over recent successful calls."""
+        return percentile([latency for latency, ok in self._samples if ok], q)
+
+    def expected_seconds(self) -> float:
+        """
+        Expected seconds until a successful result.
+
+        The median latency divided by the success rate; providers without successful
+        samples score 0 so they are tried (optimistically) before being judged.
+        """
+        median = self.latency(0.5)
+        if median is None:
+            return 0.0 if not self._samples else float("inf")
+        return median / (1.0 - min(self.error_rate, MAX_ERROR_RATE))
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the window's summary."""
+
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 3)
+
+        return {
+            "samples": len(self._samples),
+            "error_rate": round(self.error_rate, 3),
+            "p50_seconds": rounded(self.latency(0.5)),
+            "p90_seconds": rounded(self.latency(0.9)),
+            "p99_seconds": rounded(self.latency(0.99)),
+        }
+
+
+@dataclass
+class RouteCandidate:
+    """A provider/model pair considered for an ``auto`` request."""
+
+    provider: str
+    model: str
+    expected_seconds: float
+    stats: dict[str, Any]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the candidate as a JSON-serializable dict."""
+        expected = None if self.expected_seconds == float("inf") else self.expected_seconds
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "expected_seconds": None if expected is None else round(expected, 3),
+            **self.stats,
+        }
+
+
+class ProviderRouter:
+    """Rolling per-provider/model statistics and the ranking built on them."""
+
+    def __init__(
+        self,
+        preference: Optional[list[str]] = None,
+        window: int = 50,
+        hedge: bool = False,
+        hedge_percentile: float = 0.9,
+        min_samples: int = 5,
+    ) -> None:
+        """
+        Args:
+            preference: Entries eligible for ``auto`` ("provider" or "provider:model"),
+                in tie-break order
+            window: Calls kept per provider/model
+            hedge: Whether ``auto`` requests hedge by default
+            hedge_percentile: Latency percentile after which a hedge is sent
+            min_samples: Successful samples needed before hedging on a percentile
+        """
+        self.preference = list(preference or [])
+        self.window = window
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self._stats: dict[str, RollingStats] = {}
+
+    @classmethod
+    def from_env(cls, default_preference: list[str]) -> "ProviderRouter":
+        """
+        Build a router from ``IMAGEGEN_AUTO_*`` / ``IMAGEGEN_HEDGE_*`` variables.
+
+        Args:
+            default_preference: Providers eligible for ``auto`` when
+                ``IMAGEGEN_AUTO_PROVIDERS`` is unset
+
+        Returns:
+            ProviderRouter
+        """
+        raw = env_str("AUTO_PROVIDERS", ",".join(default_preference))
+        return cls(
+            preference=[name.strip() for name in raw.split(",") if name.strip()],
+            window=env_int("ROUTING_WINDOW", 50),
+            hedge=env_bool("HEDGE_ENABLED", False),
+            hedge_percentile=env_float("HEDGE_PERCENTILE", 0.9),
+            min_samples=env_int("HEDGE_MIN_SAMPLES", 5),
+        )
+
+    def stats(self, provider: str, model: str) -> RollingStats:
+        """Return (creating if needed) the window for a provider/model."""
+        key = f"{provider}:{model}"
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = RollingStats(self.window)
+            self._stats[key] = stats
+        return stats
+
+    def record(self, provider: str, model: str, latency: float, ok: bool) -> None:
+        """Record one provider call."""
+        self.stats(provider, model).record(latency, ok)
+
+    def rank(self, candidates: list[tuple[str, str]]) -> list[RouteCandidate]:
+        """
+        Order provider/model pairs from most to least promising.
+
+        Args:
+            candidates: Available (provider, model) pairs in preference order
+
+        Returns:
+            Candidates sorted by expected seconds to success, ties keeping their order
+        """
+        ranked = []
+        for provider, model in candidates:
+            stats = self.stats(provider, model)
+            ranked.append(
+                RouteCandidate(provider, model, stats.expected_seconds(), stats.snapshot())
+            )
+        # sort() is stable, so equal scores keep the preference order
+        ranked.sort(key=lambda c: c.expected_seconds)
+        return ranked
+
+    def hedge_delay(self, provider: str, model: str) -> Optional[float]:
+        """
+        Seconds to wait on ``provider`` before sending a hedged request.
+
+        Returns:
+            The configured latency percentile, or None while there are too few samples
+        """
+        stats = self.stats(provider, model)
+        successes = len(stats) - round(stats.error_rate * len(stats))
+        if successes < self.min_samples:
+            return None
+        return stats.latency(self.hedge_percentile)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return every provider/model window's summary."""
+        return {key: stats.snapshot() for key, stats in self._stats.items()}
@@ -7,27 +7,59 @@ Supports OpenAI's GPT-Image-1 model and image processing utilities.
 """
 
 import asyncio
-import base64
 import json
 import os
+import shutil
+import time
+from contextlib import asynccontextmanager
 from enum import Enum
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Callable, Optional
 
 import httpx
 from mcp.server import Server
 from mcp.types import TextContent, Tool, ImageContent
-from PIL import Image
+
+from imagegen_mcp import batch, deadline, imaging, progress, tracing
+from imagegen_mcp.cache import GenerationCache, make_cache_key
+from imagegen_mcp.config import env_float, env_int, env_str
+from imagegen_mcp.http_client import HttpClientPool
+from imagegen_mcp.imaging import SUPPORTED_FORMATS
+from imagegen_mcp.jobs import JobQueue
+from imagegen_mcp.memory import MemoryGovernor, Reservation
+from imagegen_mcp.metadata import MetadataCache, expand_image_paths, file_version
+from imagegen_mcp.metrics import MetricsRegistry, export_periodically
+from imagegen_mcp.ratelimit import CircuitBreaker, RateLimiterRegistry
+from imagegen_mcp.retry import (
+    RetryableProviderError,
+    RetryBudget,
+    RetryPolicy,
+    call_with_retry,
+    error_message,
+    parse_retry_after,
+    retry_hint,
+)
+from imagegen_mcp.routing import ProviderRouter
+from imagegen_mcp.singleflight import SingleFlight
+from imagegen_mcp.storage import (
+    StoredFile,
+    allocate_output_path,
+    stream_json_base64_to_file,
+    stream_to_file,
+)
+from imagegen_mcp.tracing import Tracer
+from imagegen_mcp.workers import ImageWorkerPool
 
 # Configuration
 DEFAULT_OUTPUT_DIR = Path("generated_images")
 DEFAULT_OUTPUT_DIR.mkdir(exist_ok=True)
 
-# Supported formats
-SUPPORTED_FORMATS = ["PNG", "JPEG", "WEBP", "GIF"]
 SUPPORTED_OPENAI_SIZES = ["1024x1024", "1024x1536", "1536x1024"]
 
+# Largest image body accepted from a provider
+MAX_DOWNLOAD_BYTES = env_int("MAX_DOWNLOAD_BYTES", 50 * 1024 * 1024)
+
 
 class ImageProvider(str, Enum):
     """Supported image generation providers."""
@@ -37,9 +69,130 @@ class ImageProvider(str, Enum):
     HUGGINGFACE = "huggingface"
 
 
+# Models used when the caller does not pick one
+DEFAULT_MODELS = {
+    ImageProvider.OPENAI: "gpt-image-1",
+    ImageProvider.POLLINATIONS: "flux",
+    ImageProvider.HUGGINGFACE: "black-forest-labs/FLUX.1-dev",
+}
+
 # Initialize MCP server
 app = Server("imagegen-mcp")
 
+# Per-tool and per-stage latency histograms, byte counters and error classes
+metrics = MetricsRegistry()
+# Optional Prometheus textfile, rewritten every METRICS_INTERVAL seconds
+METRICS_FILE = env_str("METRICS_FILE", "")
+METRICS_INTERVAL = env_float("METRICS_INTERVAL", 15.0)
+
+# Per-request trace spans written to IMAGEGEN_TRACE_FILE (None when tracing is off)
+tracer = Tracer.from_env()
+
+# Long-lived, pooled HTTP clients shared by all provider calls
+http_clients = HttpClientPool(metrics=metrics)
+
+# Persistent cache of generated images (None when IMAGEGEN_CACHE_ENABLED=false)
+generation_cache = GenerationCache.from_env(DEFAULT_OUTPUT_DIR / ".cache")
+
+# Identical generate_image calls in flight at the same time share one provider request
+in_flight_generations: SingleFlight[dict[str, Any]] = SingleFlight()
+
+# Thread/process pool that keeps blocking Pillow work off the event loop
+image_workers = ImageWorkerPool.from_env()
+
+# Process pool for batch_process_directory, one worker per CPU unless configured
+batch_workers = ImageWorkerPool.from_env("BATCH", kind="process", max_workers=os.cpu_count())
+MAX_DIRECTORY_BATCH = env_int("MAX_DIRECTORY_BATCH", 10000)
+
+# Budget of decoded pixel bytes shared by all image operations (0 disables it)
+memory_governor = MemoryGovernor(env_int("MAX_DECODED_BYTES", 1024 * 1024 * 1024))
+
+# Image header metadata, reused until a file's mtime or size changes
+metadata_cache = MetadataCache(env_int("METADATA_CACHE_SIZE", 1024))
+MAX_METADATA_BATCH = env_int("MAX_METADATA_BATCH", 1000)
+
+# Simultaneous provider calls allowed per provider (IMAGEGEN_<PROVIDER>_CONCURRENCY)
+DEFAULT_PROVIDER_CONCURRENCY = {
+    ImageProvider.OPENAI: 4,
+    ImageProvider.POLLINATIONS: 4,
+    ImageProvider.HUGGINGFACE: 2,
+}
+MAX_BATCH_SIZE = env_int("MAX_BATCH_SIZE", 50)
+_provider_semaphores: dict[ImageProvider, asyncio.Semaphore] = {}
+_provider_in_flight: dict[ImageProvider, int] = {}
+
+# Retry defaults per provider (IMAGEGEN_<PROVIDER>_RETRY_*); HF cold starts take a while
+DEFAULT_RETRY_SETTINGS: dict[ImageProvider, dict[str, Any]] = {
+    ImageProvider.OPENAI: {"max_attempts": 3, "max_delay": 30.0, "deadline": 180.0},
+    ImageProvider.POLLINATIONS: {"max_attempts": 3, "max_delay": 30.0, "deadline": 180.0},
+    ImageProvider.HUGGINGFACE: {
+        "max_attempts": 4,
+        "base_delay": 2.0,
+        "max_delay": 90.0,
+        "deadline": 300.0,
+    },
+}
+_retry_policies: dict[ImageProvider, RetryPolicy] = {}
+_retry_budgets: dict[ImageProvider, RetryBudget] = {}
+
+# Client-side rate limits: (requests per second, burst) per provider
+DEFAULT_RATE_LIMITS = {
+    ImageProvider.OPENAI.value: (5.0, 5.0),
+    ImageProvider.POLLINATIONS.value: (2.0, 4.0),
+    ImageProvider.HUGGINGFACE.value: (1.0, 2.0),
+}
+rate_limiters = RateLimiterRegistry.from_env(DEFAULT_RATE_LIMITS)
+_circuit_breakers: dict[ImageProvider, CircuitBreaker] = {}
+
+# Rolling latency/error stats per provider and model, used by provider="auto".
+# Free providers come first so they win ties.
+provider_router = ProviderRouter.from_env(
+    [
+        ImageProvider.POLLINATIONS.value,
+        ImageProvider.HUGGINGFACE.value,
+        ImageProvider.OPENAI.value,
+    ]
+)
+
+
+def provider_semaphore(provider: ImageProvider) -> asyncio.Semaphore:
+    """Return the semaphore capping concurrent calls to ``provider``."""
+    semaphore = _provider_semaphores.get(provider)
+    if semaphore is None:
+        limit = env_int(
+            f"{provider.value.upper()}_CONCURRENCY", DEFAULT_PROVIDER_CONCURRENCY[provider]
+        )
+        semaphore = asyncio.Semaphore(max(1, limit))
+        _provider_semaphores[provider] = semaphore
+    return semaphore
+
+
+def retry_policy(provider: ImageProvider) -> RetryPolicy:
+    """Return the retry policy for ``provider``."""
+    policy = _retry_policies.get(provider)
+    if policy is None:
+        policy = RetryPolicy.from_env(provider.value, **DEFAULT_RETRY_SETTINGS[provider])
+        _retry_policies[provider] = policy
+    return policy
+
+
+def circuit_breaker(provider: ImageProvider) -> CircuitBreaker:
+    """Return the circuit breaker guarding ``provider``."""
+    breaker = _circuit_breakers.get(provider)
+    if breaker is None:
+        breaker = CircuitBreaker.from_env(provider.value)
+        _circuit_breakers[provider] = breaker
+    return breaker
+
+
+def retry_budget(provider: ImageProvider) -> RetryBudget:
+    """Return the shared retry budget for ``provider``."""
+    budget = _retry_budgets.get(provider)
+    if budget is None:
+        budget = RetryBudget()
+        _retry_budgets[provider] = budget
+    return budget
+
 
 def get_api_key(provider: ImageProvider) -> Optional[str]:
     """Get API key for specified provider from environment."""
@@ -50,6 +203,38 @@ def get_api_key(provider: ImageProvider) -> Optional[str]:
     return os.getenv(key_map.get(provider, ""))
 
 
+def record_download(provider: ImageProvider, stored: StoredFile) -> None:
+    """Record a provider download's duration, disk write time and size."""
+    component = provider.value
+    metrics.observe(
+        "stage_duration_seconds", stored.download_seconds, stage="download", component=component
+    )
+    metrics.observe(
+        "stage_duration_seconds", stored.write_seconds, stage="disk_write", component=component
+    )
+    metrics.inc("bytes_in_total", stored.size_bytes, component=component)
+    metrics.inc("bytes_out_total", stored.size_bytes, component=component)
+
+
+def record_image_op(op: str, source: str, result: dict[str, Any]) -> None:
+    """Record a Pillow operation's per-stage timings and bytes read and written."""
+    for entry in [result, *result.get("variants", []), *result.get("outputs", [])]:
+        for stage in ("decode", "resize", "process", "encode", "write"):
+            if f"{stage}_ms" in entry:
+                metrics.observe(
+                    "stage_duration_seconds",
+                    entry[f"{stage}_ms"] / 1000,
+                    stage="disk_write" if stage == "write" else stage,
+                    component=op,
+                )
+        if "file_size_bytes" in entry:
+            metrics.inc("bytes_out_total", entry["file_size_bytes"], component=op)
+    try:
+        metrics.inc("bytes_in_total", os.stat(source).st_size, component=op)
+    except OSError:
+        pass
+
+
 async def generate_image_openai(
     prompt: str,
     size: str = "1024x1024",
@@ -86,15 +271,19 @@ async def generate_image_openai(
         "size": size,
     }
 
-    timeout = httpx.Timeout(60.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
-            "https://api.openai.com/v1/images/generations",
-            headers=headers,
-            json=payload,
-        )
+    # Decode b64_json responses straight to disk instead of parsing the whole body
+    client = http_clients.get(ImageProvider.OPENAI.value)
+    async with client.stream(
+        "POST",
+        "https://api.openai.com/v1/images/generations",
+        headers=headers,
+        json=payload,
+        timeout=deadline.cap_timeout(client.timeout),
+    ) as response:
         response.raise_for_status()
-        data = response.json()
+        data, stored = await stream_json_base64_to_file(
+            response, "b64_json", DEFAULT_OUTPUT_DIR, save_path, MAX_DOWNLOAD_BYTES
+        )
 
     if not data.get("data"):
         raise ValueError("No image data returned from API")
@@ -102,33 +291,25 @@ async def generate_image_openai(
     result = data["data"][0]
 
     # Download and save image
-    if "url" in result:
-        image_url = result["url"]
-        async with httpx.AsyncClient() as client:
-            img_response = await client.get(image_url)
+    if stored is None:
+        if "url" not in result:
+            raise ValueError("Unexpected response format from API")
+        timeout = deadline.cap_timeout(client.timeout)
+        async with client.stream("GET", result["url"], timeout=timeout) as img_response:
             img_response.raise_for_status()
-            img_data = img_response.content
-    elif "b64_json" in result:
-        img_data = base64.b64decode(result["b64_json"])
-    else:
-        raise ValueError("Unexpected response format from API")
-
-    # Save to file
-    if save_path is None:
-        save_path = DEFAULT_OUTPUT_DIR / f"generated_{len(list(DEFAULT_OUTPUT_DIR.glob('*')))}.png"
-
-    save_path = Path(save_path)
-    save_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(save_path, "wb") as f:
-        f.write(img_data)
+            stored = await stream_to_file(
+                img_response, DEFAULT_OUTPUT_DIR, save_path, MAX_DOWNLOAD_BYTES
+            )
+    record_download(ImageProvider.OPENAI, stored)
 
     return {
-        "image_path": str(save_path.absolute()),
+        "image_path": str(stored.path.absolute()),
         "url": result.get("url"),
         "size": size,
         "prompt": prompt,
         "provider": "openai",
+        "file_size_bytes": stored.size_bytes,
+        "sha256": stored.sha256,
     }
 
 
@@ -169,32 +350,39 @@ async def generate_image_pollinations(
 
     image_url = f"{url_parts[0]}?{'&'.join(params)}"
 
-    # Download image
-    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
-        response = await client.get(image_url)
+    # Stream the image straight to disk
+    client = http_clients.get(ImageProvider.POLLINATIONS.value)
+    timeout = deadline.cap_timeout(client.timeout)
+    async with client.stream("GET", image_url, timeout=timeout) as response:
         response.raise_for_status()
-        img_data = response.content
-
-    # Save to file
-    if save_path is None:
-        save_path = DEFAULT_OUTPUT_DIR / f"generated_{len(list(DEFAULT_OUTPUT_DIR.glob('*')))}.png"
-
-    save_path = Path(save_path)
-    save_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(save_path, "wb") as f:
-        f.write(img_data)
+        stored = await stream_to_file(response, DEFAULT_OUTPUT_DIR, save_path, MAX_DOWNLOAD_BYTES)
+    record_download(ImageProvider.POLLINATIONS, stored)
 
     return {
-        "image_path": str(save_path.absolute()),
+        "image_path": str(stored.path.absolute()),
         "url": image_url,
         "size": size,
         "prompt": prompt,
         "provider": "pollinations",
         "model": model,
+        "file_size_bytes": stored.size_bytes,
+        "sha256": stored.sha256,
     }
 
 
+async def _huggingface_estimated_time(response: httpx.Response) -> Optional[float]:
+    """Read HuggingFace's ``estimated_time`` (seconds) from a "Model is loading" body."""
+    hint = parse_retry_after(response.headers.get("retry-after"))
+    try:
+        body = json.loads(await response.aread())
+    except ValueError:
+        return hint
+    estimated = body.get("estimated_time") if isinstance(body, dict) else None
+    if isinstance(estimated, (int, float)):
+        return float(estimated)
+    return hint
+
+
 async def generate_image_huggingface(
     prompt: str,
     size: str = "1024x1024",
@@ -235,43 +423,86 @@ async def generate_image_huggingface(
 
     api_url = f"https://api-inference.huggingface.co/models/{model}"
 
-    timeout = httpx.Timeout(120.0)  # HF can be slow on cold starts
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
-            api_url,
-            headers=headers,
-            json=payload,
-        )
-
+    # The HuggingFace client uses a longer read timeout; HF can be slow on cold starts
+    client = http_clients.get(ImageProvider.HUGGINGFACE.value)
+    timeout = deadline.cap_timeout(client.timeout)
+    async with client.stream(
+        "POST", api_url, headers=headers, json=payload, timeout=timeout
+    ) as response:
         if response.status_code == 503:
-            raise ValueError(
+            raise RetryableProviderError(
                 "Model is loading. Please try again in a few minutes. "
-                "This is common with HuggingFace free tier on cold starts."
+                "This is common with HuggingFace free tier on cold starts.",
+                retry_after=await _huggingface_estimated_time(response),
             )
 
         response.raise_for_status()
-        img_data = response.content
-
-    # Save to file
-    if save_path is None:
-        save_path = DEFAULT_OUTPUT_DIR / f"generated_{len(list(DEFAULT_OUTPUT_DIR.glob('*')))}.png"
-
-    save_path = Path(save_path)
-    save_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(save_path, "wb") as f:
-        f.write(img_data)
+        stored = await stream_to_file(response, DEFAULT_OUTPUT_DIR, save_path, MAX_DOWNLOAD_BYTES)
+    record_download(ImageProvider.HUGGINGFACE, stored)
 
     return {
-        "image_path": str(save_path.absolute()),
+        "image_path": str(stored.path.absolute()),
         "url": api_url,
         "size": size,
         "prompt": prompt,
         "provider": "huggingface",
         "model": model,
+        "file_size_bytes": stored.size_bytes,
+        "sha256": stored.sha256,
     }
 
 
+@asynccontextmanager
+async def reserve_image_memory(image_path: str, component: str) -> AsyncIterator[Reservation]:
+    """
+    Hold the memory governor's estimate for one operation on ``image_path``.
+
+    The estimate comes from the (cached) header metadata, so nothing is decoded while
+    waiting. Time spent queued is recorded as the ``memory_wait`` stage. The bytes are
+    released when the block exits, unless the reservation was handed off to a worker,
+    which then releases them once its job has actually ended.
+    """
+    metadata = await get_image_metadata(image_path)
+    nbytes = imaging.working_set_bytes(
+        tuple(metadata["size"]), metadata["mode"], metadata["frame_count"]
+    )
+    reservation = await memory_governor.hold(nbytes)
+    metrics.observe(
+        "stage_duration_seconds", reservation.waited, stage="memory_wait", component=component
+    )
+    try:
+        yield reservation
+    finally:
+        if not reservation.handed_off:
+            reservation.release()
+
+
+async def run_image_op(description: str, func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a Pillow operation on ``args[0]`` in the worker pool.
+
+    Waits for the memory governor to admit the operation, then reports when the work
+    starts and ends. If the call is cancelled while the operation runs, its memory stays
+    reserved until it finishes and whatever it wrote is then deleted (the source image
+    is kept).
+    """
+    reporter = progress.current()
+    deadline.set_stage("waiting for memory")
+    async with reserve_image_memory(str(args[0]), func.__name__) as reservation:
+        await progress.report_items(reporter, 0, 1, f"{description}: processing")
+        deadline.set_stage(description.lower())
+        with tracing.span(f"image.{func.__name__}", image_path=str(args[0])):
+            result = await image_workers.run(
+                func,
+                *args,
+                cleanup=lambda output: imaging.remove_outputs(output, keep=[args[0]]),
+                on_done=reservation.hand_off(),
+            )
+    record_image_op(func.__name__, args[0], result)
+    await progress.report_items(reporter, 1, 1, f"{description}: written")
+    return result
+
+
 async def resize_image_file(
     image_path: str,
     width: Optional[int] = None,
@@ -280,7 +511,7 @@ async def resize_image_file(
     output_path: Optional[str] = None,
 ) -> dict[str, Any]:
     """
-    Resize an existing image file.
+    Resize an existing image file in the image worker pool.
 
     Args:
         image_path: Path to the source image
@@ -292,49 +523,184 @@ async def resize_image_file(
     Returns:
         Dictionary with new image path and dimensions
     """
-    img_path = Path(image_path)
-    if not img_path.exists():
-        raise FileNotFoundError(f"Image not found: {image_path}")
-
-    img = Image.open(img_path)
-    original_size = img.size
-
-    # Calculate dimensions
-    if width is None and height is None:
-        raise ValueError("Must specify at least width or height")
-
-    if maintain_aspect:
-        if width and height:
-            # Use width, calculate height
-            aspect = img.size[1] / img.size[0]
-            height = int(width * aspect)
-        elif width:
-            aspect = img.size[1] / img.size[0]
-            height = int(width * aspect)
-        elif height:
-            aspect = img.size[0] / img.size[1]
-            width = int(height * aspect)
-    else:
-        width = width or img.size[0]
-        height = height or img.size[1]
+    return await run_image_op(
+        "Resizing image",
+        imaging.resize_image,
+        image_path,
+        width,
+        height,
+        maintain_aspect,
+        output_path,
+    )
+
+
+async def resize_image_variants(
+    image_path: str,
+    variants: list[dict[str, Any]],
+    output_dir: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Produce several resized variants of an image from one decode, in the worker pool.
 
-    # Resize
-    resized_img = img.resize((width, height), Image.Resampling.LANCZOS)
+    Args:
+        image_path: Path to the source image
+        variants: Variant specs (width, height, maintain_aspect, format, quality,
+            output_path)
+        output_dir: Optional directory for variants without an output_path
+
+    Returns:
+        Dictionary with decode timing and per-variant results and timings
+    """
+    description = f"Resizing {len(variants)} variants"
+    return await run_image_op(
+        description, imaging.resize_variants, image_path, variants, output_dir
+    )
 
-    # Save
-    if output_path is None:
-        stem = img_path.stem
-        suffix = img_path.suffix
-        output_path = img_path.parent / f"{stem}_resized{suffix}"
-    else:
-        output_path = Path(output_path)
 
-    resized_img.save(output_path)
+async def process_image_file(
+    image_path: str,
+    operations: list[dict[str, Any]],
+    outputs: Optional[list[dict[str, Any]]] = None,
+    output_dir: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Run a chain of operations on one decode of an image, in the worker pool.
 
+    Args:
+        image_path: Path to the source image
+        operations: Ordered operation specs (crop, resize, rotate, exif_transpose,
+            flatten, convert)
+        outputs: Optional encodes of the result (format, quality, output_path)
+        output_dir: Optional directory for outputs without an output_path
+
+    Returns:
+        Dictionary with decode timing, per-operation timings and per-output results
+    """
+    return await run_image_op(
+        f"Processing image ({len(operations)} operations)",
+        imaging.process_image,
+        image_path,
+        operations,
+        outputs,
+        output_dir,
+    )
+
+
+async def batch_process_directory(
+    pattern: str,
+    operations: list[dict[str, Any]],
+    output_dir: str,
+    outputs: Optional[list[dict[str, Any]]] = None,
+    overwrite: bool = False,
+) -> dict[str, Any]:
+    """
+    Run a ``process_image`` pipeline over every image a glob pattern matches.
+
+    Files run in the batch process pool. Outputs mirror the directory layout below the
+    pattern's fixed prefix; files whose outputs are all newer than the source are skipped
+    unless ``overwrite`` is set, and files already inside ``output_dir`` are ignored.
+    Progress is reported per file and one file's failure does not stop the batch.
+
+    Args:
+        pattern: Glob pattern (``**`` matches recursively)
+        operations: Pipeline operations, as for ``process_image``
+        output_dir: Destination directory
+        outputs: Output specs with format, quality and a filename suffix
+        overwrite: Reprocess files whose outputs are up to date
+
+    Returns:
+        Aggregate counts, bytes, summed stage timings, throughput and per-file errors
+    """
+    imaging.validate_operations(operations)
+    started = time.perf_counter()
+    root = batch.pattern_root(pattern)
+    target_dir = Path(output_dir)
+    paths = [
+        Path(path)
+        for path in expand_image_paths(None, pattern, MAX_DIRECTORY_BATCH)
+        if not batch.is_within(Path(path), target_dir)
+    ]
+    reporter = progress.current()
+    deadline.set_stage("batch processing")
+    summary: dict[str, Any] = {
+        "processed": 0,
+        "skipped": 0,
+        "failed": 0,
+        "outputs_written": 0,
+        "bytes_in": 0,
+        "bytes_out": 0,
+    }
+    stage_ms = dict.fromkeys(("decode", "process", "encode", "write"), 0.0)
+    errors: list[dict[str, str]] = []
+    pending = iter(paths)
+    completed = 0
+
+    # Plan the whole batch first: sources mapping to the same output fail, not overwrite
+    plans: dict[Path, list[dict[str, Any]]] = {}
+    plan_errors: dict[Path, str] = {}
+    for path in paths:
+        try:
+            plans[path] = batch.plan_outputs(path, root, target_dir, operations, outputs)
+        except ValueError as e:
+            plan_errors[path] = str(e)
+    plan_errors.update(batch.find_collisions(plans))
+
+    async def process(path: Path) -> None:
+        if path in plan_errors:
+            raise ValueError(plan_errors[path])
+        planned = plans[path]
+        if not overwrite and batch.is_up_to_date(path, planned):
+            summary["skipped"] += 1
+            return
+        for parent in {Path(spec["output_path"]).parent for spec in planned}:
+            parent.mkdir(parents=True, exist_ok=True)
+        async with reserve_image_memory(str(path), "batch_process_directory") as reservation:
+            with tracing.span("image.process_image", image_path=str(path)):
+                result = await batch_workers.run(
+                    imaging.process_image,
+                    str(path),
+                    operations,
+                    planned,
+                    cleanup=lambda output: imaging.remove_outputs(output, keep=[str(path)]),
+                    on_done=reservation.hand_off(),
+                )
+        record_image_op("batch_process_directory", str(path), result)
+        summary["processed"] += 1
+        summary["outputs_written"] += len(result["outputs"])
+        summary["bytes_in"] += path.stat().st_size
+        summary["bytes_out"] += sum(output["file_size_bytes"] for output in result["outputs"])
+        for entry in [result, *result["outputs"]]:
+            for stage in stage_ms:
+                stage_ms[stage] += entry.get(f"{stage}_ms", 0.0)
+
+    async def feed() -> None:
+        nonlocal completed
+        for path in pending:
+            try:
+                await process(path)
+            except Exception as e:
+                summary["failed"] += 1
+                errors.append({"path": str(path), "error": str(e)})
+            completed += 1
+            await progress.report_items(
+                reporter, completed, len(paths), f"{completed} of {len(paths)}: {path.name}"
+            )
+
+    # A few more feeders than workers keeps the pool busy without a task per file
+    await asyncio.gather(*(feed() for _ in range(batch_workers.max_workers * 2)))
+
+    elapsed = time.perf_counter() - started
     return {
-        "image_path": str(output_path.absolute()),
-        "original_size": original_size,
-        "new_size": (width, height),
+        "pattern": pattern,
+        "output_dir": str(target_dir.absolute()),
+        "matched": len(paths),
+        **summary,
+        "errors": errors,
+        "stage_ms": {stage: round(total, 3) for stage, total in stage_ms.items()},
+        "workers": batch_workers.max_workers,
+        "executor": batch_workers.kind,
+        "duration_seconds": round(elapsed, 3),
+        "files_per_second": round(summary["processed"] / elapsed, 2) if elapsed else 0.0,
     }
 
 
@@ -343,90 +709,617 @@ async def convert_image_format(
     target_format: str,
     output_path: Optional[str] = None,
     quality: int = 95,
+    effort: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    candidate_formats: Optional[list[str]] = None,
 ) -> dict[str, Any]:
     """
-    Convert image to a different format.
+    Convert image to a different format in the image worker pool.
 
     Args:
         image_path: Path to source image
-        target_format: Target format (PNG, JPEG, WEBP, GIF)
-        output_path: Optional output path
+        target_format: Target format (PNG, JPEG, WEBP, GIF, or AUTO to pick the smallest
+            acceptable candidate)
+        output_path: Optional output path (for AUTO, its extension becomes the chosen
+            format's)
         quality: Quality for lossy formats (1-100)
+        effort: Encoder effort preset (fast, balanced, max)
+        max_bytes: AUTO only: byte budget for the output
+        candidate_formats: AUTO only: formats to try
 
     Returns:
-        Dictionary with new image path and format info
-    """
-    target_format = target_format.upper()
-    if target_format not in SUPPORTED_FORMATS:
-        raise ValueError(f"Unsupported format. Choose from: {SUPPORTED_FORMATS}")
-
-    img_path = Path(image_path)
-    if not img_path.exists():
-        raise FileNotFoundError(f"Image not found: {image_path}")
-
-    img = Image.open(img_path)
-
-    # Handle transparency for formats that don't support it
-    if target_format == "JPEG" and img.mode in ("RGBA", "LA", "P"):
-        # Convert to RGB
-        background = Image.new("RGB", img.size, (255, 255, 255))
-        if img.mode == "P":
-            img = img.convert("RGBA")
-        background.paste(img, mask=img.split()[-1] if img.mode == "RGBA" else None)
-        img = background
-
-    # Determine output path
-    if output_path is None:
-        extension = target_format.lower()
-        if extension == "jpeg":
-            extension = "jpg"
-        output_path = img_path.parent / f"{img_path.stem}.{extension}"
-    else:
-        output_path = Path(output_path)
+        Dictionary with new image path and format info (AUTO adds per-candidate results)
+    """
+    return await run_image_op(
+        f"Converting to {target_format}",
+        imaging.convert_image,
+        image_path,
+        target_format,
+        output_path,
+        quality,
+        effort,
+        max_bytes,
+        candidate_formats,
+    )
+
+
+async def get_image_metadata(image_path: str) -> dict[str, Any]:
+    """
+    Get metadata and information about an image.
 
-    # Save with appropriate parameters
-    save_kwargs = {"format": target_format}
-    if target_format in ("JPEG", "WEBP"):
-        save_kwargs["quality"] = quality
-    elif target_format == "PNG":
-        save_kwargs["optimize"] = True
+    Results are cached until the file's mtime or size changes, so repeat lookups only
+    cost a ``stat``; misses parse the image headers in the worker pool.
 
-    img.save(output_path, **save_kwargs)
+    Args:
+        image_path: Path to the image file
+
+    Returns:
+        Dictionary with image metadata
+    """
+    path, version = file_version(image_path)
+    cached = metadata_cache.get(path, version)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    with tracing.span("image.read_metadata", image_path=image_path):
+        metadata = await image_workers.run(imaging.read_image_metadata, image_path)
+    metrics.observe(
+        "stage_duration_seconds",
+        time.perf_counter() - started,
+        stage="metadata_read",
+        component="read_image_metadata",
+    )
+    metadata_cache.put(path, version, metadata)
+    return metadata
+
+
+async def get_images_metadata(
+    image_paths: Optional[list[str]] = None,
+    pattern: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Get metadata for many images in one call.
+
+    Args:
+        image_paths: Explicit image paths
+        pattern: Optional glob pattern (e.g. "generated_images/*.png")
+
+    Returns:
+        Dictionary with per-image metadata, per-image errors and cache counters
+    """
+    paths = expand_image_paths(image_paths, pattern, MAX_METADATA_BATCH)
+    reporter = progress.current()
+    completed = 0
+
+    async def read(path: str) -> dict[str, Any]:
+        nonlocal completed
+        try:
+            return await get_image_metadata(path)
+        finally:
+            completed += 1
+            await progress.report_items(
+                reporter, completed, len(paths), f"Read {completed} of {len(paths)} images"
+            )
+
+    outcomes = await asyncio.gather(*(read(path) for path in paths), return_exceptions=True)
+
+    images = []
+    errors = []
+    for path, outcome in zip(paths, outcomes):
+        if isinstance(outcome, Exception):
+            errors.append({"path": path, "error": str(outcome)})
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        else:
+            images.append(outcome)
 
     return {
-        "image_path": str(output_path.absolute()),
-        "format": target_format,
-        "original_format": img_path.suffix[1:].upper(),
+        "images": images,
+        "errors": errors,
+        "count": len(images),
+        "cache": metadata_cache.stats(),
     }
 
 
-async def get_image_metadata(image_path: str) -> dict[str, Any]:
+async def dispatch_generation(arguments: dict[str, Any]) -> dict[str, Any]:
     """
-    Get metadata and information about an image.
+    Run a ``generate_image`` request, serving repeats from the generation cache.
 
     Args:
-        image_path: Path to the image file
+        arguments: Tool arguments (prompt, provider, size, model, seed, output_filename,
+            use_cache)
 
     Returns:
-        Dictionary with image metadata
+        Provider result dictionary, with a ``cache`` entry when caching is enabled
+    """
+    prompt = arguments.get("prompt")
+    if not prompt:
+        raise ValueError("prompt is required")
+    provider = arguments.get("provider", "pollinations")  # Default to free provider
+    size = arguments.get("size", "1024x1024")
+    output_filename = arguments.get("output_filename")
+    seed = arguments.get("seed")
+
+    if provider == "auto":
+        return await dispatch_auto(arguments)
+    try:
+        provider = ImageProvider(provider)
+    except ValueError:
+        raise ValueError(f"Unsupported provider: {provider}") from None
+    model = arguments.get("model") or DEFAULT_MODELS[provider]
+
+    save_path = None
+    if output_filename:
+        save_path = DEFAULT_OUTPUT_DIR / output_filename
+
+    cache = generation_cache if arguments.get("use_cache", True) else None
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(provider.value, model, prompt, size, seed)
+        hit = cache.get(cache_key)
+        if hit is not None:
+            # Never hand out the cache object itself: the caller owns what it is given
+            image_path = save_path
+            if image_path is None:
+                image_path = allocate_output_path(DEFAULT_OUTPUT_DIR, suffix=hit.path.suffix)
+            image_path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(shutil.copyfile, hit.path, image_path)
+            result = dict(hit.metadata)
+            result["image_path"] = str(image_path.absolute())
+            result["cache"] = {"hit": True, **cache.stats()}
+            return result
+
+    async def call_provider() -> dict[str, Any]:
+        if provider == ImageProvider.OPENAI:
+            return await generate_image_openai(prompt, size, save_path)
+        if provider == ImageProvider.POLLINATIONS:
+            return await generate_image_pollinations(prompt, size, save_path, seed, model)
+        return await generate_image_huggingface(prompt, size, save_path, model)
+
+    rate_limit_wait = 0.0
+    attempts = 0
+
+    async def attempt() -> dict[str, Any]:
+        nonlocal rate_limit_wait, attempts
+        attempts += 1
+        breaker = circuit_breaker(provider)
+        breaker.allow()
+        try:
+            deadline.set_stage("waiting for a rate-limit slot")
+            with tracing.span("rate_limit.wait", provider=provider.value, model=model):
+                rate_limit_wait += await rate_limiters.acquire(
+                    provider.value, model, max_wait=deadline.cap(rate_limiters.max_wait)
+                )
+            # Hold the provider slot per attempt so backoff waits do not block other calls
+            deadline.set_stage(f"waiting for a {provider.value} connection slot")
+            async with provider_semaphore(provider):
+                _provider_in_flight[provider] = _provider_in_flight.get(provider, 0) + 1
+                deadline.set_stage(f"waiting for {provider.value} to respond")
+                await progress.report_stage(
+                    progress.REQUEST_SENT, f"Request sent to {provider.value}"
+                )
+                started = time.monotonic()
+                outcome = "cancelled"
+                try:
+                    with tracing.span(
+                        "provider.request",
+                        provider=provider.value,
+                        model=model,
+                        size=size,
+                        attempt=attempts,
+                    ):
+                        attempt_result = await call_provider()
+                    outcome = "ok"
+                except Exception as e:
+                    outcome = type(e).__name__
+                    if retry_hint(e)[0]:
+                        provider_router.record(
+                            provider.value, model, time.monotonic() - started, ok=False
+                        )
+                    raise
+                finally:
+                    _provider_in_flight[provider] -= 1
+                    metrics.observe(
+                        "stage_duration_seconds",
+                        time.monotonic() - started,
+                        stage="provider_request",
+                        component=provider.value,
+                    )
+                    metrics.inc("provider_attempts_total", provider=provider.value, outcome=outcome)
+            provider_router.record(provider.value, model, time.monotonic() - started, ok=True)
+        except Exception as e:
+            # Only provider-side failures (the retryable kind) count against the breaker
+            if retry_hint(e)[0]:
+                breaker.record_failure()
+            else:
+                breaker.release()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return attempt_result
+
+    async def generate() -> dict[str, Any]:
+        policy = retry_policy(provider)
+        result, retry_stats = await call_with_retry(
+            attempt,
+            policy,
+            retry_budget(provider),
+            deadline=deadline.cap_absolute(time.monotonic() + policy.deadline),
+        )
+        if cache is not None and cache_key is not None:
+            with tracing.span("cache.put"):
+                await asyncio.to_thread(
+                    cache.put, cache_key, Path(result["image_path"]), result, result.get("sha256")
+                )
+            result["cache"] = {"hit": False, **cache.stats()}
+        result["retry"] = retry_stats.as_dict()
+        result["rate_limit_wait_seconds"] = round(rate_limit_wait, 3)
+        return result
+
+    if not arguments.get("use_cache", True):
+        # Opting out of the cache asks for a fresh image, so do not join other calls
+        return await generate()
+
+    flight_key = cache_key or make_cache_key(provider.value, model, prompt, size, seed)
+    with tracing.span("generation.single_flight") as flight_span:
+        shared_result, coalesced = await in_flight_generations.do(flight_key, generate)
+        flight_span.set(coalesced=coalesced)
+    if not coalesced:
+        return shared_result
+
+    # Joined another caller's generation: give this caller its own copy of the image
+    result = dict(shared_result)
+    source = Path(shared_result["image_path"])
+    target = save_path
+    if target is None:
+        target = allocate_output_path(DEFAULT_OUTPUT_DIR, suffix=source.suffix or ".png")
+    if target.absolute() != source.absolute():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, source, target)
+    result["image_path"] = str(target.absolute())
+    result["coalesced"] = True
+    return result
+
+
+def auto_route_candidates(size: str) -> list[tuple[str, str]]:
+    """
+    List the provider/model pairs an ``auto`` request may use right now.
+
+    Entries come from ``IMAGEGEN_AUTO_PROVIDERS`` ("provider" or "provider:model").
+    Providers missing an API key, with an open circuit breaker, or unable to produce
+    ``size`` are left out.
+
+    Args:
+        size: Requested image size
+
+    Returns:
+        (provider, model) pairs in preference order
+    """
+    candidates = []
+    for entry in provider_router.preference:
+        name, _, model = entry.partition(":")
+        try:
+            provider = ImageProvider(name)
+        except ValueError:
+            raise ValueError(f"Unsupported provider in IMAGEGEN_AUTO_PROVIDERS: {name}") from None
+        if provider != ImageProvider.POLLINATIONS and not get_api_key(provider):
+            continue
+        if provider == ImageProvider.OPENAI and size not in SUPPORTED_OPENAI_SIZES:
+            continue
+        if circuit_breaker(provider).snapshot()["retry_after_seconds"]:
+            continue
+        candidates.append((provider.value, model or DEFAULT_MODELS[provider]))
+    return candidates
+
+
+async def dispatch_auto(arguments: dict[str, Any]) -> dict[str, Any]:
     """
-    img_path = Path(image_path)
-    if not img_path.exists():
-        raise FileNotFoundError(f"Image not found: {image_path}")
+    Run a ``generate_image`` request with ``provider: "auto"``.
+
+    The request goes to the available provider with the lowest expected time to a
+    successful image. If it fails, the next provider is tried. With hedging enabled, a
+    second provider is also started once the first passes its recent latency
+    percentile; whichever finishes first wins and the other is cancelled.
 
-    img = Image.open(img_path)
+    Args:
+        arguments: ``generate_image`` arguments (``model`` is chosen per provider)
 
+    Returns:
+        The winning provider's result with a ``routing`` entry describing the decision
+    """
+    if arguments.get("model"):
+        raise ValueError(
+            "model cannot be combined with provider 'auto'; "
+            "list provider:model pairs in IMAGEGEN_AUTO_PROVIDERS instead"
+        )
+    size = arguments.get("size", "1024x1024")
+    hedge = arguments.get("hedge", provider_router.hedge)
+    candidates = provider_router.rank(auto_route_candidates(size))
+    if not candidates:
+        raise ValueError(f"No provider is currently available for provider 'auto' at {size}")
+
+    routing: dict[str, Any] = {
+        "mode": "auto",
+        "candidates": [candidate.as_dict() for candidate in candidates],
+        "selected": candidates[0].provider,
+        "hedged": False,
+        "failed": [],
+    }
+    queue = list(candidates)
+    pending: dict[asyncio.Task, Any] = {}
+    hedge_paths: list[Path] = []
+
+    def launch(candidate: Any, output_filename: Optional[str]) -> None:
+        item = {
+            **arguments,
+            "provider": candidate.provider,
+            "model": candidate.model,
+            "output_filename": output_filename,
+        }
+        pending[asyncio.create_task(dispatch_generation(item))] = candidate
+
+    launch(queue.pop(0), arguments.get("output_filename"))
+    started = time.monotonic()
+    winner = None
+    try:
+        while pending and winner is None:
+            timeout = None
+            if hedge and not routing["hedged"] and queue and len(pending) == 1:
+                primary = next(iter(pending.values()))
+                delay = provider_router.hedge_delay(primary.provider, primary.model)
+                if delay is not None:
+                    timeout = max(0.0, delay - (time.monotonic() - started))
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                # The hedge writes to its own file so two providers never race on one path
+                hedge_path = allocate_output_path(DEFAULT_OUTPUT_DIR)
+                hedge_paths.append(hedge_path)
+                routing["hedged"] = True
+                routing["hedge_after_seconds"] = round(time.monotonic() - started, 3)
+                launch(queue.pop(0), hedge_path.name)
+                continue
+            # Prefer the earlier launch if both finished in the same tick
+            for task in sorted(done, key=list(pending).index):
+                candidate = pending.pop(task)
+                error = task.exception()
+                if error is not None:
+                    routing["failed"].append(
+                        {"provider": candidate.provider, "error": error_message(error)}
+                    )
+                elif winner is None:
+                    winner = (candidate, task.result())
+            if winner is None and not pending and queue:
+                launch(queue.pop(0), arguments.get("output_filename"))
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        winning_path = Path(winner[1]["image_path"]) if winner is not None else None
+        for hedge_path in hedge_paths:
+            if hedge_path.absolute() != winning_path:
+                hedge_path.unlink(missing_ok=True)
+
+    if winner is None:
+        failures = "; ".join(f"{f['provider']}: {f['error']}" for f in routing["failed"])
+        raise RuntimeError(f"All providers failed for provider 'auto': {failures}")
+
+    candidate, result = winner
+    output_filename = arguments.get("output_filename")
+    if output_filename and Path(result["image_path"]) in [p.absolute() for p in hedge_paths]:
+        save_path = DEFAULT_OUTPUT_DIR / output_filename
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(os.replace, result["image_path"], save_path)
+        result["image_path"] = str(save_path.absolute())
+    routing["winner"] = candidate.provider
+    routing["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    result["routing"] = routing
+    return result
+
+
+# Background generations for submit_generation; workers start on the first submission.
+# Jobs are journaled so a restart re-issues unfinished work.
+async def run_job(arguments: dict[str, Any]) -> dict[str, Any]:
+    """
+    Run a background generation.
+
+    Its tool call has already returned, so nothing reports progress and the job is
+    traced as a request of its own; a ``deadline_ms`` counts from when the job starts.
+    """
+    root = tracing.start_trace(
+        tracer,
+        "job.generate_image",
+        **{key: arguments.get(key) for key in ("provider", "model", "size")},
+    )
+    with root, progress.reporting(None):
+        if arguments.get("deadline_ms"):
+            return await deadline.run_within(
+                arguments["deadline_ms"], dispatch_generation(arguments)
+            )
+        return await dispatch_generation(arguments)
+
+
+job_queue = JobQueue.from_env(run_job, DEFAULT_OUTPUT_DIR / ".jobs" / "journal.jsonl")
+JOB_TOOLS = {"submit_generation", "get_job_status", "await_job", "cancel_job"}
+MAX_AWAIT_SECONDS = env_float("MAX_AWAIT_SECONDS", 300.0)
+SHUTDOWN_GRACE_SECONDS = env_float("SHUTDOWN_GRACE_SECONDS", 30.0)
+
+
+def submit_generation(arguments: dict[str, Any]) -> dict[str, Any]:
+    """
+    Queue a ``generate_image`` request to run in the background.
+
+    Args:
+        arguments: ``generate_image`` arguments
+
+    Returns:
+        The new job's status, including its ``job_id``
+    """
+    if not arguments.get("prompt"):
+        raise ValueError("prompt is required")
+    return job_queue.submit(arguments).as_dict()
+
+
+async def await_job(job_id: str, timeout: float = 30.0) -> dict[str, Any]:
+    """
+    Wait up to ``timeout`` seconds for a job and return its status.
+
+    The job keeps running if the wait times out; call again or poll later.
+    """
+    timeout = min(max(0.0, timeout), MAX_AWAIT_SECONDS)
+    job = await job_queue.wait(job_id, timeout)
+    return job.as_dict()
+
+
+async def cancel_job(job_id: str) -> dict[str, Any]:
+    """Cancel a queued or running job and return its status once it has stopped."""
+    job = job_queue.cancel(job_id)
+    # A running job stops at its next await; give it a moment to clean up
+    await job_queue.wait(job_id, timeout=5.0)
+    return job.as_dict()
+
+
+def get_provider_status() -> dict[str, Any]:
+    """
+    Report the live state of every provider's limits.
+
+    Returns:
+        Per-provider concurrency, rate limiter, circuit breaker and retry budget state
+    """
+    limiters = rate_limiters.snapshot()
+    routing_stats = provider_router.snapshot()
+    status = {}
+    for provider in ImageProvider:
+        limit = env_int(
+            f"{provider.value.upper()}_CONCURRENCY", DEFAULT_PROVIDER_CONCURRENCY[provider]
+        )
+        status[provider.value] = {
+            "concurrency": {"limit": limit, "in_flight": _provider_in_flight.get(provider, 0)},
+            "rate_limiters": {
+                name: snapshot
+                for name, snapshot in limiters.items()
+                if name == provider.value or name.startswith(f"{provider.value}:")
+            },
+            "circuit_breaker": circuit_breaker(provider).snapshot(),
+            "retry_budget_tokens": round(retry_budget(provider).tokens, 3),
+            "latency": {
+                name.partition(":")[2]: snapshot
+                for name, snapshot in routing_stats.items()
+                if name.startswith(f"{provider.value}:")
+            },
+        }
+    return status
+
+
+def get_server_stats(output_format: str = "json") -> Any:
+    """
+    Report server-wide metrics.
+
+    Args:
+        output_format: "json" for a structured snapshot, "prometheus" for the text
+            exposition format
+
+    Returns:
+        Per-tool and per-stage latency histograms, byte and error counters, plus cache,
+        job, coalescing and worker pool state; or the Prometheus text
+    """
+    if output_format == "prometheus":
+        return metrics.prometheus_text()
+    if output_format != "json":
+        raise ValueError("format must be 'json' or 'prometheus'")
     return {
-        "path": str(img_path.absolute()),
-        "size": img.size,
-        "width": img.size[0],
-        "height": img.size[1],
-        "format": img.format,
-        "mode": img.mode,
-        "file_size_bytes": img_path.stat().st_size,
+        **metrics.snapshot(),
+        "generation_cache": generation_cache.stats() if generation_cache is not None else None,
+        "metadata_cache": metadata_cache.stats(),
+        "in_flight_generations": in_flight_generations.stats(),
+        "jobs": job_queue.stats(),
+        "image_workers": {"pending": image_workers.pending},
+        "batch_workers": {"pending": batch_workers.pending},
+        "memory": memory_governor.stats(),
+        "tracing": tracer.stats() if tracer is not None else None,
     }
 
 
+async def generate_images_batch(
+    items: list[dict[str, Any]],
+    defaults: Optional[dict[str, Any]] = None,
+) -> dict[str, Any]:
+    """
+    Generate several images concurrently, isolating per-item failures.
+
+    Items run in parallel, bounded by each provider's concurrency cap. A failing item
+    is reported in its own entry and never aborts the rest of the batch.
+
+    Args:
+        items: Per-image ``generate_image`` arguments (each needs a prompt)
+        defaults: Arguments applied to every item that does not set them
+
+    Returns:
+        Dictionary with per-item results/errors and succeeded/failed counts
+    """
+    if not items:
+        raise ValueError("items must contain at least one image request")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"Too many items: {len(items)} (maximum is {MAX_BATCH_SIZE})")
+
+    defaults = defaults or {}
+    reporter = progress.current()
+    completed = 0
+
+    async def generate(index: int, item: dict[str, Any]) -> dict[str, Any]:
+        nonlocal completed
+        outcome = "failed"
+        try:
+            # Report items, not each item's bytes, so updates stay monotonic
+            with progress.reporting(None):
+                result = await dispatch_generation({**defaults, **item})
+            outcome = "done"
+            return result
+        finally:
+            completed += 1
+            message = f"Item {index} {outcome} ({completed}/{len(items)})"
+            await progress.report_items(reporter, completed, len(items), message)
+
+    outcomes = await asyncio.gather(
+        *(generate(index, item) for index, item in enumerate(items)),
+        return_exceptions=True,
+    )
+
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            if not isinstance(outcome, Exception):
+                raise outcome
+            results.append({"index": index, "status": "error", "error": error_message(outcome)})
+        else:
+            results.append({"index": index, "status": "ok", "result": outcome})
+
+    succeeded = sum(1 for item in results if item["status"] == "ok")
+    return {
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+    }
+
+
+# Shared schema for the per-call time budget accepted by generation and image tools
+DEADLINE_MS_SCHEMA = {
+    "type": "integer",
+    "minimum": 1,
+    "description": "Optional time budget in milliseconds; the call is cancelled when it runs out",
+}
+
+EFFORT_SCHEMA = {
+    "type": "string",
+    "enum": imaging.EFFORT_LEVELS,
+    "description": "Encoder effort: fast, balanced or max (smaller files, slower encodes)",
+}
+
+
 # Define MCP tools
 @app.list_tools()
 async def list_tools() -> list[Tool]:
@@ -440,6 +1333,8 @@ async def list_tools() -> list[Tool]:
             - openai: OpenAI's GPT-Image-1 (requires OPENAI_API_KEY)
             - pollinations: Pollinations.ai (FREE, no API key required!)
             - huggingface: HuggingFace Inference API (FREE tier available, requires HUGGINGFACE_API_KEY)
+            - auto: picks the available provider with the best recent latency and error rate,
+              falls back to the next one on failure and can hedge slow requests
 
             Returns the path to the generated image file. Images are automatically saved to the
             generated_images directory.
@@ -456,7 +1351,7 @@ async def list_tools() -> list[Tool]:
                     },
                     "provider": {
                         "type": "string",
-                        "enum": ["openai", "pollinations", "huggingface"],
+                        "enum": ["openai", "pollinations", "huggingface", "auto"],
                         "default": "pollinations",
                         "description": "Image generation provider (pollinations is free with no API key!)",
                     },
@@ -477,16 +1372,195 @@ async def list_tools() -> list[Tool]:
                         "type": "integer",
                         "description": "Optional: Random seed for reproducibility (pollinations only)",
                     },
+                    "use_cache": {
+                        "type": "boolean",
+                        "default": True,
+                        "description": (
+                            "Reuse a previously generated image for an identical request"
+                        ),
+                    },
+                    "hedge": {
+                        "type": "boolean",
+                        "description": (
+                            "provider 'auto' only: start a second provider if the first is "
+                            "slower than usual (default: IMAGEGEN_HEDGE_ENABLED)"
+                        ),
+                    },
+                    "deadline_ms": DEADLINE_MS_SCHEMA,
                 },
                 "required": ["prompt"],
             },
         ),
+        Tool(
+            name="generate_images",
+            description=f"""Generate several images in one call.
+
+            Items run concurrently (each provider has its own concurrency cap), so a batch
+            takes roughly as long as its slowest few images instead of the sum of all of them.
+            Each item accepts the same arguments as generate_image. A failed item is reported
+            with its error and does not abort the rest of the batch.
+
+            Up to {MAX_BATCH_SIZE} items per call.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "minItems": 1,
+                        "maxItems": MAX_BATCH_SIZE,
+                        "description": "Image requests (same fields as generate_image)",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "prompt": {"type": "string"},
+                                "provider": {
+                                    "type": "string",
+                                    "enum": ["openai", "pollinations", "huggingface", "auto"],
+                                },
+                                "size": {"type": "string"},
+                                "output_filename": {"type": "string"},
+                                "model": {"type": "string"},
+                                "seed": {"type": "integer"},
+                                "use_cache": {"type": "boolean"},
+                                "hedge": {"type": "boolean"},
+                            },
+                            "required": ["prompt"],
+                        },
+                    },
+                    "provider": {
+                        "type": "string",
+                        "enum": ["openai", "pollinations", "huggingface", "auto"],
+                        "description": "Default provider for items that do not set one",
+                    },
+                    "size": {
+                        "type": "string",
+                        "description": "Default size for items that do not set one",
+                    },
+                    "model": {
+                        "type": "string",
+                        "description": "Default model for items that do not set one",
+                    },
+                    "deadline_ms": DEADLINE_MS_SCHEMA,
+                },
+                "required": ["items"],
+            },
+        ),
+        Tool(
+            name="submit_generation",
+            description="""Start generate_image in the background and return a job ID at once.
+
+            Takes the same arguments as generate_image. Keep working and collect the image
+            later with await_job or get_job_status; cancel it with cancel_job. Jobs run on a
+            fixed number of workers (IMAGEGEN_JOB_WORKERS) and queue beyond that.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "prompt": {"type": "string"},
+                    "provider": {
+                        "type": "string",
+                        "enum": ["openai", "pollinations", "huggingface", "auto"],
+                    },
+                    "size": {"type": "string"},
+                    "output_filename": {"type": "string"},
+                    "model": {"type": "string"},
+                    "seed": {"type": "integer"},
+                    "use_cache": {"type": "boolean"},
+                    "hedge": {"type": "boolean"},
+                    "deadline_ms": {
+                        **DEADLINE_MS_SCHEMA,
+                        "description": (
+                            "Optional time budget in milliseconds, counted from when the job "
+                            "starts running"
+                        ),
+                    },
+                },
+                "required": ["prompt"],
+            },
+        ),
+        Tool(
+            name="get_job_status",
+            description="""Check a background generation job without waiting.
+
+            Returns the job's status (queued, running, succeeded, failed, cancelled), its
+            timings, and the generate_image result or error once finished. Without a job_id,
+            returns job counts by status.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {"type": "string", "description": "ID from submit_generation"},
+                },
+            },
+        ),
+        Tool(
+            name="await_job",
+            description=f"""Wait for a background generation job to finish.
+
+            Returns as soon as the job finishes, or its current status after timeout_seconds
+            (at most {MAX_AWAIT_SECONDS:g}); the job keeps running after a timeout.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {"type": "string", "description": "ID from submit_generation"},
+                    "timeout_seconds": {
+                        "type": "number",
+                        "default": 30,
+                        "description": "Longest time to wait",
+                    },
+                },
+                "required": ["job_id"],
+            },
+        ),
+        Tool(
+            name="cancel_job",
+            description="""Cancel a queued or running background generation job.
+
+            Returns the job's status afterwards. Finished jobs are left unchanged.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {"type": "string", "description": "ID from submit_generation"},
+                },
+                "required": ["job_id"],
+            },
+        ),
+        Tool(
+            name="get_provider_status",
+            description="""Diagnostics for image providers.
+
+            Shows each provider's concurrency use, client-side rate limiter state (per provider
+            and per model), circuit breaker state and remaining retry budget. Use it to see why
+            generations are queuing or failing fast.""",
+            inputSchema={"type": "object", "properties": {}},
+        ),
+        Tool(
+            name="get_server_stats",
+            description="""Server metrics: calls and latency histograms (p50/p90/p99/p99.9).
+
+            Covers every tool call and each stage inside it: provider request, time to first
+            byte, download, image decode/resize/encode and disk write. Also reports bytes in
+            and out, error counts by class, cache hit rates, job queue and worker pool state.
+            Set format to "prometheus" for the Prometheus text exposition format.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "enum": ["json", "prometheus"],
+                        "default": "json",
+                        "description": "Output format",
+                    },
+                },
+            },
+        ),
         Tool(
             name="resize_image",
             description="""Resize an existing image file. Can maintain aspect ratio or stretch to exact dimensions.
             
             Specify either width or height (or both). If only one dimension is specified and maintain_aspect is true,
-            the other dimension will be calculated automatically.""",
+            the other dimension will be calculated automatically.
+
+            Pass "variants" to produce several sizes (optionally in different formats) from a single
+            decode; per-variant timings are reported.""",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -511,6 +1585,31 @@ async def list_tools() -> list[Tool]:
                         "type": "string",
                         "description": "Optional custom output path",
                     },
+                    "variants": {
+                        "type": "array",
+                        "description": (
+                            "Optional: produce several sizes from one decode instead of a "
+                            "single resize. Each variant takes width/height, maintain_aspect, "
+                            "format, quality and output_path"
+                        ),
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "width": {"type": "integer"},
+                                "height": {"type": "integer"},
+                                "maintain_aspect": {"type": "boolean", "default": True},
+                                "format": {"type": "string", "enum": SUPPORTED_FORMATS},
+                                "quality": {"type": "integer", "minimum": 1, "maximum": 100},
+                                "effort": EFFORT_SCHEMA,
+                                "output_path": {"type": "string"},
+                            },
+                        },
+                    },
+                    "output_dir": {
+                        "type": "string",
+                        "description": "Optional directory for variants (defaults to the source's)",
+                    },
+                    "deadline_ms": DEADLINE_MS_SCHEMA,
                 },
                 "required": ["image_path"],
             },
@@ -521,7 +1620,17 @@ async def list_tools() -> list[Tool]:
             
             Supported formats: {', '.join(SUPPORTED_FORMATS)}
             
-            Quality parameter applies to lossy formats (JPEG, WEBP). PNG and GIF are lossless.""",
+            Quality parameter applies to lossy formats (JPEG, WEBP). PNG and GIF are lossless.
+
+            effort trades encode time for size: fast, balanced (default) or max.
+
+            target_format "AUTO" encodes WEBP, JPEG and PNG candidates in turn and keeps
+            the smallest one at the given quality, or with max_bytes the highest quality
+            that fits the budget. Every candidate's bytes and encode time are reported.
+
+            Animated GIF/WEBP sources keep every frame (and their timing) when converted to
+            GIF or WEBP; PNG and JPEG get the first frame. frame_count and frames_written
+            report which happened.""",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -531,12 +1640,15 @@ async def list_tools() -> list[Tool]:
                     },
                     "target_format": {
                         "type": "string",
-                        "enum": SUPPORTED_FORMATS,
-                        "description": "Target image format",
+                        "enum": SUPPORTED_FORMATS + [imaging.AUTO_FORMAT],
+                        "description": "Target image format, or AUTO to pick the smallest",
                     },
                     "output_path": {
                         "type": "string",
-                        "description": "Optional custom output path",
+                        "description": (
+                            "Optional custom output path; with AUTO its extension is "
+                            "replaced with the chosen format's"
+                        ),
                     },
                     "quality": {
                         "type": "integer",
@@ -545,15 +1657,151 @@ async def list_tools() -> list[Tool]:
                         "default": 95,
                         "description": "Quality for lossy formats (JPEG, WEBP)",
                     },
+                    "effort": EFFORT_SCHEMA,
+                    "max_bytes": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "AUTO only: byte budget; lower qualities are tried to fit",
+                    },
+                    "candidate_formats": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": SUPPORTED_FORMATS},
+                        "description": "AUTO only: formats to try (default WEBP, JPEG, PNG)",
+                    },
+                    "deadline_ms": DEADLINE_MS_SCHEMA,
                 },
                 "required": ["image_path", "target_format"],
             },
         ),
+        Tool(
+            name="process_image",
+            description="""Run several image operations in one call: one decode, all operations in
+            memory, one encode per output. Cheaper than chaining resize_image and
+            convert_image_format, and no intermediate files are written.
+
+            Operations run in order; each is an object with an "op" key:
+            - crop: left, top and right/bottom or width/height (pixels)
+            - resize: width and/or height, maintain_aspect (default true)
+            - rotate: degrees clockwise (quarter turns are lossless), optional background
+            - exif_transpose: apply the EXIF orientation so the pixels are upright
+            - flatten: composite transparency onto background (default white)
+            - convert: output format and quality (same as a single entry in "outputs")
+
+            Pass "outputs" to write the result in several formats or qualities at once.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "image_path": {
+                        "type": "string",
+                        "description": "Path to the source image",
+                    },
+                    "operations": {
+                        "type": "array",
+                        "description": "Ordered operations to apply",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "op": {"type": "string", "enum": imaging.PIPELINE_OPERATIONS},
+                                "left": {"type": "integer", "minimum": 0},
+                                "top": {"type": "integer", "minimum": 0},
+                                "right": {"type": "integer", "minimum": 1},
+                                "bottom": {"type": "integer", "minimum": 1},
+                                "width": {"type": "integer", "minimum": 1},
+                                "height": {"type": "integer", "minimum": 1},
+                                "maintain_aspect": {"type": "boolean", "default": True},
+                                "degrees": {"type": "number"},
+                                "background": {"type": "string"},
+                                "format": {"type": "string", "enum": SUPPORTED_FORMATS},
+                                "quality": {"type": "integer", "minimum": 1, "maximum": 100},
+                                "effort": EFFORT_SCHEMA,
+                            },
+                            "required": ["op"],
+                        },
+                    },
+                    "outputs": {
+                        "type": "array",
+                        "description": (
+                            "Optional: encodes of the final image. Each takes format, quality "
+                            "and output_path (default: <name>_processed.<ext>)"
+                        ),
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "format": {"type": "string", "enum": SUPPORTED_FORMATS},
+                                "quality": {"type": "integer", "minimum": 1, "maximum": 100},
+                                "effort": EFFORT_SCHEMA,
+                                "output_path": {"type": "string"},
+                            },
+                        },
+                    },
+                    "output_dir": {
+                        "type": "string",
+                        "description": "Optional directory for outputs (defaults to the source's)",
+                    },
+                    "deadline_ms": DEADLINE_MS_SCHEMA,
+                },
+                "required": ["image_path", "operations"],
+            },
+        ),
+        Tool(
+            name="batch_process_directory",
+            description="""Run a process_image pipeline over every image matching a glob pattern.
+
+            Files are processed in parallel in a process pool (one worker per CPU by default).
+            Outputs go to output_dir, mirroring the directories below the pattern's fixed
+            prefix, named <stem><suffix>.<ext>. Files whose outputs are already newer than
+            the source are skipped, so reruns only process new or changed images. Sources
+            that would write the same output (a.png and a.jpg as WEBP) fail instead of
+            overwriting each other. Reports progress per file and returns counts, bytes,
+            stage timings and per-file errors.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "pattern": {
+                        "type": "string",
+                        "description": 'Glob pattern, e.g. "generated_images/**/*.png"',
+                    },
+                    "operations": {
+                        "type": "array",
+                        "description": "Ordered operations, as for process_image",
+                        "items": {"type": "object", "properties": {"op": {"type": "string"}}},
+                    },
+                    "output_dir": {
+                        "type": "string",
+                        "description": "Destination directory",
+                    },
+                    "outputs": {
+                        "type": "array",
+                        "description": (
+                            "Optional: several encodes per file. Each takes format, quality and "
+                            'a filename suffix (e.g. "_thumb")'
+                        ),
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "format": {"type": "string", "enum": SUPPORTED_FORMATS},
+                                "quality": {"type": "integer", "minimum": 1, "maximum": 100},
+                                "effort": EFFORT_SCHEMA,
+                                "suffix": {"type": "string"},
+                            },
+                        },
+                    },
+                    "overwrite": {
+                        "type": "boolean",
+                        "default": False,
+                        "description": "Reprocess files whose outputs are already up to date",
+                    },
+                    "deadline_ms": DEADLINE_MS_SCHEMA,
+                },
+                "required": ["pattern", "operations", "output_dir"],
+            },
+        ),
         Tool(
             name="get_image_info",
             description="""Get detailed information and metadata about an image file.
             
-            Returns dimensions, format, mode, and file size.""",
+            Returns dimensions, format, mode, file size, EXIF orientation, ICC profile presence,
+            frame count and DPI. Only the file headers are read.""",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -565,87 +1813,237 @@ async def list_tools() -> list[Tool]:
                 "required": ["image_path"],
             },
         ),
+        Tool(
+            name="get_images_info",
+            description=f"""Get metadata for many image files in one call.
+
+            Pass a list of paths, a glob pattern (e.g. "generated_images/**/*.png"), or both.
+            Returns the same fields as get_image_info for each image, plus per-file errors.
+            Up to {MAX_METADATA_BATCH} files per call.""",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "image_paths": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Paths to image files",
+                    },
+                    "pattern": {
+                        "type": "string",
+                        "description": "Glob pattern matching image files (** is recursive)",
+                    },
+                },
+            },
+        ),
     ]
 
 
+def request_progress_reporter() -> Optional[progress.ProgressReporter]:
+    """Build a progress reporter if the current request carries a progress token."""
+    try:
+        context = app.request_context
+    except LookupError:
+        return None
+    token = context.meta.progressToken if context.meta is not None else None
+    if token is None:
+        return None
+
+    async def send(value: float, total: Optional[float], message: Optional[str]) -> None:
+        await context.session.send_progress_notification(
+            token, value, total, message, related_request_id=str(context.request_id)
+        )
+
+    return progress.ProgressReporter(send)
+
+
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool execution requests."""
+    """Handle tool execution requests, with progress and tracing when enabled."""
+    deadline_ms = arguments.get("deadline_ms") if isinstance(arguments, dict) else None
+    attributes: dict[str, Any] = {}
+    if isinstance(arguments, dict):
+        attributes = {key: arguments.get(key) for key in ("provider", "model", "size")}
+    root = tracing.start_trace(
+        tracer, f"tool.{name}", tool=name, deadline_ms=deadline_ms, **attributes
+    )
+    with root, progress.reporting(request_progress_reporter()):
+        # A submitted job applies its deadline_ms itself, from when it starts running
+        if not deadline_ms or name in JOB_TOOLS:
+            return await run_tool(name, arguments)
+        try:
+            # Cancels the tool (HTTP request, download, worker wait) once time runs out
+            return await deadline.run_within(deadline_ms, run_tool(name, arguments))
+        except (deadline.DeadlineExceededError, ValueError) as e:
+            metrics.inc("errors_total", tool=name, error=type(e).__name__)
+            root.fail(e)
+            return [TextContent(type="text", text=f"Error: {error_message(e)}")]
+
+
+async def run_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Run one tool call and render its result (or error) as text, recording metrics."""
+    started = time.perf_counter()
+    status = "cancelled"
     try:
-        if name == "generate_image":
-            prompt = arguments["prompt"]
-            provider = arguments.get("provider", "pollinations")  # Default to free provider
-            size = arguments.get("size", "1024x1024")
-            output_filename = arguments.get("output_filename")
-
-            save_path = None
-            if output_filename:
-                save_path = DEFAULT_OUTPUT_DIR / output_filename
-
-            if provider == "openai":
-                result = await generate_image_openai(prompt, size, save_path)
-            elif provider == "pollinations":
-                model = arguments.get("model", "flux")
-                seed = arguments.get("seed")
-                result = await generate_image_pollinations(prompt, size, save_path, seed, model)
-            elif provider == "huggingface":
-                model = arguments.get("model", "black-forest-labs/FLUX.1-dev")
-                result = await generate_image_huggingface(prompt, size, save_path, model)
-            else:
-                raise ValueError(f"Unsupported provider: {provider}")
-
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(result, indent=2),
-                )
-            ]
-
-        elif name == "resize_image":
-            result = await resize_image_file(
-                image_path=arguments["image_path"],
-                width=arguments.get("width"),
-                height=arguments.get("height"),
-                maintain_aspect=arguments.get("maintain_aspect", True),
-                output_path=arguments.get("output_path"),
-            )
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
-
-        elif name == "convert_image_format":
-            result = await convert_image_format(
-                image_path=arguments["image_path"],
-                target_format=arguments["target_format"],
-                output_path=arguments.get("output_path"),
-                quality=arguments.get("quality", 95),
+        content = await render_tool(name, arguments)
+        status = "ok"
+        return content
+    except Exception as e:
+        status = "error"
+        metrics.inc("errors_total", tool=name, error=type(e).__name__)
+        tracing.record_error(e)
+        return [
+            TextContent(
+                type="text",
+                text=f"Error: {error_message(e)}",
             )
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
-
-        elif name == "get_image_info":
-            result = await get_image_metadata(arguments["image_path"])
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
+        ]
+    finally:
+        metrics.observe("tool_duration_seconds", time.perf_counter() - started, tool=name)
+        metrics.inc("tool_calls_total", tool=name, status=status)
 
-        else:
-            raise ValueError(f"Unknown tool: {name}")
 
-    except Exception as e:
+async def render_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Dispatch a tool call to its implementation and render the result as JSON text."""
+    if name == "generate_image":
+        result = await dispatch_generation(arguments)
         return [
             TextContent(
                 type="text",
-                text=f"Error: {str(e)}",
+                text=json.dumps(result, indent=2),
             )
         ]
 
+    elif name == "generate_images":
+        defaults = {
+            key: arguments[key] for key in ("provider", "size", "model") if key in arguments
+        }
+        result = await generate_images_batch(arguments["items"], defaults)
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "submit_generation":
+        result = submit_generation(arguments)
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "get_job_status":
+        if arguments.get("job_id"):
+            result = job_queue.get(arguments["job_id"]).as_dict()
+        else:
+            result = job_queue.stats()
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "await_job":
+        result = await await_job(arguments["job_id"], arguments.get("timeout_seconds", 30.0))
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "cancel_job":
+        result = await cancel_job(arguments["job_id"])
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "get_provider_status":
+        result = get_provider_status()
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "get_server_stats":
+        result = get_server_stats(arguments.get("format", "json"))
+        if isinstance(result, str):
+            return [TextContent(type="text", text=result)]
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "resize_image" and arguments.get("variants"):
+        result = await resize_image_variants(
+            image_path=arguments["image_path"],
+            variants=arguments["variants"],
+            output_dir=arguments.get("output_dir"),
+        )
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "resize_image":
+        result = await resize_image_file(
+            image_path=arguments["image_path"],
+            width=arguments.get("width"),
+            height=arguments.get("height"),
+            maintain_aspect=arguments.get("maintain_aspect", True),
+            output_path=arguments.get("output_path"),
+        )
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "convert_image_format":
+        result = await convert_image_format(
+            image_path=arguments["image_path"],
+            target_format=arguments["target_format"],
+            output_path=arguments.get("output_path"),
+            quality=arguments.get("quality", 95),
+            effort=arguments.get("effort"),
+            max_bytes=arguments.get("max_bytes"),
+            candidate_formats=arguments.get("candidate_formats"),
+        )
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "process_image":
+        result = await process_image_file(
+            image_path=arguments["image_path"],
+            operations=arguments["operations"],
+            outputs=arguments.get("outputs"),
+            output_dir=arguments.get("output_dir"),
+        )
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "batch_process_directory":
+        result = await batch_process_directory(
+            pattern=arguments["pattern"],
+            operations=arguments["operations"],
+            output_dir=arguments["output_dir"],
+            outputs=arguments.get("outputs"),
+            overwrite=arguments.get("overwrite", False),
+        )
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "get_image_info":
+        result = await get_image_metadata(arguments["image_path"])
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    elif name == "get_images_info":
+        result = await get_images_metadata(
+            image_paths=arguments.get("image_paths"),
+            pattern=arguments.get("pattern"),
+        )
+        return [TextContent(type="text", text=json.dumps(result, indent=2))]
+
+    else:
+        raise ValueError(f"Unknown tool: {name}")
+
 
 async def main() -> None:
     """Run the MCP server."""
     from mcp.server.stdio import stdio_server
 
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options(),
+    exporter = None
+    if METRICS_FILE:
+        exporter = asyncio.create_task(
+            export_periodically(metrics, Path(METRICS_FILE), METRICS_INTERVAL)
         )
+    try:
+        # Pick up jobs that were still queued or running when the server last stopped
+        job_queue.restore()
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options(),
+            )
+    finally:
+        await job_queue.drain(SHUTDOWN_GRACE_SECONDS)
+        if exporter is not None:
+            exporter.cancel()
+            # Final dump so the textfile includes everything up to shutdown
+            metrics.write_prometheus(Path(METRICS_FILE))
+        await http_clients.aclose()
+        image_workers.shutdown()
+        batch_workers.shutdown()
+        if tracer is not None:
+            tracer.close()
+        if generation_cache is not None:
+            generation_cache.flush()
 
 
 if __name__ == "__main__":
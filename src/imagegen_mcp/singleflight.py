@@ -0,0 +1,108 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+The first caller for a key starts the work as an independent task; identical callers
+that arrive while it runs await the same task instead of repeating the work. A
+cancelled waiter only stops waiting: the shared task keeps running while anyone else
+still needs it, and is cancelled once the last waiter is gone.
+
+The shared task does not inherit the starting caller's deadline or progress reporter:
+each waiter's own deadline only limits how long that waiter waits, and progress goes to
+every waiter. The work is traced under the caller that started it.
+"""
+
+import asyncio
+import contextvars
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from imagegen_mcp import deadline, progress
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight(Generic[T]):
+    task: "asyncio.Future[T]"
+    stage: deadline.Deadline = field(default_factory=lambda: deadline.Deadline(None))
+    fan_out: progress.ProgressFanOut = field(default_factory=progress.ProgressFanOut)
+    waiters: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """Table of in-flight calls keyed by request identity."""
+
+    def __init__(self) -> None:
+        self.started = 0
+        self.coalesced = 0
+        self._flights: dict[str, _Flight[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def waiters(self, key: str) -> int:
+        """Number of callers currently waiting on ``key``."""
+        flight = self._flights.get(key)
+        return flight.waiters if flight is not None else 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """
+        Run ``func`` once for all concurrent callers with the same ``key``.
+
+        Args:
+            key: Request identity
+            func: Zero-argument coroutine function doing the work
+
+        Returns:
+            Tuple of (result, shared) where ``shared`` is True for callers that joined
+            a flight started by someone else
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = self._start(func)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        reporter = progress.current()
+        if reporter is not None:
+            flight.fan_out.reporters.append(reporter)
+        flight.waiters += 1
+        try:
+            remaining = deadline.cap(None)
+            return await asyncio.wait_for(asyncio.shield(flight.task), remaining), shared
+        finally:
+            flight.waiters -= 1
+            if reporter is not None:
+                flight.fan_out.reporters.remove(reporter)
+            # If our deadline ran out, name the shared work's stage in the error
+            deadline.set_stage(flight.stage.stage)
+            if flight.waiters == 0 and not flight.task.done():
+                # Last interested caller went away; stop the upstream work
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    @staticmethod
+    def _start(func: Callable[[], Awaitable[T]]) -> _Flight[T]:
+        async def run() -> T:
+            # Unbounded: only the waiters' own deadlines apply to the shared work
+            with deadline.scope(None) as flight.stage, progress.reporting(flight.fan_out):
+                return await func()
+
+        flight: _Flight[T] = _Flight(contextvars.copy_context().run(asyncio.ensure_future, run()))
+        return flight
+
+    def stats(self) -> dict[str, int]:
+        """Return how many flights were started and how many callers joined one."""
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+    def _forget(self, key: str, flight: _Flight[T]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
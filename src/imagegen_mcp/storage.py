@@ -0,0 +1,277 @@
+"""
+Output file management for generated images.
+
+Downloads are streamed to a temporary file in the target directory and atomically
+renamed into place, so a crash never leaves a truncated image at the final path.
+"""
+
+import hashlib
+import os
+import secrets
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, BinaryIO, Optional
+
+import httpx
+
+from imagegen_mcp import deadline, progress, tracing
+from imagegen_mcp.jsonstream import Base64FieldExtractor
+
+# Attempts before giving up on finding a free name (collisions are astronomically rare)
+MAX_ALLOCATION_ATTEMPTS = 16
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def allocate_output_path(directory: Path, prefix: str = "generated", suffix: str = ".png") -> Path:
+    """
+    Reserve a unique output file in ``directory``.
+
+    Names combine a timestamp (so they sort chronologically) with a random token, and
+    the file is created exclusively, so concurrent callers can never receive the same
+    path. The work per call is constant regardless of how many files already exist.
+
+    Args:
+        directory: Directory to create the file in
+        prefix: Filename prefix
+        suffix: Filename suffix including the dot
+
+    Returns:
+        Path of the newly created, empty file
+
+    Raises:
+        FileExistsError: If no free name could be reserved
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    for _ in range(MAX_ALLOCATION_ATTEMPTS):
+        path = directory / f"{prefix}_{stamp}_{secrets.token_hex(4)}{suffix}"
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return path
+    raise FileExistsError(f"Could not allocate a unique output file in {directory}")
+
+
+class DownloadTooLargeError(ValueError):
+    """Raised when a download exceeds the configured size limit."""
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    """A file written by the streaming writers."""
+
+    path: Path
+    size_bytes: int
+    sha256: Optional[str]
+    # Time spent receiving the body and writing it to disk (streaming writers only)
+    download_seconds: float = 0.0
+    write_seconds: float = 0.0
+
+
+class AtomicFileWriter:
+    """
+    Write a file through a temporary sibling and rename it into place on commit.
+
+    The temporary file lives in the destination directory so the final ``os.replace``
+    is atomic: readers see either no file or the complete file, never a truncated one.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        destination: Optional[Path] = None,
+        max_bytes: Optional[int] = None,
+        compute_hash: bool = True,
+    ) -> None:
+        """
+        Args:
+            directory: Directory for allocated names when ``destination`` is None
+            destination: Final path (a unique name is allocated on commit if omitted)
+            max_bytes: Optional size limit; exceeding it raises DownloadTooLargeError
+            compute_hash: Whether to compute a SHA-256 of the content while writing
+        """
+        self.destination = Path(destination) if destination is not None else None
+        self.directory = self.destination.parent if self.destination else Path(directory)
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.write_seconds = 0.0
+        self._hash = hashlib.sha256() if compute_hash else None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".part")
+        self.tmp_path = Path(tmp_name)
+        self._file: BinaryIO = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk, enforcing the size limit."""
+        self.size_bytes += len(chunk)
+        if self.max_bytes is not None and self.size_bytes > self.max_bytes:
+            raise DownloadTooLargeError(
+                f"Image exceeds the maximum download size of {self.max_bytes} bytes"
+            )
+        started = time.perf_counter()
+        self._file.write(chunk)
+        self.write_seconds += time.perf_counter() - started
+        if self._hash is not None:
+            self._hash.update(chunk)
+
+    def commit(self) -> StoredFile:
+        """Close the temporary file and atomically move it to its final path."""
+        started = time.perf_counter()
+        with tracing.span("file.commit", bytes=self.size_bytes):
+            self._file.close()
+            # mkstemp creates 0600 files; match the permissions of a plain open()
+            os.chmod(self.tmp_path, 0o644)
+            destination = self.destination or allocate_output_path(self.directory)
+            os.replace(self.tmp_path, destination)
+        self.write_seconds += time.perf_counter() - started
+        return StoredFile(
+            path=destination,
+            size_bytes=self.size_bytes,
+            sha256=self._hash.hexdigest() if self._hash is not None else None,
+            write_seconds=self.write_seconds,
+        )
+
+    def abort(self) -> None:
+        """Discard the partial file."""
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "AtomicFileWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is not None:
+            self.abort()
+
+
+def write_bytes_atomic(
+    data: bytes,
+    directory: Path,
+    destination: Optional[Path] = None,
+) -> StoredFile:
+    """
+    Write ``data`` to disk atomically.
+
+    Args:
+        data: File contents
+        directory: Directory for an allocated name when ``destination`` is None
+        destination: Optional final path
+
+    Returns:
+        StoredFile describing the written file
+    """
+    with AtomicFileWriter(directory, destination) as writer:
+        writer.write(data)
+        return writer.commit()
+
+
+async def stream_to_file(
+    response: httpx.Response,
+    directory: Path,
+    destination: Optional[Path] = None,
+    max_bytes: Optional[int] = None,
+    compute_hash: bool = True,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+) -> StoredFile:
+    """
+    Stream a response body to disk in fixed-size chunks.
+
+    Peak memory stays around one chunk no matter how large the image is. The body is
+    written to a temporary file and renamed into place only once it is complete.
+
+    Args:
+        response: Streaming httpx response (from ``client.stream``)
+        directory: Directory for an allocated name when ``destination`` is None
+        destination: Optional final path
+        max_bytes: Optional size limit, also checked against Content-Length up front
+        compute_hash: Whether to compute a SHA-256 while streaming
+        chunk_size: Bytes per read
+
+    Returns:
+        StoredFile describing the written file
+
+    Raises:
+        DownloadTooLargeError: If the body exceeds ``max_bytes``
+    """
+    content_length = response.headers.get("content-length")
+    if max_bytes is not None and content_length and content_length.isdigit():
+        if int(content_length) > max_bytes:
+            raise DownloadTooLargeError(
+                f"Image is {content_length} bytes, over the maximum download size "
+                f"of {max_bytes} bytes"
+            )
+
+    expected = _expected_length(response)
+    deadline.set_stage("downloading the image")
+    await progress.report_stage(progress.FIRST_BYTE, "Response received, downloading")
+    received = 0
+    started = time.perf_counter()
+    download_span = tracing.span("file.download", content_length=expected)
+    with download_span, AtomicFileWriter(directory, destination, max_bytes, compute_hash) as writer:
+        async for chunk in response.aiter_bytes(chunk_size):
+            writer.write(chunk)
+            received += len(chunk)
+            await progress.report_download(received, expected)
+        stored = writer.commit()
+        download_span.set(bytes=received, write_ms=round(writer.write_seconds * 1000, 3))
+    stored = replace(stored, download_seconds=time.perf_counter() - started)
+    await progress.report_stage(progress.WRITTEN, f"Written {stored.size_bytes} bytes")
+    return stored
+
+
+async def stream_json_base64_to_file(
+    response: httpx.Response,
+    field: str,
+    directory: Path,
+    destination: Optional[Path] = None,
+    max_bytes: Optional[int] = None,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+) -> tuple[Any, Optional[StoredFile]]:
+    """
+    Decode a base64 field of a streamed JSON response straight to disk.
+
+    Args:
+        response: Streaming httpx response with a JSON body
+        field: Key of the base64 string to decode (e.g. "b64_json")
+        directory: Directory for an allocated name when ``destination`` is None
+        destination: Optional final path
+        max_bytes: Optional limit on decoded bytes
+        chunk_size: Bytes per read
+
+    Returns:
+        Tuple of the parsed JSON document (with the field's value blanked out) and
+        the written file, or None if the field was not present
+    """
+    expected = _expected_length(response)
+    deadline.set_stage("downloading the image")
+    await progress.report_stage(progress.FIRST_BYTE, "Response received, downloading")
+    started = time.perf_counter()
+    download_span = tracing.span("file.download", content_length=expected, field=field)
+    with download_span, AtomicFileWriter(directory, destination, max_bytes) as writer:
+        extractor = Base64FieldExtractor(field, writer.write)
+        received = 0
+        async for chunk in response.aiter_bytes(chunk_size):
+            extractor.feed(chunk)
+            received += len(chunk)
+            await progress.report_download(received, expected)
+        document = extractor.finish()
+        if not extractor.found:
+            writer.abort()
+            return document, None
+        stored = writer.commit()
+        download_span.set(bytes=received, decoded_bytes=stored.size_bytes)
+    stored = replace(stored, download_seconds=time.perf_counter() - started)
+    await progress.report_stage(progress.WRITTEN, f"Written {stored.size_bytes} bytes")
+    return document, stored
+
+
+def _expected_length(response: httpx.Response) -> Optional[int]:
+    """Content-Length of the response in bytes, or None if unknown."""
+    content_length = response.headers.get("content-length")
+    if not content_length or not content_length.isdigit():
+        return None
+    return int(content_length)
@@ -0,0 +1,426 @@
+"""
+Lightweight request tracing.
+
+Each tool call can open a root span; code underneath it (retry attempts, HTTP phases,
+Pillow operations, file I/O) opens child spans with ``span()``. The active span lives in
+a context variable, so children attach to the right request across awaits, tasks and
+thread-pool workers. Without an active trace ``span()`` returns a shared no-op object,
+which makes instrumentation cost a single context lookup when tracing is off.
+
+Finished traces are written to a size-rotated local file, either as Chrome trace events
+(open in chrome://tracing or Perfetto) or as OTLP-JSON lines (one
+``ExportTraceServiceRequest`` per trace, as read by the OpenTelemetry Collector's file
+receiver).
+"""
+
+import contextvars
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, Optional, Union
+
+from imagegen_mcp.config import env_float, env_int, env_str
+
+FORMATS = ("chrome", "otlp")
+SERVICE_NAME = "imagegen-mcp"
+
+
+class _Trace:
+    """Spans of one request, collected until the root span ends."""
+
+    def __init__(self, tracer: "Tracer", sampled: bool) -> None:
+        self.tracer = tracer
+        self.sampled = sampled
+        self.trace_id = secrets.token_hex(16)
+        self.wall_origin_ns = time.time_ns()
+        self.perf_origin_ns = time.perf_counter_ns()
+        self.spans: list[Span] = []
+
+    def now_ns(self) -> int:
+        # Wall-clock timestamps derived from the monotonic clock, so durations stay exact
+        return self.wall_origin_ns + time.perf_counter_ns() - self.perf_origin_ns
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    def __init__(
+        self,
+        name: str,
+        trace: _Trace,
+        parent_id: Optional[str],
+        attributes: dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._token: Optional[contextvars.Token] = None
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes (None values are skipped)."""
+        self.attributes.update((k, v) for k, v in attributes.items() if v is not None)
+
+    def start(self) -> "Span":
+        """Start timing without making the span current (for leaf spans)."""
+        self.start_ns = self.trace.now_ns()
+        return self
+
+    def fail(self, error: BaseException) -> None:
+        """Mark the span as failed (for errors that are handled rather than raised)."""
+        self.error = type(error).__name__
+        self.attributes.setdefault("error.message", str(error)[:200])
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Stop timing and hand the span to its trace."""
+        self.end_ns = self.trace.now_ns()
+        if error is not None:
+            self.fail(error)
+        self.trace.spans.append(self)
+        if self.parent_id is None:
+            self.trace.tracer.finish(self.trace, self)
+
+    def __enter__(self) -> "Span":
+        self.start()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        self.end(exc)
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is being traced."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def fail(self, error: BaseException) -> None:
+        pass
+
+    def start(self) -> "_NoopSpan":
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "imagegen_span", default=None
+)
+
+
+def current() -> Optional[Span]:
+    """Return the active span, if a sampled trace is running."""
+    return _current.get()
+
+
+def span(name: str, **attributes: Any) -> Union[Span, _NoopSpan]:
+    """
+    Open a child of the active span (use as a context manager).
+
+    Returns the shared no-op span when no trace is active.
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace, parent.span_id, attributes)
+
+
+def record_error(error: BaseException) -> None:
+    """Mark the active span as failed, if a trace is running."""
+    active = _current.get()
+    if active is not None:
+        active.fail(error)
+
+
+def start_span(name: str, **attributes: Any) -> Union[Span, _NoopSpan]:
+    """Start a leaf child span that is ended explicitly with ``end()``."""
+    return span(name, **attributes).start()
+
+
+def httpcore_trace() -> Optional[Callable[[str, dict[str, Any]], Any]]:
+    """
+    Build an httpcore ``trace`` extension that records connection and HTTP phases.
+
+    httpcore reports events such as ``connection.connect_tcp.started`` and
+    ``http11.receive_response_headers.complete``; each started/complete pair becomes an
+    ``http.<phase>`` span under the active span.
+
+    Returns:
+        The callback, or None when no trace is active
+    """
+    if _current.get() is None:
+        return None
+    open_spans: dict[str, Union[Span, _NoopSpan]] = {}
+
+    async def trace(event_name: str, info: dict[str, Any]) -> None:
+        prefix, _, state = event_name.rpartition(".")
+        if state == "started":
+            open_spans[prefix] = start_span(f"http.{prefix.partition('.')[2]}")
+        elif state in ("complete", "failed"):
+            phase = open_spans.pop(prefix, None)
+            if phase is not None:
+                phase.end(info.get("exception") if state == "failed" else None)
+
+    return trace
+
+
+class RotatingTraceFile:
+    """Append-only trace file rotated to ``.1``..``.N`` once it reaches ``max_bytes``."""
+
+    def __init__(
+        self,
+        path: Path,
+        trace_format: str = "chrome",
+        max_bytes: int = 10 << 20,
+        backups: int = 3,
+    ) -> None:
+        """
+        Args:
+            path: Trace file
+            trace_format: "chrome" (trace-event JSON array) or "otlp" (OTLP-JSON lines)
+            max_bytes: Size at which the file is rotated
+            backups: Rotated files kept
+        """
+        if trace_format not in FORMATS:
+            raise ValueError(f"Unsupported trace format: {trace_format}. Choose from: {FORMATS}")
+        self.path = Path(path)
+        self.trace_format = trace_format
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        self._lock = threading.Lock()
+        self._file: Optional[IO[str]] = None
+
+    def export(self, trace: _Trace) -> None:
+        """Append one finished trace."""
+        if self.trace_format == "chrome":
+            events = chrome_events(trace)
+            data = "".join(json.dumps(event, default=str) + ",\n" for event in events)
+        else:
+            data = json.dumps(otlp_request(trace), separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            if self._file is not None and self._file.tell() + len(data) > self.max_bytes:
+                self._rotate()
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+                if self.trace_format == "chrome" and self._file.tell() == 0:
+                    # Trace viewers accept an unterminated JSON array, so no closing "]"
+                    self._file.write("[\n")
+            self._file.write(data)
+            self._file.flush()
+
+    def _rotate(self) -> None:
+        self.close()
+        for index in range(self.backups, 0, -1):
+            previous = f"{self.path.name}.{index - 1}"
+            source = self.path if index == 1 else self.path.with_name(previous)
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index}"))
+        if self.backups == 0:
+            self.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Close the file (reopened on the next export)."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Tracer:
+    """Starts traces, samples them and exports the kept ones."""
+
+    def __init__(
+        self,
+        exporter: RotatingTraceFile,
+        sample_rate: float = 1.0,
+        slow_seconds: Optional[float] = None,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        """
+        Args:
+            exporter: Where finished traces are written
+            sample_rate: Fraction of traces kept (decided when the trace starts)
+            slow_seconds: Traces at least this slow, or ending in an error, are kept even
+                when not sampled (requires recording every trace)
+            rng: Random source returning floats in [0, 1) (injectable for tests)
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self._rng = rng
+        self.exported = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["Tracer"]:
+        """
+        Build a tracer from ``IMAGEGEN_TRACE_*`` environment variables.
+
+        Tracing is off (None) unless ``IMAGEGEN_TRACE_FILE`` is set.
+        """
+        path = env_str("TRACE_FILE", "")
+        if not path:
+            return None
+        slow_ms = env_float("TRACE_SLOW_MS", 0.0)
+        exporter = RotatingTraceFile(
+            Path(path),
+            trace_format=env_str("TRACE_FORMAT", "chrome").lower(),
+            max_bytes=env_int("TRACE_MAX_BYTES", 10 << 20),
+            backups=env_int("TRACE_BACKUPS", 3),
+        )
+        return cls(
+            exporter,
+            sample_rate=env_float("TRACE_SAMPLE_RATE", 1.0),
+            slow_seconds=slow_ms / 1000 if slow_ms > 0 else None,
+        )
+
+    def trace(self, name: str, **attributes: Any) -> Union[Span, _NoopSpan]:
+        """
+        Open a root span for a request (use as a context manager).
+
+        Returns the no-op span when the trace is neither sampled nor eligible for
+        slow/error retention, so unsampled requests record nothing.
+        """
+        sampled = self._rng() < self.sample_rate
+        if not sampled and self.slow_seconds is None:
+            self.dropped += 1
+            return NOOP_SPAN
+        return Span(name, _Trace(self, sampled), None, attributes)
+
+    def finish(self, trace: _Trace, root: Span) -> None:
+        """Export a finished trace if it was sampled, slow or failed."""
+        keep = trace.sampled or root.error is not None or (
+            self.slow_seconds is not None
+            and root.end_ns - root.start_ns >= self.slow_seconds * 1e9
+        )
+        if not keep:
+            self.dropped += 1
+            return
+        try:
+            self.exporter.export(trace)
+            self.exported += 1
+        except OSError:
+            # Tracing must never fail the request it describes
+            self.dropped += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Return exported/dropped trace counts and the settings in use."""
+        return {
+            "file": str(self.exporter.path),
+            "format": self.exporter.trace_format,
+            "sample_rate": self.sample_rate,
+            "exported": self.exported,
+            "dropped": self.dropped,
+        }
+
+    def close(self) -> None:
+        """Close the trace file."""
+        self.exporter.close()
+
+
+def start_trace(tracer: Optional[Tracer], name: str, **attributes: Any) -> Union[Span, _NoopSpan]:
+    """Open a root span on ``tracer``, or the no-op span when tracing is disabled."""
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.trace(name, **attributes)
+
+
+def chrome_events(trace: _Trace) -> list[dict[str, Any]]:
+    """Render a trace as Chrome trace-event "complete" (``ph: X``) events."""
+    pid = os.getpid()
+    # One row per trace in the viewer, labelled with the root span's name
+    tid = int(trace.trace_id[:8], 16)
+    root = next((s for s in trace.spans if s.parent_id is None), None)
+    events: list[dict[str, Any]] = [
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": tid,
+            "args": {"name": f"{root.name if root else 'trace'} {trace.trace_id[:8]}"},
+        }
+    ]
+    for s in sorted(trace.spans, key=lambda s: s.start_ns):
+        events.append(
+            {
+                "name": s.name,
+                "cat": s.name.partition(".")[0],
+                "ph": "X",
+                "ts": s.start_ns / 1000,
+                "dur": (s.end_ns - s.start_ns) / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": {
+                    **s.attributes,
+                    "trace_id": trace.trace_id,
+                    "span_id": s.span_id,
+                    "parent_id": s.parent_id,
+                    **({"error": s.error} if s.error else {}),
+                },
+            }
+        )
+    return events
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP-JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_request(trace: _Trace) -> dict[str, Any]:
+    """Render a trace as an OTLP-JSON ``ExportTraceServiceRequest``."""
+    spans = []
+    for s in trace.spans:
+        otlp_span: dict[str, Any] = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": _otlp_attributes(s.attributes),
+            # STATUS_CODE_OK / STATUS_CODE_ERROR
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": "imagegen_mcp"}, "spans": spans}],
+            }
+        ]
+    }
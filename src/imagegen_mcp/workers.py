@@ -0,0 +1,178 @@
+"""
+Worker pool for CPU-bound image work.
+
+Pillow decode/resize/encode calls block, so they run in a thread or process pool
+instead of on the event loop. Submissions are bounded: at most
+``max_workers + max_queue`` jobs are handed to the executor at once and further
+callers wait for a slot, which keeps executor memory bounded under load.
+
+Cancelling a caller cancels its job if it has not started yet. A job that is already
+running cannot be interrupted; it keeps its slot (and any resources released through
+``on_done``) until it ends, and its output is then removed by the caller-supplied cleanup.
+"""
+
+import asyncio
+import contextvars
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+from imagegen_mcp.config import env_int, env_str
+
+T = TypeVar("T")
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class ImageWorkerPool:
+    """
+    Bounded executor for blocking image functions.
+
+    With ``kind="process"`` the submitted function and its arguments are pickled,
+    so callers should pass paths and plain values and let the worker do the decode.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4, max_queue: int = 32) -> None:
+        """
+        Args:
+            kind: "thread" or "process"
+            max_workers: Number of worker threads/processes
+            max_queue: Jobs allowed to wait inside the executor beyond the running ones
+        """
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unsupported executor kind: {kind}. Choose from: {EXECUTOR_KINDS}")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    @classmethod
+    def from_env(
+        cls,
+        prefix: str = "IMAGE",
+        kind: str = "thread",
+        max_workers: Optional[int] = None,
+    ) -> "ImageWorkerPool":
+        """
+        Build a pool from ``IMAGEGEN_<PREFIX>_*`` environment variables.
+
+        Args:
+            prefix: Variable prefix, e.g. "IMAGE" for ``IMAGEGEN_IMAGE_WORKERS``
+            kind: Executor kind when ``IMAGEGEN_<PREFIX>_EXECUTOR`` is unset
+            max_workers: Worker count when unset (default: min(4, CPUs))
+        """
+        cpu_count = multiprocessing.cpu_count()
+        return cls(
+            kind=env_str(f"{prefix}_EXECUTOR", kind).lower(),
+            max_workers=env_int(f"{prefix}_WORKERS", max_workers or min(4, cpu_count)),
+            max_queue=env_int(f"{prefix}_QUEUE_SIZE", 32),
+        )
+
+    @property
+    def pending(self) -> int:
+        """Jobs currently submitted to the executor (running or queued)."""
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # Spawned workers avoid forking a process that has live threads and sockets
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="imagegen-image"
+                )
+        return self._executor
+
+    async def run(
+        self,
+        func: Callable[..., T],
+        *args: Any,
+        cleanup: Optional[Callable[[T], None]] = None,
+        on_done: Optional[Callable[[], None]] = None,
+        **kwargs: Any,
+    ) -> T:
+        """
+        Run ``func(*args, **kwargs)`` in the pool and await its result.
+
+        Args:
+            func: Blocking, module-level function
+            *args: Positional arguments for ``func``
+            cleanup: Called with the result if the caller was cancelled while ``func``
+                was running (e.g. to delete the files it wrote)
+            on_done: Called once on the event loop when the job has ended or will never
+                run, which for a cancelled running job is after the caller has returned
+            **kwargs: Keyword arguments for ``func``
+
+        Returns:
+            The function's return value
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+        slots = self._slots
+        try:
+            await slots.acquire()
+        except BaseException:
+            if on_done is not None:
+                on_done()
+            raise
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+
+        def finish() -> None:
+            self._pending -= 1
+            slots.release()
+            if on_done is not None:
+                on_done()
+
+        detached = False
+        try:
+            call = partial(func, *args, **kwargs)
+            if self.kind == "thread":
+                # Like asyncio.to_thread: the worker sees the caller's context (e.g. its trace)
+                call = partial(contextvars.copy_context().run, call)
+            future = self._get_executor().submit(call)
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                # cancel() fails once the job is running; let it finish in the background
+                if not future.cancel():
+                    detached = True
+                    future.add_done_callback(
+                        lambda done: self._after_cancelled(loop, finish, done, cleanup)
+                    )
+                raise
+        finally:
+            if not detached:
+                finish()
+
+    @staticmethod
+    def _after_cancelled(
+        loop: asyncio.AbstractEventLoop,
+        finish: Callable[[], None],
+        future: Future,
+        cleanup: Optional[Callable[[Any], None]],
+    ) -> None:
+        # Runs in the worker thread (or the executor's management thread)
+        if cleanup is not None and not future.cancelled() and future.exception() is None:
+            try:
+                cleanup(future.result())
+            except OSError:
+                pass
+        try:
+            loop.call_soon_threadsafe(finish)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the executor; a later ``run`` starts a fresh one."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        self._slots = None
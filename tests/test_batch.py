@@ -0,0 +1,77 @@
+"""Tests for directory batch planning."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from imagegen_mcp import batch
+
+
+def test_pattern_root():
+    """Test the fixed prefix of a glob pattern is found."""
+    assert batch.pattern_root("generated_images/**/*.png") == Path("generated_images")
+    assert batch.pattern_root("/data/a/b*/c.png") == Path("/data/a")
+    assert batch.pattern_root("*.png") == Path(".")
+    assert batch.pattern_root("images/photo.png") == Path("images")
+
+
+def test_plan_outputs_mirrors_layout_and_picks_formats(tmp_path):
+    """Test outputs mirror subdirectories and take formats from spec, convert or source."""
+    source = tmp_path / "in" / "cats" / "tabby.png"
+    out = tmp_path / "out"
+    convert = [{"op": "resize", "width": 10}, {"op": "convert", "format": "WEBP", "quality": 70}]
+
+    (default,) = batch.plan_outputs(source, tmp_path / "in", out, [])
+    assert default == {
+        "format": "PNG",
+        "quality": 95,
+        "effort": None,
+        "output_path": str(out / "cats" / "tabby.png"),
+    }
+    (converted,) = batch.plan_outputs(source, tmp_path / "in", out, convert)
+    assert converted["format"] == "WEBP" and converted["quality"] == 70
+    assert converted["output_path"].endswith("cats/tabby.webp")
+
+    several = batch.plan_outputs(
+        source, tmp_path / "in", out, convert, [{"format": "jpeg", "suffix": "_small"}, {}]
+    )
+    assert [Path(spec["output_path"]).name for spec in several] == [
+        "tabby_small.jpg",
+        "tabby.webp",
+    ]
+    with pytest.raises(ValueError):
+        batch.plan_outputs(source, tmp_path / "in", out, [], [{"format": "TIFF"}])
+
+
+def test_find_collisions_reports_same_stem_sources(tmp_path):
+    """Test sources differing only in extension are reported when they share an output."""
+    out = tmp_path / "out"
+    to_webp = [{"op": "convert", "format": "WEBP"}]
+    sources = [tmp_path / name for name in ("a.png", "a.jpg", "b.png")]
+    plans = {source: batch.plan_outputs(source, tmp_path, out, to_webp) for source in sources}
+
+    errors = batch.find_collisions(plans)
+    assert set(errors) == {sources[0], sources[1]}
+    assert errors[sources[0]] == f"Output {out / 'a.webp'} would also be written for {sources[1]}"
+
+    # Kept in their own format, the same stems no longer collide
+    assert batch.find_collisions(
+        {source: batch.plan_outputs(source, tmp_path, out, []) for source in sources}
+    ) == {}
+
+
+def test_is_up_to_date(tmp_path):
+    """Test outputs count as current only when all exist and none is older than the source."""
+    source = tmp_path / "a.png"
+    source.write_bytes(b"x")
+    planned = [{"output_path": str(tmp_path / "a.jpg")}, {"output_path": str(tmp_path / "a.webp")}]
+    assert not batch.is_up_to_date(source, planned)
+
+    for spec in planned:
+        Path(spec["output_path"]).write_bytes(b"y")
+    assert batch.is_up_to_date(source, planned)
+
+    stale = source.stat().st_mtime_ns - 10**9
+    os.utime(planned[1]["output_path"], ns=(stale, stale))
+    assert not batch.is_up_to_date(source, planned)
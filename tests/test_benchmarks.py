@@ -0,0 +1,111 @@
+"""Smoke tests for the offline benchmark suite."""
+
+import httpx
+import pytest
+
+from benchmarks.bench_generation import run_generation_benchmarks
+from benchmarks.bench_imaging import run_imaging_benchmarks
+from benchmarks.fake_providers import FakeProviderProfile, FakeProviders
+from benchmarks.load_test import parse_mix, run_load_test
+from benchmarks.run import compare
+
+
+def test_profile_parse():
+    """Test profile overrides keep field types and reject unknown settings."""
+    profile = FakeProviderProfile.parse("latency_ms=5, payload_bytes=1024,error_rate=0.5")
+    assert profile.latency_ms == 5.0 and profile.payload_bytes == 1024
+    assert profile.error_rate == 0.5 and profile.jitter_ms == 10.0
+    with pytest.raises(ValueError):
+        FakeProviderProfile.parse("latency=5")
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_serves_payload_and_errors():
+    """Test the fake transport returns sized payloads and injects errors."""
+    fake = FakeProviders(
+        {
+            "pollinations": FakeProviderProfile(latency_ms=0, jitter_ms=0, payload_bytes=1000),
+            "openai": FakeProviderProfile(latency_ms=0, jitter_ms=0, error_rate=1.0),
+        }
+    )
+    async with httpx.AsyncClient(transport=fake.transport()) as client:
+        image = await client.get("https://image.pollinations.ai/prompt/cat")
+        failed = await client.post("https://api.openai.com/v1/images/generations")
+    assert image.status_code == 200 and len(image.content) == 1000
+    assert image.content.startswith(b"\x89PNG")
+    assert failed.status_code == 503
+    assert fake.requests == {"pollinations": 1, "openai": 1} and fake.errors == {"openai": 1}
+
+
+@pytest.mark.asyncio
+async def test_generation_benchmark_runs_offline(tmp_path):
+    """Test a tiny generation run completes through call_tool and restores the server."""
+    from imagegen_mcp import server
+
+    http_clients = server.http_clients
+    profile = FakeProviderProfile(latency_ms=1, jitter_ms=0, payload_bytes=4096)
+    results = await run_generation_benchmarks(
+        ["pollinations", "openai"], [1, 3], 6, {"pollinations": profile, "openai": profile},
+        workdir=tmp_path,
+    )
+
+    assert [(r["provider"], r["concurrency"]) for r in results] == [
+        ("pollinations", 1),
+        ("pollinations", 3),
+        ("openai", 1),
+        ("openai", 3),
+    ]
+    assert all(r["errors"] == 0 and r["latency_ms"]["count"] == 6 for r in results)
+    assert all(r["generations_per_second"] > 0 and r["peak_rss_mb"] > 0 for r in results)
+    assert server.http_clients is http_clients
+
+
+@pytest.mark.asyncio
+async def test_imaging_benchmark_reports_stages(tmp_path):
+    """Test imaging cases report latency, stage medians and output sizes."""
+    results = await run_imaging_benchmarks(
+        [64], 2, workdir=tmp_path, cases=["resize_half", "convert_jpeg_q85"]
+    )
+
+    resize, convert = results
+    assert resize["case"] == "resize_half" and resize["size"] == 64
+    assert set(resize["stage_p50_ms"]) == {"decode_ms", "resize_ms", "encode_ms", "write_ms"}
+    assert "resize_ms" not in convert["stage_p50_ms"]
+    assert convert["output_bytes"] > 0 and convert["latency_ms"]["count"] == 2
+    assert not (tmp_path / "imaging").exists()
+
+
+def test_compare_flags_regressions():
+    """Test throughput drops and latency rises beyond the threshold are reported."""
+    level = {"provider": "openai", "concurrency": 4}
+    baseline = {
+        "generation": [{**level, "generations_per_second": 100, "latency_ms": {"p99": 50}}],
+        "imaging": [{"case": "resize_half", "size": 512, "latency_ms": {"p50": 10}}],
+    }
+    current = {
+        "generation": [{**level, "generations_per_second": 80, "latency_ms": {"p99": 52}}],
+        "imaging": [{"case": "resize_half", "size": 512, "latency_ms": {"p50": 13}}],
+    }
+
+    regressions = compare(baseline, current, threshold=10)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("generation openai x4: throughput")
+    assert regressions[1].startswith("imaging resize_half 512px: p50")
+    assert compare(baseline, current, threshold=50) == []
+
+
+@pytest.mark.asyncio
+async def test_load_test_drives_sessions_over_mcp(tmp_path):
+    """Test concurrent MCP sessions replay the tool mix and report loop lag."""
+    profile = FakeProviderProfile(latency_ms=1, jitter_ms=0, payload_bytes=4096)
+    mix = parse_mix("generate_image=1,resize_image=1,get_image_info=1")
+    results = await run_load_test(
+        [2], 0.3, mix, {"pollinations": profile}, source_size=32, workdir=tmp_path
+    )
+
+    (level,) = results
+    assert level["sessions"] == 2 and level["calls"] > 0 and level["errors"] == 0
+    assert set(level["tools"]) <= set(mix) and level["loop_lag_ms"]["count"] > 0
+    assert not (tmp_path / "load").exists()
+    with pytest.raises(ValueError):
+        parse_mix("delete_everything=1")
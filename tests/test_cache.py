@@ -0,0 +1,84 @@
+"""Tests for the content-addressed generation cache."""
+
+import json
+
+from imagegen_mcp.cache import GenerationCache, make_cache_key
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return path
+
+
+def test_cache_key_normalizes_request():
+    """Test equivalent requests map to the same key."""
+    key = make_cache_key("pollinations", "flux", "a  red\ncircle ", "1024x1024", 1)
+
+    assert key == make_cache_key("Pollinations", "flux", "a red circle", "1024X1024", 1)
+    assert key != make_cache_key("pollinations", "flux", "a red circle", "1024x1024", 2)
+
+
+def test_cache_hit_and_miss(tmp_path):
+    """Test stored results are returned with hit/miss counters."""
+    cache = GenerationCache(tmp_path / "cache", max_bytes=1024, max_entries=10)
+    image = _write(tmp_path / "a.png", b"image-a")
+
+    assert cache.get("k1") is None
+    stored = cache.put("k1", image, {"image_path": str(image), "provider": "pollinations"})
+    hit = cache.get("k1")
+
+    assert hit.path == stored
+    assert hit.path.read_bytes() == b"image-a"
+    assert hit.metadata == {"provider": "pollinations"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test entry and byte budgets evict the least recently used entry."""
+    cache = GenerationCache(tmp_path / "cache", max_bytes=10, max_entries=2)
+    cache.put("k1", _write(tmp_path / "1.png", b"1111"), {})
+    cache.put("k2", _write(tmp_path / "2.png", b"2222"), {})
+    cache.get("k1")
+    cache.put("k3", _write(tmp_path / "3.png", b"3333"), {})
+
+    assert cache.get("k2") is None
+    assert cache.get("k1") is not None
+
+    cache.put("k4", _write(tmp_path / "4.png", b"44444444"), {})
+    assert len(cache) == 1
+    assert cache.total_bytes == 8
+
+
+def test_cache_dedupes_content_and_persists(tmp_path):
+    """Test identical bytes are stored once and the index survives a reload."""
+    root = tmp_path / "cache"
+    cache = GenerationCache(root, max_bytes=1024, max_entries=10)
+    first = cache.put("k1", _write(tmp_path / "1.png", b"same"), {"seed": 1})
+    second = cache.put("k2", _write(tmp_path / "2.png", b"same"), {"seed": 2})
+
+    assert first == second
+    assert cache.total_bytes == 4
+
+    reloaded = GenerationCache(root, max_bytes=1024, max_entries=10)
+    assert reloaded.get("k2").metadata == {"seed": 2}
+    assert len(reloaded) == 2
+
+
+def test_cache_stores_a_copy_and_skips_malformed_records(tmp_path):
+    """Test the store never shares a file with the caller and bad index records are ignored."""
+    root = tmp_path / "cache"
+    cache = GenerationCache(root, max_bytes=1024, max_entries=10)
+    image = _write(tmp_path / "1.png", b"original")
+    stored = cache.put("k1", image, {})
+
+    assert not stored.samefile(image)
+    image.write_bytes(b"edited")
+    assert stored.read_bytes() == b"original"
+
+    index = json.loads((root / "index.json").read_text())
+    index += [{"key": "k2", "digest": "x"}, {"digest": "y"}, "junk"]
+    (root / "index.json").write_text(json.dumps(index))
+    reloaded = GenerationCache(root, max_bytes=1024, max_entries=10)
+    assert len(reloaded) == 1
+    assert reloaded.get("k1").path == stored
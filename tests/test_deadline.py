@@ -0,0 +1,72 @@
+"""Tests for per-call deadlines."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from imagegen_mcp import deadline
+
+
+def test_caps_apply_only_inside_a_scope():
+    """Test waits are limited to the remaining budget inside a deadline scope."""
+    assert deadline.cap(30.0) == 30.0
+    assert deadline.cap(None) is None
+
+    with deadline.scope(1.0):
+        assert deadline.cap(30.0) <= 1.0
+        assert deadline.cap(0.5) == 0.5
+        assert deadline.cap_absolute(time.monotonic() + 60) <= time.monotonic() + 1.0
+        timeout = deadline.cap_timeout(httpx.Timeout(60.0, connect=5.0))
+        assert timeout.read <= 1.0
+        assert timeout.connect <= 1.0
+    assert deadline.current() is None
+
+
+def test_nested_scope_never_extends_outer_deadline():
+    """Test an inner, longer budget keeps the outer expiry."""
+    with deadline.scope(0.5) as outer:
+        with deadline.scope(10.0) as inner:
+            assert inner.expires_at == outer.expires_at
+
+
+@pytest.mark.asyncio
+async def test_run_within_cancels_and_names_the_stage():
+    """Test running out of budget cancels the work and reports the current stage."""
+    cancelled = False
+
+    async def work():
+        nonlocal cancelled
+        deadline.set_stage("downloading the image")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    with pytest.raises(deadline.DeadlineExceededError, match="20 ms exceeded while downloading"):
+        await deadline.run_within(20, work())
+    assert cancelled
+
+
+@pytest.mark.asyncio
+async def test_run_within_passes_inner_timeouts_through():
+    """Test a timeout raised by the work itself is not reported as the deadline."""
+
+    async def work():
+        await asyncio.wait_for(asyncio.sleep(10), 0.01)
+
+    with pytest.raises(TimeoutError) as excinfo:
+        await deadline.run_within(5000, work())
+    assert not isinstance(excinfo.value, deadline.DeadlineExceededError)
+
+
+@pytest.mark.asyncio
+async def test_run_within_returns_result_in_time():
+    """Test work finishing inside its budget is unaffected."""
+
+    async def work():
+        return deadline.current().budget
+
+    assert await deadline.run_within(1000, work()) == 1.0
@@ -0,0 +1,55 @@
+"""Tests for the shared HTTP client pool."""
+
+import httpx
+import pytest
+
+from imagegen_mcp.http_client import HttpClientConfig, HttpClientPool
+
+
+def test_config_from_env(monkeypatch):
+    """Test pool limits and timeouts are read from the environment."""
+    monkeypatch.setenv("IMAGEGEN_HTTP_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("IMAGEGEN_HTTP_CONNECT_TIMEOUT", "2.5")
+    monkeypatch.setenv("IMAGEGEN_OPENAI_READ_TIMEOUT", "42")
+
+    config = HttpClientConfig.from_env("openai")
+
+    assert config.max_connections == 7
+    assert config.connect_timeout == 2.5
+    assert config.read_timeout == 42.0
+    assert HttpClientConfig.from_env("huggingface").read_timeout == 120.0
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_client_per_provider():
+    """Test each provider gets one long-lived client until the pool is closed."""
+    pool = HttpClientPool(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+
+    openai_client = pool.get("openai")
+    assert pool.get("openai") is openai_client
+    assert pool.get("pollinations") is not openai_client
+
+    await pool.aclose()
+    assert openai_client.is_closed
+    assert pool.get("openai") is not openai_client
+    await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pool_records_time_to_first_byte():
+    """Test clients report time to first byte and status codes to the metrics registry."""
+    from imagegen_mcp.metrics import MetricsRegistry
+
+    metrics = MetricsRegistry()
+    pool = HttpClientPool(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b"x")),
+        metrics=metrics,
+    )
+    client = pool.get("pollinations")
+    async with client.stream("GET", "https://example.test/image") as response:
+        await response.aread()
+
+    ttfb = metrics.histogram("stage_duration_seconds", stage="ttfb", component="pollinations")
+    assert ttfb is not None and ttfb.count == 1
+    assert metrics.counter_value("http_responses_total", provider="pollinations", status=200) == 1
+    await pool.aclose()
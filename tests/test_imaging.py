@@ -0,0 +1,307 @@
+"""Tests for synchronous Pillow operations."""
+
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from imagegen_mcp import imaging
+
+
+def test_target_size_rules():
+    """Test aspect-preserving and stretched size calculation."""
+    assert imaging.target_size((200, 100), 50, None) == (50, 25)
+    assert imaging.target_size((200, 100), None, 50) == (100, 50)
+    assert imaging.target_size((200, 100), 50, 80) == (50, 25)
+    assert imaging.target_size((200, 100), 50, None, maintain_aspect=False) == (50, 100)
+    with pytest.raises(ValueError):
+        imaging.target_size((200, 100), None, None)
+
+
+def test_resize_variants_decodes_once_with_draft_and_reduce(tmp_path):
+    """Test JPEG variants use draft decoding, reduce pre-shrink and per-variant formats."""
+    source = tmp_path / "photo.jpg"
+    Image.new("RGB", (1600, 1200), color="orange").save(source, quality=90)
+
+    result = imaging.resize_variants(
+        str(source),
+        [
+            {"width": 800},
+            {"width": 100, "format": "WEBP", "quality": 70},
+            {"width": 50, "format": "PNG", "output_path": str(tmp_path / "thumb.png")},
+        ],
+        output_dir=str(tmp_path / "out"),
+    )
+
+    assert result["original_size"] == (1600, 1200)
+    assert result["draft_scale"] == 0.5
+    sizes = [variant["size"] for variant in result["variants"]]
+    assert sizes == [(800, 600), (100, 75), (50, 37)]
+    assert [variant["reduce_factor"] for variant in result["variants"]] == [1, 4, 8]
+    assert result["variants"][0]["image_path"].endswith("out/photo_800x600.jpg")
+    assert result["variants"][1]["format"] == "WEBP"
+    with Image.open(tmp_path / "thumb.png") as thumb:
+        assert thumb.size == (50, 37)
+    assert all(variant["encode_ms"] >= 0 for variant in result["variants"])
+
+
+def test_resize_variants_flattens_alpha_for_jpeg(tmp_path):
+    """Test transparent sources can produce JPEG variants."""
+    source = tmp_path / "logo.png"
+    Image.new("RGBA", (64, 64), color=(0, 0, 255, 100)).save(source)
+
+    result = imaging.resize_variants(str(source), [{"width": 32, "format": "JPEG"}])
+
+    with Image.open(result["variants"][0]["image_path"]) as out:
+        assert out.mode == "RGB"
+        assert out.size == (32, 32)
+
+
+def test_save_image_leaves_no_partial_file_on_failure(tmp_path):
+    """Test a failed encode leaves neither the target nor a temporary file."""
+    img = Image.new("RGBA", (8, 8))
+    target = tmp_path / "out.jpg"
+
+    with pytest.raises(OSError):
+        imaging.save_image(img, target)  # JPEG cannot store RGBA
+
+    assert list(tmp_path.iterdir()) == []
+    imaging.save_image(img.convert("RGB"), target)
+    assert Image.open(target).format == "JPEG"
+    assert oct(target.stat().st_mode & 0o777) == "0o644"
+
+
+def test_resize_image_reports_stage_timings(tmp_path):
+    """Test resize results carry decode, resize, encode and write timings."""
+    source = tmp_path / "source.png"
+    Image.new("RGB", (64, 64), color="green").save(source)
+
+    result = imaging.resize_image(str(source), width=32, output_path=str(tmp_path / "out.png"))
+
+    for stage in ("decode_ms", "resize_ms", "encode_ms", "write_ms"):
+        assert result[stage] >= 0
+    assert result["file_size_bytes"] == (tmp_path / "out.png").stat().st_size
+
+
+def test_process_image_chains_operations_with_one_encode(tmp_path):
+    """Test crop, EXIF transpose, rotate, resize and flatten run in order in memory."""
+    source = tmp_path / "photo.png"
+    img = Image.new("RGBA", (400, 200), color=(0, 0, 255, 0))
+    img.paste((255, 0, 0, 255), (0, 0, 200, 200))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees clockwise when displayed
+    img.save(source, exif=exif)
+
+    result = imaging.process_image(
+        str(source),
+        [
+            {"op": "crop", "left": 0, "top": 0, "width": 300, "height": 200},
+            {"op": "exif_transpose"},
+            {"op": "rotate", "degrees": 180},
+            {"op": "resize", "width": 50},
+            {"op": "flatten", "background": "#00ff00"},
+            {"op": "convert", "format": "JPEG", "quality": 80},
+        ],
+    )
+
+    assert [step["op"] for step in result["operations"]] == [
+        "crop", "exif_transpose", "rotate", "resize", "flatten"
+    ]
+    assert [step["size"] for step in result["operations"]][-1] == (50, 75)
+    (output,) = result["outputs"]
+    assert output["format"] == "JPEG" and output["image_path"].endswith("photo_processed.jpg")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["photo.png", "photo_processed.jpg"]
+    with Image.open(output["image_path"]) as out:
+        assert out.size == (50, 75)
+        # Transparent area ends up on top after the turns, flattened onto green
+        top, bottom = out.getpixel((25, 5)), out.getpixel((25, 70))
+    assert top[1] > 200 and top[0] < 60
+    assert bottom[0] > 200 and bottom[1] < 60
+
+
+def test_process_image_writes_several_outputs(tmp_path):
+    """Test multiple outputs share one decode and JPEG draft is used for a leading resize."""
+    source = tmp_path / "photo.jpg"
+    Image.new("RGB", (1600, 1200), color="orange").save(source, quality=90)
+
+    result = imaging.process_image(
+        str(source),
+        [{"op": "resize", "width": 400}],
+        outputs=[
+            {"format": "WEBP", "quality": 60},
+            {"format": "PNG", "output_path": str(tmp_path / "thumb.png")},
+        ],
+        output_dir=str(tmp_path / "out"),
+    )
+
+    assert result["draft_scale"] == 0.25
+    assert [o["format"] for o in result["outputs"]] == ["WEBP", "PNG"]
+    assert result["outputs"][0]["image_path"].endswith("out/photo_processed.webp")
+    assert all(o["size"] == (400, 300) for o in result["outputs"])
+    with pytest.raises(ValueError, match="outside"):
+        imaging.process_image(str(source), [{"op": "crop", "left": 1500, "width": 200}])
+    with pytest.raises(ValueError, match="used twice"):
+        imaging.process_image(str(source), [], outputs=[{"format": "PNG"}, {"format": "PNG"}])
+
+
+def test_save_options_effort_presets():
+    """Test effort presets map to each encoder's settings."""
+    assert imaging.save_options("PNG", effort="fast") == {"format": "PNG", "compress_level": 1}
+    assert imaging.save_options("PNG", effort="max") == {"format": "PNG", "optimize": True}
+    webp = imaging.save_options("WEBP", 80, "max")
+    assert webp == {"format": "WEBP", "method": 6, "quality": 80}
+    jpeg = imaging.save_options("JPEG", 85, "max")
+    assert jpeg["progressive"] and jpeg["optimize"] and jpeg["subsampling"] == "4:2:0"
+    assert "method" in imaging.save_options("WEBP")
+    # GIF has no setting beyond palette optimisation, so "max" falls back to "balanced"
+    assert imaging.save_options("GIF", effort="max") == {"format": "GIF", "optimize": True}
+    with pytest.raises(ValueError):
+        imaging.save_options("PNG", effort="extreme")
+
+
+def noisy_image(mode="RGB", size=(96, 96)):
+    """An image encoders cannot shrink to nothing."""
+    import random
+
+    rng = random.Random(0)
+    img = Image.frombytes("RGB", size, rng.randbytes(size[0] * size[1] * 3))
+    return img.convert(mode)
+
+
+def test_auto_encoding_keeps_smallest_candidate(tmp_path):
+    """Test AUTO encodes every candidate and writes the smallest at the target quality."""
+    source = tmp_path / "photo.png"
+    noisy_image().save(source)
+
+    result = imaging.convert_image(str(source), "auto", quality=70, effort="fast")
+
+    candidates = result["candidates"]
+    assert [(c["format"], c["quality"]) for c in candidates] == [
+        ("WEBP", 70), ("JPEG", 70), ("PNG", None)
+    ]
+    smallest = min(candidates, key=lambda c: c["bytes"])
+    assert (result["format"], result["file_size_bytes"]) == (smallest["format"], smallest["bytes"])
+    assert result["image_path"].endswith(f"photo.{imaging.format_extension(result['format'])}")
+    assert all(c["encode_ms"] >= 0 for c in candidates) and result["budget_met"]
+    assert (result["frame_count"], result["frames_written"]) == (1, 1)
+
+    explicit = imaging.convert_image(
+        str(source), "AUTO", output_path=str(tmp_path / "out.png"), candidate_formats=["WEBP"]
+    )
+    assert explicit["image_path"] == str(tmp_path / "out.webp")
+    assert Path(explicit["image_path"]).exists() and not (tmp_path / "out.png").exists()
+
+
+def test_auto_encoding_fits_byte_budget(tmp_path):
+    """Test a byte budget picks the highest quality that fits and skips JPEG for alpha."""
+    img = noisy_image("RGBA")
+    budget = imaging.choose_encoding(img, quality=90, max_bytes=6_000)
+
+    assert {c["format"] for c in budget["candidates"]} == {"WEBP", "PNG"}
+    chosen = budget["chosen"]
+    assert budget["budget_met"] and chosen["bytes"] == len(budget["data"]) <= 6_000
+    fitting = [c for c in budget["candidates"] if c["bytes"] <= 6_000]
+    assert chosen["quality"] == max(c["quality"] or 100 for c in fitting) < 90
+
+    impossible = imaging.choose_encoding(img, quality=90, max_bytes=10)
+    assert not impossible["budget_met"]
+    assert impossible["chosen"]["bytes"] == min(c["bytes"] for c in impossible["candidates"])
+
+
+@pytest.mark.parametrize(
+    "extension, options",
+    [("bmp", {}), ("tif", {}), ("tif", {"tiffinfo": {278: 7}}), ("ppm", {})],
+)
+def test_oversized_source_is_shrunk_strip_by_strip(monkeypatch, tmp_path, extension, options):
+    """Test sources over MAX_IMAGE_PIXELS with row-addressable data decode in strips."""
+    monkeypatch.setattr(imaging, "MAX_IMAGE_PIXELS", 10_000)
+    monkeypatch.setattr(imaging, "STRIP_PIXELS", 3_000)
+    # Pillow's own bomb check must stay on for everything else, and be bypassed here
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 20_000)
+    gradient = Image.linear_gradient("L").resize((300, 200)).convert("RGB")
+    source = tmp_path / f"large.{extension}"
+    gradient.save(source, **options)
+
+    result = imaging.resize_image(str(source), width=60, output_path=str(tmp_path / "out.png"))
+
+    assert result["new_size"] == (60, 40)
+    expected = gradient.resize((60, 40), Image.Resampling.LANCZOS)
+    with Image.open(result["image_path"]) as resized:
+        for y in (0, 13, 26, 39):
+            assert abs(resized.getpixel((30, y))[0] - expected.getpixel((30, y))[0]) <= 2
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(source)
+    assert Image.MAX_IMAGE_PIXELS == 20_000
+    with imaging._open_bounded(source) as img:
+        decoded, scale = imaging.load_bounded(img, source, (60, 40))
+    assert decoded.size == (100, 67) and scale == 100 / 300
+
+
+def test_oversized_source_without_strips_is_rejected(monkeypatch, tmp_path):
+    """Test oversized PNGs are refused instead of decoded whole, and JPEGs use draft."""
+    monkeypatch.setattr(imaging, "MAX_IMAGE_PIXELS", 20_000)
+    Image.new("RGB", (400, 400), "teal").save(tmp_path / "large.png")
+    Image.new("RGB", (400, 400), "teal").save(tmp_path / "large.jpg")
+
+    with pytest.raises(ValueError, match="cannot be decoded in strips"):
+        imaging.resize_image(str(tmp_path / "large.png"), width=50)
+    with pytest.raises(ValueError, match="pixel limit"):
+        imaging.convert_image(str(tmp_path / "large.png"), "JPEG")
+
+    result = imaging.resize_image(str(tmp_path / "large.jpg"), width=50)
+    assert result["new_size"] == (50, 50)
+    assert imaging.working_set_bytes((400, 400), "RGB") == (
+        20_000 * 8 + imaging.STRIP_PIXELS * 4
+    )
+    assert imaging.working_set_bytes((100, 100), "P", frame_count=10) == (
+        100 * 100 * 4 * imaging.ANIMATED_RESIDENT_FRAMES
+    )
+
+
+def animated_gif(path, frames=5):
+    """A transparent GIF with a bar moving across it and per-frame durations."""
+    images = []
+    for i in range(frames):
+        frame = Image.new("RGBA", (64, 48), (0, 0, 0, 0))
+        frame.paste((255, 40 * i, 0, 255), (i * 8, 0, i * 8 + 16, 48))
+        images.append(frame)
+    durations = [100 + 20 * i for i in range(frames)]
+    images[0].save(
+        path, save_all=True, append_images=images[1:], duration=durations, loop=0, disposal=2
+    )
+    return durations
+
+
+@pytest.mark.parametrize("target", ["GIF", "WEBP"])
+def test_animated_conversion_keeps_every_frame(tmp_path, target):
+    """Test animated sources are streamed frame by frame with timing and transparency."""
+    from PIL import ImageSequence
+
+    source = tmp_path / "anim.gif"
+    durations = animated_gif(source)
+
+    result = imaging.convert_image(str(source), target, quality=90)
+
+    assert result["frame_count"] == result["frames_written"] == 5
+    with Image.open(result["image_path"]) as converted:
+        assert converted.format == target and converted.n_frames == 5
+        seen = []
+        for index, frame in enumerate(ImageSequence.Iterator(converted)):
+            frame.load()
+            seen.append(frame.info["duration"])
+            rgba = frame.convert("RGBA")
+            assert rgba.getpixel((index * 8 + 8, 24))[3] == 255
+            assert rgba.getpixel((63, 0))[3] == 0
+        assert seen == durations
+
+
+def test_animated_source_to_still_format_reports_first_frame(tmp_path):
+    """Test still targets say they kept one frame, and AUTO refuses animations."""
+    source = tmp_path / "anim.gif"
+    animated_gif(source)
+
+    result = imaging.convert_image(str(source), "PNG")
+
+    assert (result["frame_count"], result["frames_written"]) == (5, 1)
+    with pytest.raises(ValueError, match="first of 5 frames"):
+        imaging.convert_image(str(source), "AUTO")
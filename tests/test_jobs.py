@@ -0,0 +1,191 @@
+"""Tests for the background job queue."""
+
+import asyncio
+
+import pytest
+
+from imagegen_mcp.jobs import Job, JobQueue, JobQueueFullError
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_result_is_collected():
+    """Test a submitted job runs in the background and can be awaited."""
+
+    async def runner(arguments):
+        await asyncio.sleep(0)
+        return {"echo": arguments["prompt"]}
+
+    queue = JobQueue(runner, workers=1)
+    job = queue.submit({"prompt": "a cat"})
+    assert job.status == Job.QUEUED
+
+    finished = await queue.wait(job.job_id, timeout=1)
+    assert finished.status == Job.SUCCEEDED
+    assert finished.as_dict()["result"] == {"echo": "a cat"}
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_workers_limit_concurrency_and_errors_are_reported():
+    """Test only ``workers`` jobs run at once and failures are captured."""
+    running = 0
+    peak = 0
+
+    async def runner(arguments):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if arguments["prompt"] == "bad":
+            raise ValueError("provider said no")
+        if arguments["prompt"] == "silent":
+            raise TimeoutError()
+        return {}
+
+    queue = JobQueue(runner, workers=2)
+    jobs = [queue.submit({"prompt": p}) for p in ("a", "b", "bad", "c", "silent")]
+    for job in jobs:
+        await queue.wait(job.job_id, timeout=1)
+
+    assert peak == 2
+    statuses = [job.status for job in jobs]
+    assert statuses == ["succeeded", "succeeded", "failed", "succeeded", "failed"]
+    assert jobs[2].error == "provider said no"
+    # An error without a message is reported by its type
+    assert jobs[4].error == "TimeoutError"
+    assert queue.stats()["succeeded"] == 3
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_and_running_jobs():
+    """Test cancelling works for both queued and running jobs."""
+    started = asyncio.Event()
+
+    async def runner(arguments):
+        started.set()
+        await asyncio.sleep(10)
+        return {}
+
+    queue = JobQueue(runner, workers=1)
+    running = queue.submit({"prompt": "slow"})
+    queued = queue.submit({"prompt": "next"})
+    await started.wait()
+
+    assert queue.cancel(queued.job_id).status == Job.CANCELLED
+    queue.cancel(running.job_id)
+    await queue.wait(running.job_id, timeout=1)
+    assert running.status == Job.CANCELLED
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_and_queue_limits():
+    """Test awaiting times out without cancelling and a full queue rejects jobs."""
+    release = asyncio.Event()
+
+    async def runner(arguments):
+        await release.wait()
+        return {}
+
+    queue = JobQueue(runner, workers=1, max_queued=1)
+    first = queue.submit({"prompt": "a"})
+    await asyncio.sleep(0)
+    queue.submit({"prompt": "b"})
+    with pytest.raises(JobQueueFullError):
+        queue.submit({"prompt": "c"})
+
+    assert (await queue.wait(first.job_id, timeout=0.01)).status == Job.RUNNING
+    with pytest.raises(ValueError):
+        queue.get("missing")
+    release.set()
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_restart_reissues_unfinished_and_keeps_finished_jobs(tmp_path):
+    """Test a journaled queue resumes interrupted jobs without re-running finished ones."""
+    from imagegen_mcp.journal import JobJournal
+
+    runs = []
+    release = asyncio.Event()
+
+    async def runner(arguments):
+        runs.append(arguments["prompt"])
+        if arguments["prompt"] == "slow":
+            await release.wait()
+        return {"prompt": arguments["prompt"]}
+
+    path = tmp_path / "journal.jsonl"
+    queue = JobQueue(runner, workers=1, journal=JobJournal(path))
+    done = queue.submit({"prompt": "fast"})
+    await queue.wait(done.job_id, timeout=1)
+    interrupted = queue.submit({"prompt": "slow"})
+    waiting = queue.submit({"prompt": "later"})
+    await asyncio.sleep(0.01)
+    await queue.drain(grace=0.01)
+    assert runs == ["fast", "slow"]
+
+    release.set()
+    restarted = JobQueue(runner, workers=1, journal=JobJournal(path))
+    assert restarted.restore() == {"finished": 1, "resumed": 2}
+    assert restarted.get(done.job_id).status == Job.SUCCEEDED
+    for job_id in (interrupted.job_id, waiting.job_id):
+        job = await restarted.wait(job_id, timeout=1)
+        assert job.status == Job.SUCCEEDED
+        assert job.as_dict()["resumed"] is True
+    assert runs == ["fast", "slow", "slow", "later"]
+    await restarted.aclose()
+
+
+@pytest.mark.asyncio
+async def test_journal_is_compacted_while_running(tmp_path):
+    """Test the journal drops evicted jobs every ``retention`` finishes without a restart."""
+    from imagegen_mcp.journal import JobJournal
+
+    release = asyncio.Event()
+
+    async def runner(arguments):
+        if arguments["prompt"] == "slow":
+            await release.wait()
+        return {}
+
+    journal = JobJournal(tmp_path / "journal.jsonl")
+    queue = JobQueue(runner, workers=2, retention=2, journal=journal)
+    slow = queue.submit({"prompt": "slow"})
+    jobs = [queue.submit({"prompt": str(i)}) for i in range(7)]
+    for job in jobs:
+        await queue.wait(job.job_id, timeout=1)
+
+    # Compacted at the 2nd, 4th and 6th finish: the 7th is appended after the retained two
+    states = journal.replay()
+    assert [state["job_id"] for state in states] == [
+        slow.job_id,
+        jobs[4].job_id,
+        jobs[5].job_id,
+        jobs[6].job_id,
+    ]
+    assert states[0]["started"] and "status" not in states[0]
+    assert len(journal.path.read_text().splitlines()) == 2 + 3 * 2 + 3
+    release.set()
+    await queue.wait(slow.job_id, timeout=1)
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_drain_lets_running_jobs_finish():
+    """Test shutdown waits for running jobs within the grace period."""
+
+    async def runner(arguments):
+        await asyncio.sleep(0.01)
+        return {}
+
+    queue = JobQueue(runner, workers=1)
+    job = queue.submit({"prompt": "a"})
+    await asyncio.sleep(0)
+    await queue.drain(grace=1)
+
+    assert job.status == Job.SUCCEEDED
+    with pytest.raises(JobQueueFullError):
+        queue.submit({"prompt": "b"})
@@ -0,0 +1,45 @@
+"""Tests for the job journal."""
+
+from imagegen_mcp.journal import FINISHED, STARTED, SUBMITTED, JobJournal
+
+
+def test_replay_rebuilds_latest_state_and_skips_torn_lines(tmp_path):
+    """Test replay merges records per job and ignores a partial final line."""
+    journal = JobJournal(tmp_path / "journal.jsonl")
+    journal.append(SUBMITTED, "a", arguments={"prompt": "cat"}, created_at=1.0)
+    journal.append(SUBMITTED, "b", arguments={"prompt": "dog"}, created_at=2.0)
+    journal.append(STARTED, "a", started_at=3.0)
+    journal.append(FINISHED, "a", status="succeeded", result={"x": 1}, error=None)
+    journal.append(STARTED, "b", started_at=4.0)
+    journal.close()
+    with open(journal.path, "a") as f:
+        f.write('{"op": "finished", "job_id": "b", "sta')
+
+    states = journal.replay()
+
+    assert [state["job_id"] for state in states] == ["a", "b"]
+    assert states[0]["status"] == "succeeded"
+    assert states[0]["result"] == {"x": 1}
+    assert states[1]["started"] is True
+    assert "status" not in states[1]
+
+
+def test_compact_round_trips(tmp_path):
+    """Test compacting rewrites the journal without changing the replayed state."""
+    journal = JobJournal(tmp_path / "journal.jsonl")
+    journal.append(SUBMITTED, "a", arguments={"prompt": "cat"}, created_at=1.0)
+    journal.append(STARTED, "a", started_at=2.0)
+    journal.append(FINISHED, "a", status="failed", error="boom", finished_at=3.0)
+    journal.append(SUBMITTED, "b", arguments={"prompt": "dog"}, created_at=4.0)
+    before = journal.replay()
+
+    journal.compact(before)
+
+    assert journal.replay() == before
+    assert len(journal.path.read_text().splitlines()) == 4
+    assert list(tmp_path.iterdir()) == [journal.path]
+
+
+def test_replay_of_missing_journal_is_empty(tmp_path):
+    """Test a server starting for the first time has nothing to replay."""
+    assert JobJournal(tmp_path / "missing.jsonl").replay() == []
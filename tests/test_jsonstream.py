@@ -0,0 +1,63 @@
+"""Tests for incremental base64 extraction from JSON."""
+
+import base64
+import json
+import os
+
+import pytest
+
+from imagegen_mcp.jsonstream import Base64FieldExtractor
+
+
+def _extract(body: bytes, chunk_size: int):
+    out = bytearray()
+    extractor = Base64FieldExtractor("b64_json", out.extend)
+    for start in range(0, len(body), chunk_size):
+        extractor.feed(body[start : start + chunk_size])
+    return extractor, extractor.finish(), bytes(out)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 100000])
+def test_extracts_value_across_chunk_boundaries(chunk_size):
+    """Test the decoded image matches regardless of how the body is chunked."""
+    image = os.urandom(3000)
+    encoded = base64.b64encode(image).decode().replace("/", "\\/")
+    body = (
+        '{"created": 1, "data": [{"revised_prompt": "say \\"b64_json\\": \\"x\\"", '
+        f'"b64_json" : "{encoded}"}}]}}'
+    ).encode()
+
+    extractor, document, decoded = _extract(body, chunk_size)
+
+    assert extractor.found
+    assert decoded == image
+    assert document["data"][0]["b64_json"] == ""
+    assert document["data"][0]["revised_prompt"] == 'say "b64_json": "x"'
+
+
+def test_document_without_field_is_parsed_normally():
+    """Test URL responses pass through untouched."""
+    body = json.dumps({"data": [{"url": "https://example.test/a.png"}]}).encode()
+
+    extractor, document, decoded = _extract(body, 5)
+
+    assert not extractor.found
+    assert decoded == b""
+    assert document["data"][0]["url"] == "https://example.test/a.png"
+
+
+def test_truncated_value_raises():
+    """Test a body cut off mid-value is reported as an error."""
+    extractor = Base64FieldExtractor("b64_json", lambda data: None)
+    extractor.feed(b'{"data": [{"b64_json": "QUJD')
+
+    with pytest.raises(ValueError):
+        extractor.finish()
+
+
+def test_invalid_base64_raises():
+    """Test characters outside the base64 alphabet are rejected."""
+    extractor = Base64FieldExtractor("b64_json", lambda data: None)
+
+    with pytest.raises(ValueError):
+        extractor.feed(b'{"b64_json": "QU*D"}')
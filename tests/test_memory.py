@@ -0,0 +1,69 @@
+"""Tests for the decoded-bytes memory governor."""
+
+import asyncio
+
+import pytest
+
+from imagegen_mcp.memory import MemoryGovernor
+
+
+@pytest.mark.asyncio
+async def test_reservations_queue_in_arrival_order():
+    """Test operations over the budget wait, and are admitted first come first served."""
+    governor = MemoryGovernor(100)
+    order = []
+    release = asyncio.Event()
+
+    async def operation(name, nbytes):
+        async with governor.reserve(nbytes):
+            order.append(name)
+            await release.wait()
+
+    first = asyncio.create_task(operation("first", 60))
+    await asyncio.sleep(0)
+    # "large" does not fit next to "first"; "small" would, but must not overtake it
+    rest = [asyncio.create_task(operation(name, n)) for name, n in [("large", 80), ("small", 10)]]
+    await asyncio.sleep(0)
+    assert order == ["first"] and governor.waiting == 2
+    assert governor.stats()["in_use_bytes"] == 60
+
+    release.set()
+    await asyncio.gather(first, *rest)
+    assert order == ["first", "large", "small"]
+    stats = governor.stats()
+    assert stats["in_use_bytes"] == 0 and stats["peak_bytes"] == 90
+    assert stats["reservations"] == 3 and stats["waited"] == 2
+
+
+@pytest.mark.asyncio
+async def test_oversized_reservation_runs_alone_and_cancelled_waiter_leaves_queue():
+    """Test a reservation above the budget waits for an idle governor, and cancelling
+    a queued operation lets the ones behind it through."""
+    governor = MemoryGovernor(100)
+    holder = asyncio.Event()
+
+    async def hold(nbytes):
+        async with governor.reserve(nbytes):
+            await holder.wait()
+
+    running = asyncio.create_task(hold(50))
+    await asyncio.sleep(0)
+    huge = asyncio.create_task(hold(10_000))
+    small = asyncio.create_task(hold(10))
+    await asyncio.sleep(0)
+    assert governor.waiting == 2
+
+    huge.cancel()
+    await asyncio.gather(huge, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert governor.waiting == 0 and governor.in_use == 60
+
+    holder.set()
+    await asyncio.gather(running, small)
+    async with governor.reserve(10_000) as waited:
+        assert governor.in_use == 100 and waited >= 0
+    assert governor.in_use == 0
+
+    disabled = MemoryGovernor(0)
+    async with disabled.reserve(10_000):
+        assert disabled.in_use == 0
@@ -0,0 +1,59 @@
+"""Tests for cached image metadata lookups."""
+
+import os
+
+import pytest
+
+from imagegen_mcp.metadata import MetadataCache, expand_image_paths, file_version
+
+
+def test_cache_invalidates_on_file_change(tmp_path):
+    """Test cached metadata is reused until the file's mtime or size changes."""
+    image = tmp_path / "a.png"
+    image.write_bytes(b"one")
+    cache = MetadataCache()
+
+    path, version = file_version(str(image))
+    assert cache.get(path, version) is None
+    cache.put(path, version, {"width": 1})
+    assert cache.get(path, version) == {"width": 1}
+
+    image.write_bytes(b"three")
+    os.utime(image, ns=(version[0] + 10**9, version[0] + 10**9))
+    path, changed = file_version(str(image))
+    assert changed != version
+    assert cache.get(path, changed) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1}
+
+
+def test_cache_evicts_least_recently_used():
+    """Test the cache keeps at most max_entries files."""
+    cache = MetadataCache(max_entries=2)
+    cache.put("a", (1, 1), {"name": "a"})
+    cache.put("b", (1, 1), {"name": "b"})
+    cache.get("a", (1, 1))
+    cache.put("c", (1, 1), {"name": "c"})
+
+    assert cache.get("b", (1, 1)) is None
+    assert cache.get("a", (1, 1)) == {"name": "a"}
+
+
+def test_file_version_missing_file(tmp_path):
+    """Test a missing file raises a descriptive FileNotFoundError."""
+    with pytest.raises(FileNotFoundError, match="Image not found"):
+        file_version(str(tmp_path / "missing.png"))
+
+
+def test_expand_image_paths_merges_glob(tmp_path):
+    """Test explicit paths and glob matches are merged without duplicates."""
+    for name in ("b.png", "a.png", "c.jpg"):
+        (tmp_path / name).write_bytes(b"x")
+    explicit = str(tmp_path / "b.png")
+
+    paths = expand_image_paths([explicit], str(tmp_path / "*.png"))
+
+    assert paths == [explicit, str(tmp_path / "a.png")]
+    with pytest.raises(ValueError):
+        expand_image_paths()
+    with pytest.raises(ValueError):
+        expand_image_paths(pattern=str(tmp_path / "*"), limit=2)
@@ -0,0 +1,71 @@
+"""Tests for the metrics registry and HDR-style histograms."""
+
+import pytest
+
+from imagegen_mcp.metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_percentiles_are_within_bucket_precision():
+    """Test percentiles of 1..1000 ms land within 2% of the exact values."""
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+
+    assert histogram.count == 1000
+    assert histogram.min == 0.001 and histogram.max == 1.0
+    for q, exact in ((0.5, 0.5), (0.9, 0.9), (0.99, 0.99)):
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.02)
+    assert histogram.percentile(1.0) == 1.0
+    assert Histogram().percentile(0.5) is None
+
+
+def test_histogram_summary_keys():
+    """Test the summary reports count, sum, extremes and the standard quantiles."""
+    histogram = Histogram()
+    histogram.record(0.25)
+
+    summary = histogram.summary()
+
+    assert summary["count"] == 1
+    assert summary["p50"] == summary["p999"] == 0.25
+    assert set(summary) == {"count", "sum", "min", "max", "mean", "p50", "p90", "p99", "p999"}
+    assert Histogram().summary() == {"count": 0}
+
+
+def test_registry_counters_and_snapshot():
+    """Test counters and histograms are split by labels in the snapshot."""
+    metrics = MetricsRegistry()
+    metrics.inc("tool_calls_total", tool="generate_image", status="ok")
+    metrics.inc("tool_calls_total", tool="generate_image", status="ok")
+    metrics.inc("bytes_in_total", 512, component="pollinations")
+    metrics.observe("tool_duration_seconds", 0.1, tool="generate_image")
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot["counters"]["tool_calls_total"] == {"status=ok,tool=generate_image": 2}
+    assert metrics.counter_value("bytes_in_total", component="pollinations") == 512
+    assert snapshot["histograms"]["tool_duration_seconds"]["tool=generate_image"]["count"] == 1
+
+
+def test_prometheus_text_and_file(tmp_path):
+    """Test the exposition format, label escaping and the atomic textfile dump."""
+    metrics = MetricsRegistry()
+    metrics.inc("errors_total", tool="resize_image", error='Bad "value"')
+    metrics.observe("stage_duration_seconds", 0.5, stage="decode", component="resize_image")
+
+    text = metrics.prometheus_text()
+
+    assert "# TYPE imagegen_errors_total counter" in text
+    assert 'imagegen_errors_total{error="Bad \\"value\\"",tool="resize_image"} 1' in text
+    assert "# TYPE imagegen_stage_duration_seconds summary" in text
+    assert (
+        'imagegen_stage_duration_seconds{component="resize_image",stage="decode",'
+        'quantile="0.5"} 0.5'
+    ) in text
+    count = 'imagegen_stage_duration_seconds_count{component="resize_image",stage="decode"} 1'
+    assert count in text
+
+    target = tmp_path / "metrics" / "imagegen.prom"
+    metrics.write_prometheus(target)
+    assert target.read_text() == text
+    assert [p.name for p in target.parent.iterdir()] == ["imagegen.prom"]
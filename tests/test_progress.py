@@ -0,0 +1,60 @@
+"""Tests for MCP progress reporting."""
+
+import pytest
+
+from imagegen_mcp import progress
+from imagegen_mcp.progress import ProgressReporter
+
+
+def make_reporter(clock=lambda: 0.0):
+    sent = []
+
+    async def send(value, total, message):
+        sent.append((value, total, message))
+
+    return ProgressReporter(send, min_interval=0.1, clock=clock), sent
+
+
+@pytest.mark.asyncio
+async def test_updates_must_increase_and_are_rate_limited():
+    """Test stale updates are dropped and unforced updates are throttled."""
+    now = [0.0]
+    reporter, sent = make_reporter(lambda: now[0])
+
+    await reporter.update(1, 10, "one")
+    await reporter.update(1, 10, "again")
+    await reporter.update(2, 10, "too soon")
+    await reporter.update(3, 10, "forced", force=True)
+    now[0] = 1.0
+    await reporter.update(4, 10, "later")
+
+    assert [message for _, _, message in sent] == ["one", "forced", "later"]
+
+
+@pytest.mark.asyncio
+async def test_send_failures_are_ignored():
+    """Test a broken transport never fails the tool call."""
+
+    async def send(value, total, message):
+        raise RuntimeError("stream closed")
+
+    await ProgressReporter(send).update(1, None, None)
+
+
+@pytest.mark.asyncio
+async def test_stage_and_download_reports_use_current_reporter():
+    """Test module helpers report through the context's reporter only."""
+    reporter, sent = make_reporter()
+    await progress.report_stage(progress.REQUEST_SENT, "ignored without a reporter")
+
+    with progress.reporting(reporter):
+        await progress.report_stage(progress.FIRST_BYTE, "first byte")
+        reporter.min_interval = 0
+        await progress.report_download(100, None)
+        await progress.report_download(50, 100)
+
+    assert sent[0] == (progress.FIRST_BYTE, 100.0, "first byte")
+    assert progress.FIRST_BYTE < sent[1][0] < progress.DOWNLOAD_DONE
+    assert sent[1][2] == "Downloaded 100 bytes"
+    assert sent[2] == (52.5, 100.0, "Downloaded 50 of 100 bytes")
+    assert progress.current() is None
@@ -0,0 +1,95 @@
+"""Tests for provider rate limiting and circuit breaking."""
+
+import pytest
+
+from imagegen_mcp.ratelimit import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimiterRegistry,
+    RateLimitExceededError,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_queues_in_order_and_refills():
+    """Test reservations beyond the burst wait one interval each."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+    clock.now += 1.0
+    assert bucket.tokens == pytest.approx(0.0)
+    clock.now += 10.0
+    assert bucket.tokens == 2.0
+
+
+def test_token_bucket_max_wait():
+    """Test a reservation that would wait too long is refused without consuming."""
+    bucket = TokenBucket(rate=1.0, burst=1, clock=FakeClock())
+    bucket.reserve()
+
+    with pytest.raises(RateLimitExceededError):
+        bucket.reserve(max_wait=0.5)
+    assert bucket.reserve(max_wait=1.0) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_registry_applies_provider_and_model_limits(monkeypatch):
+    """Test both the provider and the per-model bucket are consulted."""
+    monkeypatch.setenv("IMAGEGEN_MODEL_RATE_LIMITS", '{"pollinations:turbo": {"rate": 1}}')
+    monkeypatch.setenv("IMAGEGEN_OPENAI_RATE", "0")
+    registry = RateLimiterRegistry.from_env({"pollinations": (100.0, 10.0), "openai": (1.0, 1)})
+
+    assert set(registry.snapshot()) == {"pollinations", "pollinations:turbo"}
+    assert await registry.acquire("pollinations", "turbo") == 0.0
+    registry.max_wait = 0.1
+    with pytest.raises(RateLimitExceededError):
+        await registry.acquire("pollinations", "turbo")
+    assert await registry.acquire("pollinations", "flux") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_registry_refunds_provider_token_when_model_limit_refuses():
+    """Test a request refused by its model bucket does not use up a provider token."""
+    registry = RateLimiterRegistry({"openai": (0.001, 2)}, {"openai:dall-e-3": (0.001, 1)}, 0.1)
+
+    assert await registry.acquire("openai", "dall-e-3") == 0.0
+    with pytest.raises(RateLimitExceededError):
+        await registry.acquire("openai", "dall-e-3")
+    assert registry.snapshot()["openai"]["tokens"] == pytest.approx(1.0, abs=0.01)
+    assert await registry.acquire("openai", "gpt-image-1") == 0.0
+
+
+def test_circuit_breaker_opens_and_probes_after_cooldown():
+    """Test the breaker fails fast when open and closes after a good probe."""
+    clock = FakeClock()
+    breaker = CircuitBreaker("pollinations", failure_threshold=2, cooldown=10.0, clock=clock)
+
+    for _ in range(2):
+        breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    clock.now += 10.0
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 10.0
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.snapshot()["state"] == CircuitBreaker.CLOSED
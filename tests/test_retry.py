@@ -0,0 +1,105 @@
+"""Tests for the provider retry policy."""
+
+import time
+
+import httpx
+import pytest
+
+from imagegen_mcp.retry import (
+    RetryableProviderError,
+    RetryBudget,
+    RetryPolicy,
+    call_with_retry,
+    parse_retry_after,
+)
+
+
+def _status_error(status: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://example.test")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+
+class FakeSleep:
+    def __init__(self):
+        self.delays = []
+
+    async def __call__(self, delay):
+        self.delays.append(delay)
+
+
+def _flaky(errors, result="ok"):
+    remaining = list(errors)
+
+    async def call():
+        if remaining:
+            raise remaining.pop(0)
+        return result
+
+    return call
+
+
+def test_backoff_is_jittered_and_capped():
+    """Test full-jitter delays stay within the exponential ceiling."""
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+
+    assert policy.backoff(1, rand=lambda: 1.0) == 1.0
+    assert policy.backoff(3, rand=lambda: 0.5) == 2.0
+    assert policy.backoff(10, rand=lambda: 1.0) == 5.0
+
+
+def test_parse_retry_after():
+    """Test Retry-After seconds and HTTP dates are understood."""
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    future = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 <= parse_retry_after(future) <= 31
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_honoring_retry_after():
+    """Test 429/5xx are retried and server hints override the backoff."""
+    sleep = FakeSleep()
+    call = _flaky([_status_error(429, {"Retry-After": "2"}), _status_error(502)])
+
+    result, stats = await call_with_retry(
+        call, RetryPolicy(max_attempts=3, base_delay=0.1), sleep=sleep
+    )
+
+    assert result == "ok"
+    assert stats.attempts == 3
+    assert sleep.delays[0] == 2.0
+    assert sleep.delays[1] <= 0.2
+    assert stats.errors == ["HTTP 429", "HTTP 502"]
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_and_exhausted_errors_are_raised():
+    """Test 4xx errors fail immediately and attempts are capped."""
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        await call_with_retry(_flaky([_status_error(400)]), RetryPolicy(), sleep=FakeSleep())
+    assert excinfo.value.retry_stats.attempts == 1
+
+    errors = [RetryableProviderError("loading", retry_after=0.0) for _ in range(5)]
+    with pytest.raises(RetryableProviderError) as excinfo:
+        await call_with_retry(_flaky(errors), RetryPolicy(max_attempts=3), sleep=FakeSleep())
+    assert excinfo.value.retry_stats.attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_deadline_and_budget_stop_retries():
+    """Test waits past the deadline and an empty budget end retrying."""
+    hinted = RetryableProviderError("loading", retry_after=10.0)
+    with pytest.raises(RetryableProviderError):
+        await call_with_retry(
+            _flaky([hinted]), RetryPolicy(max_delay=60.0, deadline=5.0), sleep=FakeSleep()
+        )
+
+    budget = RetryBudget(ratio=0.0, capacity=1.0)
+    errors = [_status_error(503) for _ in range(3)]
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        await call_with_retry(
+            _flaky(errors), RetryPolicy(max_attempts=5, base_delay=0.0), budget, sleep=FakeSleep()
+        )
+    assert excinfo.value.retry_stats.attempts == 2
@@ -0,0 +1,55 @@
+"""Tests for latency-aware provider routing."""
+
+from imagegen_mcp.routing import ProviderRouter, RollingStats, percentile
+
+
+def test_percentile_nearest_rank():
+    """Test percentiles pick the nearest-rank sample."""
+    values = [5.0, 1.0, 3.0, 2.0, 4.0]
+    assert percentile(values, 0.5) == 3.0
+    assert percentile(values, 0.9) == 5.0
+    assert percentile(values, 0.0) == 1.0
+    assert percentile([], 0.5) is None
+
+
+def test_rolling_stats_window_and_expected_seconds():
+    """Test the window keeps recent calls and scores by latency over success rate."""
+    stats = RollingStats(window=4)
+    assert stats.expected_seconds() == 0.0
+    for latency in (100.0, 2.0, 2.0, 2.0):
+        stats.record(latency, ok=True)
+    stats.record(9.0, ok=False)
+
+    assert len(stats) == 4
+    assert stats.error_rate == 0.25
+    assert stats.latency(0.5) == 2.0
+    assert stats.expected_seconds() == 2.0 / 0.75
+
+
+def test_rank_prefers_fast_healthy_providers():
+    """Test ranking orders by expected time, keeping preference order on ties."""
+    router = ProviderRouter(preference=["pollinations", "huggingface", "openai"])
+    for _ in range(3):
+        router.record("pollinations", "flux", 8.0, ok=True)
+        router.record("huggingface", "hf-model", 2.0, ok=True)
+        router.record("openai", "gpt-image-1", 1.0, ok=False)
+
+    ranked = router.rank(
+        [("pollinations", "flux"), ("huggingface", "hf-model"), ("openai", "gpt-image-1")]
+    )
+    assert [c.provider for c in ranked] == ["huggingface", "pollinations", "openai"]
+    assert ranked[-1].as_dict()["expected_seconds"] is None
+
+    unseen = router.rank([("pollinations", "turbo"), ("huggingface", "other")])
+    assert [c.provider for c in unseen] == ["pollinations", "huggingface"]
+
+
+def test_hedge_delay_needs_enough_samples():
+    """Test no hedge delay is offered until enough successful calls were seen."""
+    router = ProviderRouter(hedge_percentile=0.9, min_samples=3)
+    router.record("pollinations", "flux", 1.0, ok=True)
+    router.record("pollinations", "flux", 2.0, ok=True)
+    assert router.hedge_delay("pollinations", "flux") is None
+
+    router.record("pollinations", "flux", 3.0, ok=True)
+    assert router.hedge_delay("pollinations", "flux") == 3.0
@@ -1,20 +1,75 @@
 """Tests for image generation MCP server."""
 
-import pytest
+import asyncio
+import base64
+import json
+from io import BytesIO
 from pathlib import Path
+
+import httpx
+import pytest
+import pytest_asyncio
+from PIL import Image, ImageCms
+
+from imagegen_mcp import imaging, progress, server
+from imagegen_mcp.cache import GenerationCache
+from imagegen_mcp.http_client import HttpClientPool
+from imagegen_mcp.jobs import JobQueue
+from imagegen_mcp.memory import MemoryGovernor
+from imagegen_mcp.metrics import MetricsRegistry
+from imagegen_mcp.ratelimit import CircuitBreaker, CircuitOpenError, RateLimiterRegistry
+from imagegen_mcp.retry import RetryPolicy
+from imagegen_mcp.routing import ProviderRouter
 from imagegen_mcp.server import (
+    convert_image_format,
     get_image_metadata,
+    get_images_metadata,
     resize_image_file,
-    convert_image_format,
-    DEFAULT_OUTPUT_DIR,
 )
+from imagegen_mcp.singleflight import SingleFlight
+from imagegen_mcp.tracing import RotatingTraceFile, Tracer
+from imagegen_mcp.workers import ImageWorkerPool
+
+
+@pytest.fixture(autouse=True)
+def isolated_provider_state(monkeypatch):
+    """Give each test fresh provider limits so earlier tests cannot throttle it."""
+
+    monkeypatch.setattr(server, "rate_limiters", RateLimiterRegistry())
+    monkeypatch.setattr(server, "in_flight_generations", SingleFlight())
+    monkeypatch.setattr(server, "provider_router", ProviderRouter(["pollinations"]))
+    monkeypatch.setattr(server, "_provider_semaphores", {})
+    monkeypatch.setattr(server, "_circuit_breakers", {})
+    monkeypatch.setattr(server, "_retry_budgets", {})
+
+
+@pytest_asyncio.fixture
+async def mock_provider(monkeypatch, tmp_path):
+    """
+    Route provider HTTP calls to a handler and write generated images to ``tmp_path``.
+
+    Call it with an ``httpx.MockTransport`` handler (plus any ``HttpClientPool`` keyword
+    arguments); it installs the pool as the server's client and returns it. Pools are
+    closed when the test ends.
+    """
+    pools = []
+
+    def install(handler, **pool_options):
+        pool = HttpClientPool(transport=httpx.MockTransport(handler), **pool_options)
+        monkeypatch.setattr(server, "http_clients", pool)
+        monkeypatch.setattr(server, "DEFAULT_OUTPUT_DIR", tmp_path)
+        pools.append(pool)
+        return pool
+
+    yield install
+    for pool in pools:
+        await pool.aclose()
 
 
 @pytest.fixture
 def sample_image_path(tmp_path):
     """Create a sample test image."""
-    from PIL import Image
-    
+
     img = Image.new("RGB", (100, 100), color="red")
     img_path = tmp_path / "test_image.png"
     img.save(img_path)
@@ -32,6 +87,26 @@ async def test_get_image_metadata(sample_image_path):
     assert metadata["mode"] == "RGB"
 
 
+@pytest.mark.asyncio
+async def test_oversized_source_resizes_through_the_tool(monkeypatch, tmp_path):
+    """Test a source Pillow's bomb check refuses reaches the strip decoder via call_tool."""
+
+    monkeypatch.setattr(imaging, "MAX_IMAGE_PIXELS", 10_000)
+    monkeypatch.setattr(imaging, "STRIP_PIXELS", 3_000)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 20_000)
+    source = tmp_path / "large.ppm"
+    Image.linear_gradient("L").resize((300, 200)).convert("RGB").save(source)
+
+    arguments = {"image_path": str(source), "width": 60, "output_path": str(tmp_path / "out.png")}
+    response = await server.call_tool("resize_image", arguments)
+
+    result = json.loads(response[0].text)
+    assert tuple(result["new_size"]) == (60, 40)
+    assert Image.MAX_IMAGE_PIXELS == 20_000
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(source)
+
+
 @pytest.mark.asyncio
 async def test_resize_image_maintain_aspect(sample_image_path, tmp_path):
     """Test resizing image while maintaining aspect ratio."""
@@ -82,8 +157,7 @@ async def test_resize_with_height_only(sample_image_path, tmp_path):
 @pytest.mark.asyncio
 async def test_convert_png_with_transparency(tmp_path):
     """Test converting PNG with transparency to JPEG."""
-    from PIL import Image
-    
+
     # Create PNG with transparency
     img = Image.new("RGBA", (100, 100), color=(255, 0, 0, 128))
     png_path = tmp_path / "transparent.png"
@@ -99,3 +173,688 @@ async def test_convert_png_with_transparency(tmp_path):
     
     assert result["format"] == "JPEG"
     assert Path(result["image_path"]).exists()
+
+
+@pytest.mark.asyncio
+async def test_generate_pollinations_uses_shared_client(tmp_path, mock_provider):
+    """Test Pollinations generation goes through the server's pooled client."""
+
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8), color="blue").save(buffer, format="PNG")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=buffer.getvalue())
+
+    mock_provider(handler)
+
+    for name in ("first.png", "second.png"):
+        result = await server.generate_image_pollinations(
+            "a blue square", "8x8", save_path=tmp_path / name
+        )
+        assert Path(result["image_path"]).read_bytes() == buffer.getvalue()
+
+    assert len(requests) == 2
+    assert requests[0].url.host == "image.pollinations.ai"
+
+
+@pytest.mark.asyncio
+async def test_dispatch_generation_serves_repeats_from_cache(monkeypatch, tmp_path, mock_provider):
+    """Test an identical generate_image request is answered from the cache."""
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=b"png-bytes")
+
+    mock_provider(handler)
+    monkeypatch.setattr(
+        server, "generation_cache", GenerationCache(tmp_path / ".cache", 1024, 10)
+    )
+    arguments = {"prompt": "a cat", "size": "64x64", "seed": 7}
+
+    first = await server.dispatch_generation(arguments)
+    second = await server.dispatch_generation(arguments)
+
+    assert len(requests) == 1
+    assert first["cache"]["hit"] is False
+    assert second["cache"] == {"hit": True, "hits": 1, "misses": 1, "entries": 1, "bytes": 9}
+    assert Path(second["image_path"]).read_bytes() == b"png-bytes"
+    # A hit gets its own file in the output directory, never the cache object
+    assert Path(second["image_path"]).parent == tmp_path
+    assert second["image_path"] != first["image_path"]
+
+
+@pytest.mark.asyncio
+async def test_identical_in_flight_requests_are_coalesced(monkeypatch, mock_provider):
+    """Test concurrent identical requests share one upstream call but get own files."""
+
+    requests = []
+    release = asyncio.Event()
+
+    async def handler(request):
+        requests.append(request)
+        await release.wait()
+        return httpx.Response(200, content=b"png-bytes")
+
+    mock_provider(handler)
+    monkeypatch.setattr(server, "generation_cache", None)
+    arguments = {"prompt": "a cat", "size": "64x64", "seed": 7}
+
+    tasks = [
+        asyncio.create_task(server.dispatch_generation({**arguments, "output_filename": "a.png"})),
+        asyncio.create_task(server.dispatch_generation({**arguments, "output_filename": "b.png"})),
+        asyncio.create_task(server.dispatch_generation(arguments)),
+    ]
+    while not requests:
+        await asyncio.sleep(0.01)
+    release.set()
+    first, second, third = await asyncio.gather(*tasks)
+
+    assert len(requests) == 1
+    assert "coalesced" not in first
+    assert second["coalesced"] is True and third["coalesced"] is True
+    paths = {first["image_path"], second["image_path"], third["image_path"]}
+    assert len(paths) == 3
+    assert all(Path(path).read_bytes() == b"png-bytes" for path in paths)
+
+
+@pytest.mark.asyncio
+async def test_generate_images_batch_isolates_failures(monkeypatch, tmp_path, mock_provider):
+    """Test a failing batch item is reported without aborting the others."""
+
+    def handler(request):
+        if "broken" in str(request.url):
+            return httpx.Response(500)
+        return httpx.Response(200, content=b"png-bytes")
+
+    mock_provider(handler)
+    monkeypatch.setattr(server, "generation_cache", None)
+    monkeypatch.setattr(
+        server, "_retry_policies", {server.ImageProvider.POLLINATIONS: RetryPolicy(max_attempts=1)}
+    )
+
+    result = await server.generate_images_batch(
+        [
+            {"prompt": "a dog", "output_filename": "dog.png"},
+            {"prompt": "broken"},
+            {"prompt": "a cat", "output_filename": "cat.png"},
+        ],
+        defaults={"size": "64x64"},
+    )
+
+    assert result["succeeded"] == 2
+    assert result["failed"] == 1
+    assert [item["status"] for item in result["results"]] == ["ok", "error", "ok"]
+    assert "500" in result["results"][1]["error"]
+    assert (tmp_path / "cat.png").read_bytes() == b"png-bytes"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_generations_get_distinct_files(mock_provider):
+    """Test concurrent generations without a filename never overwrite each other."""
+
+    def handler(request):
+        return httpx.Response(200, content=request.url.params["seed"].encode())
+
+    mock_provider(handler)
+
+    results = await asyncio.gather(
+        *(server.generate_image_pollinations("a fox", "8x8", seed=seed) for seed in range(5))
+    )
+
+    paths = [Path(result["image_path"]) for result in results]
+    assert len(set(paths)) == 5
+    assert [path.read_bytes() for path in paths] == [str(seed).encode() for seed in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_generate_openai_streams_b64_json(monkeypatch, mock_provider):
+    """Test OpenAI b64_json responses are decoded to disk."""
+
+    image = b"\x89PNG fake image bytes" * 100
+    body = json.dumps({"data": [{"b64_json": base64.b64encode(image).decode()}]}).encode()
+
+    def handler(request):
+        assert request.headers["Authorization"] == "Bearer sk-test"
+        return httpx.Response(200, content=body)
+
+    mock_provider(handler)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    result = await server.generate_image_openai("a robot", "1024x1024")
+
+    assert Path(result["image_path"]).read_bytes() == image
+    assert result["file_size_bytes"] == len(image)
+    assert result["url"] is None
+
+
+@pytest.mark.asyncio
+async def test_get_image_metadata_reads_header_fields(tmp_path):
+    """Test EXIF orientation, ICC, DPI and frame count are reported."""
+
+    jpeg_path = tmp_path / "photo.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    icc = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    Image.new("RGB", (30, 20)).save(jpeg_path, exif=exif, icc_profile=icc, dpi=(300, 300))
+
+    gif_path = tmp_path / "anim.gif"
+    frames = [Image.new("RGB", (10, 10), color) for color in ("red", "green", "blue")]
+    frames[0].save(gif_path, save_all=True, append_images=frames[1:])
+
+    photo = await get_image_metadata(str(jpeg_path))
+    anim = await get_image_metadata(str(gif_path))
+
+    assert photo["orientation"] == 6
+    assert photo["has_icc_profile"] is True
+    assert photo["dpi"] == [300.0, 300.0]
+    assert anim["frame_count"] == 3
+    assert anim["is_animated"] is True
+
+
+@pytest.mark.asyncio
+async def test_get_images_metadata_batch(sample_image_path, tmp_path):
+    """Test batch metadata lookups by glob report per-file errors."""
+
+    result = await get_images_metadata(
+        image_paths=[str(tmp_path / "missing.png")], pattern=str(tmp_path / "*.png")
+    )
+
+    assert result["count"] == 1
+    assert result["images"][0]["width"] == 100
+    assert result["errors"][0]["path"].endswith("missing.png")
+
+    again = await get_images_metadata(pattern=str(tmp_path / "*.png"))
+    assert again["cache"]["hits"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_huggingface_cold_start_is_retried(monkeypatch, mock_provider):
+    """Test a HuggingFace 503 is retried after the advertised estimated_time."""
+
+    responses = iter(
+        [
+            httpx.Response(503, json={"error": "Model is loading", "estimated_time": 0.05}),
+            httpx.Response(200, content=b"png-bytes"),
+        ]
+    )
+    mock_provider(lambda request: next(responses))
+    monkeypatch.setattr(server, "generation_cache", None)
+    monkeypatch.setenv("HUGGINGFACE_API_KEY", "hf_test")
+
+    result = await server.dispatch_generation({"prompt": "a tree", "provider": "huggingface"})
+
+    assert result["retry"]["attempts"] == 2
+    assert result["retry"]["wait_seconds"] == pytest.approx(0.05)
+    assert Path(result["image_path"]).read_bytes() == b"png-bytes"
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_and_shows_in_status(monkeypatch, mock_provider):
+    """Test repeated provider failures open the breaker and stop outgoing calls."""
+
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(502)
+
+    mock_provider(handler)
+    provider = server.ImageProvider.POLLINATIONS
+    monkeypatch.setattr(server, "generation_cache", None)
+    monkeypatch.setattr(server, "_retry_policies", {provider: RetryPolicy(max_attempts=1)})
+    monkeypatch.setattr(
+        server, "_circuit_breakers", {provider: CircuitBreaker("pollinations", 2, 60.0)}
+    )
+
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await server.dispatch_generation({"prompt": "a boat"})
+    with pytest.raises(CircuitOpenError):
+        await server.dispatch_generation({"prompt": "a boat"})
+
+    assert len(calls) == 2
+    status = server.get_provider_status()
+    assert status["pollinations"]["circuit_breaker"]["state"] == "open"
+    assert status["pollinations"]["retry_budget_tokens"] <= 10
+    assert status["openai"]["concurrency"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_auto_provider_fails_over_to_next_provider(monkeypatch, tmp_path, mock_provider):
+    """Test provider 'auto' moves on to the next provider when the first fails."""
+
+    def handler(request):
+        if "pollinations" in request.url.host:
+            return httpx.Response(503)
+        return httpx.Response(200, content=b"hf-bytes")
+
+    mock_provider(handler)
+    monkeypatch.setenv("HUGGINGFACE_API_KEY", "test-key")
+    monkeypatch.setattr(server, "generation_cache", None)
+    monkeypatch.setattr(server, "provider_router", ProviderRouter(["pollinations", "huggingface"]))
+    monkeypatch.setattr(
+        server,
+        "_retry_policies",
+        {provider: RetryPolicy(max_attempts=1) for provider in server.ImageProvider},
+    )
+
+    result = await server.dispatch_generation(
+        {"prompt": "a cat", "provider": "auto", "size": "64x64", "output_filename": "cat.png"}
+    )
+
+    assert result["provider"] == "huggingface"
+    assert result["routing"]["selected"] == "pollinations"
+    assert result["routing"]["winner"] == "huggingface"
+    assert result["routing"]["failed"][0]["provider"] == "pollinations"
+    assert (tmp_path / "cat.png").read_bytes() == b"hf-bytes"
+    assert server.provider_router.stats("pollinations", "flux").error_rate == 1.0
+
+
+@pytest.mark.asyncio
+async def test_auto_provider_hedges_slow_requests(monkeypatch, tmp_path, mock_provider):
+    """Test a slow primary is hedged and the losing request is cancelled."""
+
+    cancelled = asyncio.Event()
+
+    async def handler(request):
+        if "pollinations" in request.url.host:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return httpx.Response(200, content=b"hf-bytes")
+
+    router = ProviderRouter(["pollinations", "huggingface"], hedge=True, min_samples=1)
+    router.record("pollinations", "flux", 0.01, ok=True)
+    hf_model = server.DEFAULT_MODELS[server.ImageProvider.HUGGINGFACE]
+    router.record("huggingface", hf_model, 0.5, ok=True)
+    mock_provider(handler)
+    monkeypatch.setenv("HUGGINGFACE_API_KEY", "test-key")
+    monkeypatch.setattr(server, "generation_cache", None)
+    monkeypatch.setattr(server, "provider_router", router)
+
+    result = await server.dispatch_generation(
+        {"prompt": "a dog", "provider": "auto", "size": "64x64", "output_filename": "dog.png"}
+    )
+
+    assert result["routing"]["hedged"] is True
+    assert result["routing"]["winner"] == "huggingface"
+    assert result["image_path"] == str((tmp_path / "dog.png").absolute())
+    assert (tmp_path / "dog.png").read_bytes() == b"hf-bytes"
+    assert cancelled.is_set()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dog.png"]
+
+
+@pytest.mark.asyncio
+async def test_submit_generation_returns_job_and_await_collects_result(monkeypatch, mock_provider):
+    """Test the job tools run a generation in the background."""
+
+    mock_provider(lambda request: httpx.Response(200, content=b"png"))
+    monkeypatch.setattr(server, "generation_cache", None)
+    queue = JobQueue(server.dispatch_generation, workers=1)
+    monkeypatch.setattr(server, "job_queue", queue)
+
+    submitted = json.loads(
+        (await server.call_tool("submit_generation", {"prompt": "a fox", "size": "8x8"}))[0].text
+    )
+    assert submitted["status"] == "queued"
+
+    done = json.loads(
+        (await server.call_tool("await_job", {"job_id": submitted["job_id"]}))[0].text
+    )
+    assert done["status"] == "succeeded"
+    assert Path(done["result"]["image_path"]).read_bytes() == b"png"
+
+    missing = await server.call_tool("get_job_status", {"job_id": "nope"})
+    assert missing[0].text == "Error: Unknown job: nope"
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_job_deadline_does_not_leak_into_later_jobs(monkeypatch, mock_provider):
+    """Test a deadlined submission does not hand its deadline to the job workers."""
+
+    def handler(request):
+        # Like a real transport: an exhausted deadline leaves a zero read timeout
+        if request.extensions["timeout"]["read"] == 0:
+            raise httpx.ReadTimeout("", request=request)
+        return httpx.Response(200, content=b"png")
+
+    mock_provider(handler)
+    monkeypatch.setattr(server, "generation_cache", None)
+    queue = JobQueue(server.run_job, workers=1)
+    monkeypatch.setattr(server, "job_queue", queue)
+
+    async def run(arguments):
+        submitted = await server.call_tool("submit_generation", arguments)
+        job_id = json.loads(submitted[0].text)["job_id"]
+        return json.loads((await server.call_tool("await_job", {"job_id": job_id}))[0].text)
+
+    first = await run({"prompt": "a fox", "size": "8x8", "deadline_ms": 100})
+    await asyncio.sleep(0.2)
+    second = await run({"prompt": "a wolf", "size": "8x8"})
+
+    assert first["status"] == "succeeded"
+    assert second["status"] == "succeeded", second.get("error")
+    await queue.aclose()
+
+
+@pytest.mark.asyncio
+async def test_generation_and_batch_report_progress(monkeypatch, mock_provider):
+    """Test generations report their stages and batches report completed items."""
+
+    def handler(request):
+        return httpx.Response(200, content=b"x" * 200_000)
+
+    mock_provider(handler)
+    monkeypatch.setattr(server, "generation_cache", None)
+    sent = []
+
+    async def send(value, total, message):
+        sent.append((value, total, message))
+
+    with progress.reporting(progress.ProgressReporter(send, min_interval=0)):
+        await server.dispatch_generation({"prompt": "a cat", "size": "8x8"})
+    messages = [message for _, _, message in sent]
+    assert messages[0] == "Request sent to pollinations"
+    assert messages[1] == "Response received, downloading"
+    assert any(m.startswith("Downloaded") and "of 200000 bytes" in m for m in messages)
+    assert sent[-1] == (100.0, 100.0, "Written 200000 bytes")
+    assert [value for value, _, _ in sent] == sorted({value for value, _, _ in sent})
+
+    sent.clear()
+    with progress.reporting(progress.ProgressReporter(send, min_interval=0)):
+        await server.generate_images_batch([{"prompt": "a"}, {"prompt": "b"}], {"size": "8x8"})
+    assert [(value, total) for value, total, _ in sent] == [(1, 2), (2, 2)]
+
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_slow_provider_and_cleans_up(monkeypatch, tmp_path, mock_provider):
+    """Test deadline_ms cancels a stalled download and leaves no partial file behind."""
+
+    closed = asyncio.Event()
+
+    class SlowBody(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"x" * 1024
+            await asyncio.sleep(10)
+            yield b"never"
+
+        async def aclose(self):
+            closed.set()
+
+    def handler(request):
+        return httpx.Response(200, stream=SlowBody())
+
+    mock_provider(handler)
+    monkeypatch.setattr(server, "generation_cache", None)
+
+    response = await server.call_tool(
+        "generate_image", {"prompt": "a cat", "size": "8x8", "deadline_ms": 100}
+    )
+
+    assert response[0].text == "Error: Deadline of 100 ms exceeded while downloading the image"
+    assert closed.is_set()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_errors_without_a_message_are_named_by_type(monkeypatch, mock_provider):
+    """Test a provider timeout, whose message is empty, is reported by its type."""
+
+    def handler(request):
+        raise httpx.ReadTimeout("", request=request)
+
+    mock_provider(handler)
+    monkeypatch.setattr(server, "generation_cache", None)
+    monkeypatch.setattr(
+        server, "_retry_policies", {server.ImageProvider.POLLINATIONS: RetryPolicy(max_attempts=1)}
+    )
+
+    response = await server.call_tool("generate_image", {"prompt": "a cat", "size": "8x8"})
+
+    assert response[0].text == "Error: ReadTimeout"
+
+
+@pytest.mark.asyncio
+async def test_server_stats_cover_tools_stages_and_errors(
+    monkeypatch, tmp_path, sample_image_path, mock_provider
+):
+    """Test tool calls, provider stages, image stages and errors show up in get_server_stats."""
+
+    metrics = MetricsRegistry()
+    mock_provider(lambda request: httpx.Response(200, content=b"png"), metrics=metrics)
+    monkeypatch.setattr(server, "metrics", metrics)
+    monkeypatch.setattr(server, "generation_cache", None)
+
+    await server.call_tool("generate_image", {"prompt": "a cat", "size": "8x8"})
+    await server.call_tool("resize_image", {"image_path": str(sample_image_path), "width": 10})
+    await server.call_tool("get_image_info", {"image_path": str(tmp_path / "missing.png")})
+    response = await server.call_tool("get_server_stats", {})
+    stats = json.loads(response[0].text)
+
+    calls = stats["counters"]["tool_calls_total"]
+    assert calls["status=ok,tool=generate_image"] == 1
+    assert calls["status=error,tool=get_image_info"] == 1
+    errors = stats["counters"]["errors_total"]
+    assert errors["error=FileNotFoundError,tool=get_image_info"] == 1
+    assert stats["counters"]["bytes_in_total"]["component=pollinations"] == 3
+    stages = stats["histograms"]["stage_duration_seconds"]
+    for series in (
+        "component=pollinations,stage=ttfb",
+        "component=pollinations,stage=download",
+        "component=pollinations,stage=disk_write",
+        "component=pollinations,stage=provider_request",
+        "component=resize_image,stage=decode",
+        "component=resize_image,stage=encode",
+    ):
+        assert stages[series]["count"] == 1
+    assert stats["histograms"]["tool_duration_seconds"]["tool=resize_image"]["p99"] >= 0
+    assert stats["jobs"]["workers"] >= 1
+
+    text = await server.call_tool("get_server_stats", {"format": "prometheus"})
+    assert 'imagegen_tool_calls_total{status="ok",tool="generate_image"} 1' in text[0].text
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_are_traced(monkeypatch, tmp_path, sample_image_path, mock_provider):
+    """Test a traced call records provider, file and Pillow spans under one root."""
+
+    trace_path = tmp_path / "traces" / "trace.jsonl"
+    mock_provider(lambda request: httpx.Response(200, content=b"png"))
+    monkeypatch.setattr(server, "tracer", Tracer(RotatingTraceFile(trace_path, "otlp")))
+    monkeypatch.setattr(server, "generation_cache", None)
+
+    await server.call_tool(
+        "generate_image", {"prompt": "a cat", "size": "8x8", "provider": "pollinations"}
+    )
+    await server.call_tool(
+        "resize_image",
+        {"image_path": str(sample_image_path), "width": 10, "output_path": str(tmp_path / "r.png")},
+    )
+
+    traces = [json.loads(line) for line in trace_path.read_text().splitlines()]
+    spans = [
+        {s["name"]: s for s in t["resourceSpans"][0]["scopeSpans"][0]["spans"]} for t in traces
+    ]
+    generate, resize = spans
+    attributes = {a["key"]: a["value"] for a in generate["provider.request"]["attributes"]}
+    assert attributes["provider"] == {"stringValue": "pollinations"}
+    assert attributes["size"] == {"stringValue": "8x8"}
+    assert attributes["attempt"] == {"intValue": "1"}
+    assert {"tool.generate_image", "rate_limit.wait", "file.download", "file.commit"} <= set(
+        generate
+    )
+    assert {"image.resize_image", "image.decode", "image.resize", "image.encode"} <= set(resize)
+    assert resize["image.decode"]["parentSpanId"] == resize["image.resize_image"]["spanId"]
+
+
+@pytest.mark.asyncio
+async def test_process_image_tool_runs_pipeline(sample_image_path, tmp_path):
+    """Test process_image goes through the worker pool and reports per-stage results."""
+
+    content = await server.call_tool(
+        "process_image",
+        {
+            "image_path": str(sample_image_path),
+            "operations": [
+                {"op": "crop", "left": 10, "top": 10, "right": 90, "bottom": 50},
+                {"op": "resize", "width": 40},
+            ],
+            "outputs": [{"format": "JPEG", "quality": 70}, {"format": "WEBP"}],
+            "output_dir": str(tmp_path / "out"),
+        },
+    )
+
+    result = json.loads(content[0].text)
+    assert [step["size"] for step in result["operations"]] == [[80, 40], [40, 20]]
+    assert [Path(o["image_path"]).name for o in result["outputs"]] == [
+        "test_image_processed.jpg",
+        "test_image_processed.webp",
+    ]
+    assert all(Path(o["image_path"]).exists() for o in result["outputs"])
+    assert server.metrics.counter_value(
+        "bytes_out_total", component="process_image"
+    ) >= sum(o["file_size_bytes"] for o in result["outputs"])
+
+
+@pytest.mark.asyncio
+async def test_batch_process_directory_skips_up_to_date_outputs(monkeypatch, tmp_path):
+    """Test a directory batch mirrors layout, reports per-file progress and skips on rerun."""
+
+    monkeypatch.setattr(server, "batch_workers", ImageWorkerPool("thread", max_workers=2))
+    for name in ("a.png", "nested/b.png", "nested/deeper/c.png"):
+        (tmp_path / "in" / name).parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGB", (40, 20), color="blue").save(tmp_path / "in" / name)
+    (tmp_path / "in" / "broken.png").write_bytes(b"not an image")
+
+    updates = []
+
+    async def send(value, total, message):
+        updates.append((value, total))
+
+    arguments = {
+        "pattern": str(tmp_path / "in" / "**" / "*.png"),
+        "operations": [{"op": "resize", "width": 20}],
+        "output_dir": str(tmp_path / "out"),
+        "outputs": [{"format": "JPEG", "quality": 80}, {"format": "PNG", "suffix": "_small"}],
+    }
+    with progress.reporting(progress.ProgressReporter(send, min_interval=0)):
+        first = await server.batch_process_directory(**arguments)
+
+    assert (first["matched"], first["processed"], first["failed"]) == (4, 3, 1)
+    assert first["outputs_written"] == 6 and first["bytes_out"] > 0
+    assert first["errors"][0]["path"].endswith("broken.png")
+    assert (tmp_path / "out" / "nested" / "deeper" / "c_small.png").exists()
+    assert (tmp_path / "out" / "a.jpg").exists()
+    assert updates == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+    second = json.loads((await server.call_tool("batch_process_directory", arguments))[0].text)
+    assert (second["processed"], second["skipped"], second["failed"]) == (0, 3, 1)
+
+    arguments["overwrite"] = True
+    third = json.loads((await server.call_tool("batch_process_directory", arguments))[0].text)
+    assert third["processed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_process_directory_reports_colliding_outputs(monkeypatch, tmp_path):
+    """Test same-stem sources converted to one format fail instead of overwriting each other."""
+
+    monkeypatch.setattr(server, "batch_workers", ImageWorkerPool("thread", max_workers=2))
+    for name in ("a.png", "a.jpg", "b.png"):
+        Image.new("RGB", (20, 20), color="green").save(tmp_path / name)
+
+    result = await server.batch_process_directory(
+        str(tmp_path / "*"), [{"op": "convert", "format": "WEBP"}], str(tmp_path / "out")
+    )
+
+    assert (result["processed"], result["failed"]) == (1, 2)
+    assert sorted(Path(error["path"]).name for error in result["errors"]) == ["a.jpg", "a.png"]
+    assert all("would also be written" in error["error"] for error in result["errors"])
+    assert [path.name for path in (tmp_path / "out").iterdir()] == ["b.webp"]
+
+
+@pytest.mark.asyncio
+async def test_batch_process_directory_runs_in_process_pool(tmp_path):
+    """Test the default process pool can run the pipeline (arguments pickle cleanly)."""
+
+    Image.new("RGBA", (30, 30), color=(255, 0, 0, 0)).save(tmp_path / "logo.png")
+    pool = ImageWorkerPool("process", max_workers=1)
+    original, server.batch_workers = server.batch_workers, pool
+    try:
+        result = await server.batch_process_directory(
+            str(tmp_path / "*.png"),
+            [{"op": "flatten"}, {"op": "convert", "format": "JPEG"}],
+            str(tmp_path / "out"),
+        )
+    finally:
+        server.batch_workers = original
+        pool.shutdown()
+
+    assert result["executor"] == "process" and result["processed"] == 1
+    assert (tmp_path / "out" / "logo.jpg").exists()
+
+
+@pytest.mark.asyncio
+async def test_convert_image_format_auto_reports_candidates(tmp_path):
+    """Test the AUTO target through the tool, with candidates limited by the caller."""
+
+    source = tmp_path / "gradient.png"
+    Image.linear_gradient("L").convert("RGB").save(source)
+
+    content = await server.call_tool(
+        "convert_image_format",
+        {
+            "image_path": str(source),
+            "target_format": "AUTO",
+            "candidate_formats": ["JPEG", "PNG"],
+            "quality": 80,
+            "effort": "max",
+            "output_path": str(tmp_path / "out.bin"),
+        },
+    )
+
+    result = json.loads(content[0].text)
+    assert [c["format"] for c in result["candidates"]] == ["JPEG", "PNG"]
+    assert result["format"] in ("JPEG", "PNG") and result["budget_met"]
+    assert Path(result["image_path"]).suffix in (".jpg", ".png")
+    assert Path(result["image_path"]).stat().st_size == result["file_size_bytes"]
+
+
+@pytest.mark.asyncio
+async def test_memory_governor_serializes_image_ops_over_budget(monkeypatch, tmp_path):
+    """Test image tools reserve decoded bytes and queue when the budget is spent."""
+
+    governor = MemoryGovernor(1)
+    monkeypatch.setattr(server, "memory_governor", governor)
+    monkeypatch.setattr(server, "metrics", MetricsRegistry())
+    source = tmp_path / "photo.png"
+    Image.new("RGB", (64, 64), "navy").save(source)
+
+    await asyncio.gather(
+        *(
+            server.call_tool(
+                "convert_image_format",
+                {
+                    "image_path": str(source),
+                    "target_format": "JPEG",
+                    "output_path": str(tmp_path / f"out{i}.jpg"),
+                },
+            )
+            for i in range(3)
+        )
+    )
+    stats = json.loads((await server.call_tool("get_server_stats", {}))[0].text)
+
+    memory = stats["memory"]
+    assert memory["reservations"] == 3 and memory["peak_bytes"] == 1
+    assert memory["in_use_bytes"] == 0 and memory["waiting"] == 0
+    stages = stats["histograms"]["stage_duration_seconds"]
+    assert stages["component=convert_image,stage=memory_wait"]["count"] == 3
+    assert all((tmp_path / f"out{i}.jpg").exists() for i in range(3))
@@ -0,0 +1,121 @@
+"""Tests for single-flight request coalescing."""
+
+import asyncio
+
+import pytest
+
+from imagegen_mcp.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    """Test identical concurrent calls run the work once."""
+    flights = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "done"
+
+    tasks = [asyncio.create_task(flights.do("key", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flights.waiters("key") == 3
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert results == [("done", False), ("done", True), ("done", True)]
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 2}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    """Test one waiter leaving keeps the work running for the others."""
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return 42
+
+    first = asyncio.create_task(flights.do("key", work))
+    second = asyncio.create_task(flights.do("key", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == (42, True)
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_last_waiter_leaving_cancels_work():
+    """Test the shared call is cancelled once nobody is waiting for it."""
+    flights = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.create_task(flights.do("key", work))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert len(flights) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter_and_are_not_remembered():
+    """Test a failure is shared by current waiters but later calls start afresh."""
+    flights = SingleFlight()
+    attempts = 0
+
+    async def work():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0)
+        if attempts == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    results = await asyncio.gather(
+        flights.do("key", work), flights.do("key", work), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert await flights.do("key", work) == ("ok", False)
+
+
+@pytest.mark.asyncio
+async def test_first_callers_deadline_does_not_bind_coalesced_callers():
+    """Test the shared call runs without the starter's deadline, which only ends its wait."""
+    from imagegen_mcp import deadline
+
+    flights = SingleFlight()
+    seen = []
+
+    async def work():
+        seen.append(deadline.cap(None))
+        deadline.set_stage("working")
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def with_deadline():
+        return await deadline.run_within(30, flights.do("key", work))
+
+    hurried = asyncio.create_task(with_deadline())
+    await asyncio.sleep(0)
+    patient = asyncio.create_task(flights.do("key", work))
+
+    with pytest.raises(deadline.DeadlineExceededError, match="while working"):
+        await hurried
+    assert await patient == ("done", True)
+    assert seen == [None]
@@ -0,0 +1,80 @@
+"""Tests for output file management."""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from imagegen_mcp.storage import (
+    DownloadTooLargeError,
+    allocate_output_path,
+    stream_to_file,
+    write_bytes_atomic,
+)
+
+
+def _chunked_client(body: bytes) -> httpx.AsyncClient:
+    async def chunks():
+        for start in range(0, len(body), 1000):
+            yield body[start : start + 1000]
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=chunks()))
+    return httpx.AsyncClient(transport=transport)
+
+
+def test_allocate_output_path_is_unique_under_concurrency(tmp_path):
+    """Test concurrent allocations never hand out the same file."""
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = list(executor.map(lambda _: allocate_output_path(tmp_path), range(200)))
+
+    assert len(set(paths)) == 200
+    assert all(path.exists() and path.stat().st_size == 0 for path in paths)
+    assert all(path.name.startswith("generated_") and path.suffix == ".png" for path in paths)
+
+
+def test_allocate_output_path_creates_directory(tmp_path):
+    """Test the target directory is created on demand."""
+    path = allocate_output_path(tmp_path / "nested", prefix="img", suffix=".jpg")
+
+    assert path.parent == tmp_path / "nested"
+    assert path.name.startswith("img_") and path.suffix == ".jpg"
+
+
+@pytest.mark.asyncio
+async def test_stream_to_file_hashes_and_renames(tmp_path):
+    """Test a streamed body lands at its final path with size and hash."""
+    body = bytes(range(256)) * 40
+    destination = tmp_path / "out" / "image.png"
+
+    async with _chunked_client(body) as client:
+        async with client.stream("GET", "https://example.test/image") as response:
+            stored = await stream_to_file(response, tmp_path, destination, chunk_size=512)
+
+    assert stored.path == destination
+    assert destination.read_bytes() == body
+    assert stored.size_bytes == len(body)
+    assert stored.sha256 == hashlib.sha256(body).hexdigest()
+    assert list(destination.parent.glob(".*.part")) == []
+
+
+@pytest.mark.asyncio
+async def test_stream_to_file_enforces_size_limit(tmp_path):
+    """Test an oversized body is rejected and leaves no partial file behind."""
+    destination = tmp_path / "image.png"
+
+    async with _chunked_client(b"x" * 5000) as client:
+        async with client.stream("GET", "https://example.test/image") as response:
+            with pytest.raises(DownloadTooLargeError):
+                await stream_to_file(response, tmp_path, destination, max_bytes=2500)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_write_bytes_atomic_allocates_name(tmp_path):
+    """Test in-memory bytes are written atomically under an allocated name."""
+    stored = write_bytes_atomic(b"png", tmp_path)
+
+    assert stored.path.read_bytes() == b"png"
+    assert stored.path.name.startswith("generated_")
+    assert stored.path.stat().st_mode & 0o777 == 0o644
@@ -0,0 +1,150 @@
+"""Tests for trace spans and the trace file exporter."""
+
+import json
+
+import pytest
+
+from imagegen_mcp import tracing
+from imagegen_mcp.tracing import NOOP_SPAN, RotatingTraceFile, Tracer
+
+
+def read_chrome(path):
+    """Parse an unterminated Chrome trace-event array."""
+    return json.loads(path.read_text().rstrip().rstrip(",") + "]")
+
+
+def test_span_without_trace_is_noop():
+    """Test instrumentation outside a trace returns the shared no-op span."""
+    assert tracing.current() is None
+    assert tracing.span("image.decode", size="8x8") is NOOP_SPAN
+    assert tracing.start_trace(None, "tool.generate_image") is NOOP_SPAN
+    with tracing.span("file.commit") as span:
+        span.set(bytes=1)
+
+
+def test_chrome_export_nests_spans(tmp_path):
+    """Test child spans link to their parent and are written as Chrome events."""
+    path = tmp_path / "trace.json"
+    tracer = Tracer(RotatingTraceFile(path, "chrome"))
+
+    with tracer.trace("tool.generate_image", provider="pollinations", size="8x8") as root:
+        with tracing.span("provider.request", attempt=1) as child:
+            with tracing.span("file.commit", bytes=3):
+                pass
+        assert tracing.current() is root
+
+    events = read_chrome(path)
+    assert events[0]["ph"] == "M" and events[0]["args"]["name"].startswith("tool.generate_image")
+    spans = {event["name"]: event for event in events[1:]}
+    assert spans["tool.generate_image"]["args"]["provider"] == "pollinations"
+    assert spans["provider.request"]["args"]["parent_id"] == root.span_id
+    assert spans["file.commit"]["args"]["parent_id"] == child.span_id
+    assert spans["tool.generate_image"]["dur"] >= spans["provider.request"]["dur"]
+    assert tracer.stats()["exported"] == 1
+
+
+def test_otlp_export_records_errors(tmp_path):
+    """Test OTLP-JSON lines carry ids, typed attributes and error status."""
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(RotatingTraceFile(path, "otlp"))
+
+    with pytest.raises(ValueError):
+        with tracer.trace("tool.resize_image"):
+            with tracing.span("image.decode", width=8, ratio=0.5, draft=True):
+                raise ValueError("bad image")
+
+    request = json.loads(path.read_text())
+    resource = request["resourceSpans"][0]
+    spans = {s["name"]: s for s in resource["scopeSpans"][0]["spans"]}
+    decode, root = spans["image.decode"], spans["tool.resize_image"]
+    assert decode["parentSpanId"] == root["spanId"] and "parentSpanId" not in root
+    assert decode["traceId"] == root["traceId"] and len(root["traceId"]) == 32
+    assert decode["status"] == {"code": 2, "message": "ValueError"}
+    values = {a["key"]: a["value"] for a in decode["attributes"]}
+    assert values["width"] == {"intValue": "8"}
+    assert values["ratio"] == {"doubleValue": 0.5}
+    assert values["draft"] == {"boolValue": True}
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+
+
+def test_sampling_keeps_slow_and_failed_traces(tmp_path):
+    """Test unsampled traces are dropped unless they are slow or fail."""
+    path = tmp_path / "trace.jsonl"
+    unsampled = Tracer(RotatingTraceFile(path, "otlp"), sample_rate=0.5, rng=lambda: 0.9)
+    assert unsampled.trace("tool.get_image_info") is NOOP_SPAN
+
+    tail = Tracer(
+        RotatingTraceFile(path, "otlp"), sample_rate=0.0, slow_seconds=3600, rng=lambda: 0.9
+    )
+    with tail.trace("tool.fast"):
+        pass
+    with tail.trace("tool.failed") as root:
+        root.fail(RuntimeError("provider down"))
+    tail.slow_seconds = 0
+    with tail.trace("tool.slow"):
+        pass
+
+    names = [
+        json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"]
+        for line in path.read_text().splitlines()
+    ]
+    assert names == ["tool.failed", "tool.slow"]
+    assert tail.stats()["dropped"] == 1
+
+
+def test_trace_file_rotates(tmp_path):
+    """Test the file rotates at max_bytes and keeps only the configured backups."""
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(RotatingTraceFile(path, "otlp", max_bytes=600, backups=2))
+
+    for index in range(8):
+        with tracer.trace("tool.generate_image", index=index):
+            pass
+    tracer.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "trace.jsonl",
+        "trace.jsonl.1",
+        "trace.jsonl.2",
+    ]
+    assert path.stat().st_size <= 600
+
+
+@pytest.mark.asyncio
+async def test_httpcore_trace_records_phases(tmp_path):
+    """Test httpcore trace events become http.<phase> spans."""
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(RotatingTraceFile(path, "otlp"))
+    assert tracing.httpcore_trace() is None
+
+    with tracer.trace("tool.generate_image"):
+        trace = tracing.httpcore_trace()
+        await trace("connection.connect_tcp.started", {})
+        await trace("connection.connect_tcp.complete", {"return_value": None})
+        await trace("http11.receive_response_headers.started", {})
+        await trace("http11.receive_response_headers.failed", {"exception": TimeoutError()})
+
+    spans = json.loads(path.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    phases = {s["name"]: s for s in spans}
+    assert phases["http.connect_tcp"]["status"] == {"code": 1}
+    assert phases["http.receive_response_headers"]["status"]["message"] == "TimeoutError"
+
+
+@pytest.mark.asyncio
+async def test_worker_threads_inherit_the_active_span(tmp_path):
+    """Test spans opened in the thread pool attach to the caller's trace."""
+    from imagegen_mcp.workers import ImageWorkerPool
+
+    def work():
+        with tracing.span("image.decode"):
+            return tracing.current() is not None
+
+    path = tmp_path / "trace.json"
+    tracer = Tracer(RotatingTraceFile(path, "chrome"))
+    pool = ImageWorkerPool("thread", max_workers=1)
+    with tracer.trace("tool.resize_image") as root:
+        assert await pool.run(work)
+    pool.shutdown()
+
+    decode = [e for e in read_chrome(path) if e["name"] == "image.decode"]
+    assert decode[0]["args"]["parent_id"] == root.span_id
@@ -0,0 +1,107 @@
+"""Tests for the image worker pool."""
+
+import asyncio
+import threading
+
+import pytest
+from PIL import Image
+
+from imagegen_mcp import imaging
+from imagegen_mcp.memory import MemoryGovernor
+from imagegen_mcp.workers import ImageWorkerPool
+
+
+def _blocking_wait(event: threading.Event) -> str:
+    event.wait(timeout=5)
+    return threading.current_thread().name
+
+
+@pytest.mark.asyncio
+async def test_thread_pool_runs_off_event_loop_with_bounded_queue():
+    """Test jobs run in worker threads and submissions beyond the queue wait."""
+    pool = ImageWorkerPool("thread", max_workers=1, max_queue=1)
+    event = threading.Event()
+
+    tasks = [asyncio.create_task(pool.run(_blocking_wait, event)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    assert pool.pending == 2
+
+    event.set()
+    names = await asyncio.gather(*tasks)
+    assert all(name.startswith("imagegen-image") for name in names)
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_process_pool_resizes_by_path(tmp_path):
+    """Test the process pool works on paths and returns plain results."""
+    source = tmp_path / "source.png"
+    Image.new("RGB", (40, 20), color="green").save(source)
+    pool = ImageWorkerPool("process", max_workers=1, max_queue=0)
+
+    result = await pool.run(
+        imaging.resize_image, str(source), width=20, output_path=str(tmp_path / "out.png")
+    )
+
+    assert result["new_size"] == (20, 10)
+    pool.shutdown()
+
+
+def test_rejects_unknown_executor_kind():
+    """Test an unknown executor kind is refused."""
+    with pytest.raises(ValueError):
+        ImageWorkerPool("gpu")
+
+
+def _write_when_released(event: threading.Event, path: str) -> dict:
+    event.wait(timeout=5)
+    with open(path, "wb") as f:
+        f.write(b"done")
+    return {"image_path": path}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_running_job_is_cleaned_up_and_keeps_its_slot(tmp_path):
+    """Test cancelling a running job removes its output and a queued one never runs,
+    and each job's memory is released only once it can no longer be using it."""
+    pool = ImageWorkerPool("thread", max_workers=1, max_queue=1)
+    governor = MemoryGovernor(100)
+    event = threading.Event()
+    running_output = tmp_path / "running.png"
+    queued_output = tmp_path / "queued.png"
+    cleaned = threading.Event()
+
+    def cleanup(result):
+        imaging.remove_outputs(result)
+        cleaned.set()
+
+    running_memory = await governor.hold(60)
+    queued_memory = await governor.hold(30)
+    running = asyncio.create_task(
+        pool.run(
+            _write_when_released,
+            event,
+            str(running_output),
+            cleanup=cleanup,
+            on_done=running_memory.hand_off(),
+        )
+    )
+    queued = asyncio.create_task(
+        pool.run(
+            _write_when_released, event, str(queued_output), on_done=queued_memory.hand_off()
+        )
+    )
+    await asyncio.sleep(0.05)
+    running.cancel()
+    queued.cancel()
+    await asyncio.gather(running, queued, return_exceptions=True)
+    assert pool.pending == 1
+    assert governor.in_use == 60
+
+    event.set()
+    assert await asyncio.to_thread(cleaned.wait, 5)
+    await asyncio.sleep(0.01)
+    assert pool.pending == 0
+    assert governor.in_use == 0
+    assert not running_output.exists()
+    assert not queued_output.exists()